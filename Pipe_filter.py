@@ -1,178 +1,685 @@
 from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
 from datetime import datetime
+from itertools import islice
+import os
 import re
-import pandas as pd
-import numpy as np
 import time
 import hashlib
+import hmac
 import logging
+from anomalies import PuitsAnomalies
+from temps_evenement import FiligranesSources
+
+# Journal du module : la configuration (niveau, format, destination) est laissée à
+# l'application. pandas et NumPy ne sont importés que par les traitements par lots.
+journal = logging.getLogger(__name__)
+
+# Types de client acceptés par la validation
+TYPES_CLIENT = ['residentiel', 'commercial', 'industriel']
+
+# Schéma de validation : une règle par champ, appliquées dans cet ordre.
+# 'erreur' est signalée pour toute valeur refusée, 'anomalie' seulement lorsque
+# la valeur est mal formée (tentative d'injection), pas lorsqu'elle est hors bornes.
+# Comme les contrôles d'origine, les motifs sont appliqués par re.match ('$' admet
+# un saut de ligne final) et une valeur NaN n'est pas hors bornes.
+SCHEMA_VALIDATION = [
+    {'champ': 'compteur_id', 'regle': 'motif', 'motif': r'^\d{6}$',
+     'erreur': "ID de compteur invalide", 'anomalie': "Tentative d'injection avec ID de compteur"},
+    {'champ': 'timestamp', 'regle': 'horodatage',
+     'erreur': "Horodatage invalide", 'anomalie': "Tentative d'injection avec horodatage"},
+    {'champ': 'consommation', 'regle': 'nombre', 'unite': True, 'minimum': 0, 'maximum': 10000,
+     'erreur': "Valeur de consommation invalide", 'anomalie': "Tentative d'injection avec consommation"},
+    {'champ': 'type_client', 'regle': 'enumeration', 'valeurs': TYPES_CLIENT,
+     'erreur': "Type de client invalide", 'anomalie': "Tentative d'injection avec type de client"},
+    {'champ': 'wilaya', 'regle': 'caracteres', 'classe': 'alpha', 'espaces': True,
+     'erreur': "Wilaya invalide", 'anomalie': "Tentative d'injection avec wilaya"},
+    {'champ': 'ville', 'regle': 'caracteres', 'classe': 'alpha', 'espaces': True, 'autres': '"\'',
+     'erreur': "Ville invalide", 'anomalie': "Tentative d'injection avec ville"},
+    {'champ': 'localisation', 'regle': 'motif', 'motif': r'^-?\d+\.\d+,-?\d+\.\d+$',
+     'erreur': "Localisation invalide", 'anomalie': "Tentative d'injection avec localisation"},
+    {'champ': 'region', 'regle': 'caracteres', 'classe': 'alpha', 'vide': False,
+     'erreur': "Région invalide", 'anomalie': "Tentative d'injection avec région"},
+    {'champ': 'code_postal', 'regle': 'motif', 'motif': r'^\d{5}$',
+     'erreur': "Code postal invalide", 'anomalie': "Tentative d'injection avec code postal"},
+    {'champ': 'fournisseur', 'regle': 'caracteres', 'classe': 'alnum', 'espaces': True,
+     'erreur': "Fournisseur invalide", 'anomalie': "Tentative d'injection avec fournisseur"},
+    {'champ': 'tarif', 'regle': 'nombre', 'minimum': 0, 'strict': True,
+     'erreur': "Tarif invalide", 'anomalie': "Tentative d'injection avec tarif"},
+    {'champ': 'puissance_souscrite', 'regle': 'nombre', 'unite': True, 'minimum': 0, 'strict': True,
+     'erreur': "Puissance souscrite invalide", 'anomalie': "Tentative d'injection avec puissance souscrite"},
+    {'champ': 'type_compteur', 'regle': 'caracteres', 'classe': 'alnum', 'espaces': True,
+     'erreur': "Type de compteur invalide", 'anomalie': "Tentative d'injection avec type de compteur"},
+]
+
+# Table de suppression des caractères d'espacement (tous situés avant U+3001)
+_TABLE_ESPACES = dict.fromkeys(c for c in range(0x3001) if chr(c).isspace())
+
+def _compiler_schema(schema, arret_premiere_erreur=False):
+    """Compilation du schéma de validation en une seule fonction de vérification
+
+    Le code de chaque règle est généré à la suite dans une même fonction, avec les
+    motifs et tables de caractères précompilés ; la fonction retourne les listes
+    d'erreurs et d'anomalies ainsi que les valeurs analysées (nombres, horodatages).
+    Un champ absent, ou d'un type inattendu (valeur manquante...), est refusé.
+    """
+    espace_noms = {'_iso': datetime.fromisoformat, '_datetime': datetime}
+    lignes = ['def valider(donnees):', '    erreurs = []', '    anomalies = []', '    valeurs = {}']
+
+    for i, regle in enumerate(schema):
+        champ = repr(regle['champ'])
+        valeur = f"_c{i}"
+        lignes.append(f"    {valeur} = donnees.get({champ})")
+        espace_noms[f'_erreur{i}'] = regle['erreur']
+        espace_noms[f'_anomalie{i}'] = regle.get('anomalie')
+        echec = [f'erreurs.append(_erreur{i})']
+        if regle.get('anomalie') is not None:
+            echec.append(f'anomalies.append(_anomalie{i})')
+        hors_bornes = [f'erreurs.append(_erreur{i})']
+        if arret_premiere_erreur:
+            echec.append('return erreurs, anomalies, valeurs')
+            hors_bornes.append('return erreurs, anomalies, valeurs')
+        type_regle = regle['regle']
+
+        if type_regle == 'motif':
+            espace_noms[f'_motif{i}'] = re.compile(regle['motif']).match
+            lignes.append(f'    if _motif{i}(str({valeur})) is None:')
+            lignes += ['        ' + instruction for instruction in echec]
+
+        elif type_regle == 'horodatage':
+            lignes += ['    try:',
+                       f'        valeurs[{champ}] = {valeur} if isinstance({valeur}, _datetime) else _iso({valeur})',
+                       '    except (ValueError, TypeError):']
+            lignes += ['        ' + instruction for instruction in echec]
+
+        elif type_regle == 'nombre':
+            source = f'str({valeur}).split()[0]' if regle.get('unite', False) else valeur
+            conditions = []
+            if 'minimum' in regle:
+                espace_noms[f'_minimum{i}'] = regle['minimum']
+                conditions.append(f"_v {'<=' if regle.get('strict', False) else '<'} _minimum{i}")
+            if 'maximum' in regle:
+                espace_noms[f'_maximum{i}'] = regle['maximum']
+                conditions.append(f'_v > _maximum{i}')
+            lignes += ['    try:', f'        _v = valeurs[{champ}] = float({source})',
+                       '    except (ValueError, TypeError, IndexError):']
+            lignes += ['        ' + instruction for instruction in echec]
+            if conditions:
+                lignes += ['    else:', f"        if {' or '.join(conditions)}:"]
+                lignes += ['            ' + instruction for instruction in hors_bornes]
+
+        elif type_regle == 'enumeration':
+            espace_noms[f'_valeurs{i}'] = frozenset(regle['valeurs'])
+            lignes.append(f'    if not isinstance({valeur}, str) or {valeur}.lower() not in _valeurs{i}:')
+            lignes += ['        ' + instruction for instruction in echec]
+
+        elif type_regle == 'caracteres':
+            # Les caractères tolérés sont retirés d'un seul coup par translate,
+            # le reste doit être entièrement alphabétique (ou alphanumérique).
+            # Chemin rapide : seules les espaces simples sont retirées, translate
+            # n'est utilisé que si ce premier essai échoue.
+            table = dict(_TABLE_ESPACES) if regle.get('espaces', False) else {}
+            table.update(dict.fromkeys(map(ord, regle.get('autres', ''))))
+            methode = 'isalpha' if regle['classe'] == 'alpha' else 'isalnum'
+            vide = 'not _r or ' if regle.get('vide', True) else ''
+            lignes.append(f'    if not isinstance({valeur}, str):')
+            lignes += ['        ' + instruction for instruction in echec]
+            lignes.append('    else:')
+            debut = len(lignes)
+            if table:
+                espace_noms[f'_table{i}'] = table
+                lignes.append(f"    _r = {valeur}.replace(' ', '')" if ord(' ') in table else f'    _r = {valeur}')
+                lignes.append(f'    if not ({vide}_r.{methode}()):')
+                lignes.append(f'        _r = {valeur}.translate(_table{i})')
+                lignes.append(f'        if not ({vide}_r.{methode}()):')
+                lignes += ['            ' + instruction for instruction in echec]
+            else:
+                lignes.append(f'    _r = {valeur}')
+                lignes.append(f'    if not ({vide}_r.{methode}()):')
+                lignes += ['        ' + instruction for instruction in echec]
+            lignes[debut:] = ['    ' + ligne for ligne in lignes[debut:]]
 
-# Configuration du logging pour afficher les avertissements dans la console
-logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+        else:
+            raise ValueError(f"Règle de validation inconnue : {type_regle}")
+
+    lignes.append('    return erreurs, anomalies, valeurs')
+    exec(compile('\n'.join(lignes), '<schema de validation>', 'exec'), espace_noms)
+    return espace_noms['valider']
+
+def _texte(colonne):
+    """Conversion d'une colonne en chaînes en conservant les valeurs manquantes"""
+    return colonne.astype(str).where(colonne.notna())
+
+def _par_valeurs_distinctes(colonne, operation):
+    """Application d'une opération de chaînes aux seules valeurs distinctes d'une colonne
+
+    Les colonnes textuelles d'un lot comptent peu de valeurs distinctes : l'opération
+    est évaluée une fois par valeur, puis le résultat est réparti sur les lignes.
+    """
+    import numpy as np
+    import pandas as pd
+    codes, distinctes = pd.factorize(colonne, use_na_sentinel=False)
+    resultat = operation(pd.Series(distinctes, dtype=object))
+    return pd.Series(np.asarray(resultat)[codes], index=colonne.index)
+
+def _nombre(valeur):
+    """Premier terme d'une valeur de type '5000 Wh', analysé comme par la validation (NaN sinon)"""
+    try:
+        return float(str(valeur).split()[0])
+    except (ValueError, IndexError):
+        return float('nan')
+
+def _premier_terme(colonne):
+    """Valeur numérique du premier terme d'une colonne de type '5000 Wh'"""
+    return _par_valeurs_distinctes(colonne, lambda valeurs: [_nombre(valeur) for valeur in valeurs]).astype(float)
+
+def _consommation_kwh(colonne):
+    """Consommation en kWh d'une colonne de type '5000 Wh' (kWh par défaut, comme _valeur_unite)
+
+    Pendant vectorisé de MesureCompteur.consommation_kwh : l'unité est le second
+    terme séparé par des blancs, comme dans l'analyse d'un relevé isolé.
+    """
+    unite = _par_valeurs_distinctes(colonne, lambda valeurs: _texte(valeurs).str.split().str[1])
+    consommation = _premier_terme(colonne)
+    return consommation.where(unite != 'Wh', consommation / 1000)
+
+# Champs d'un relevé de compteur, dans l'ordre du jeu de données
+CHAMPS_MESURE = ['compteur_id', 'timestamp', 'consommation', 'type_client', 'wilaya', 'ville',
+                 'localisation', 'region', 'code_postal', 'fournisseur', 'tarif',
+                 'puissance_souscrite', 'type_compteur']
+# Champs ajoutés par FiltreTransformation
+CHAMPS_DERIVES = ['consommation_8h', 'categorie_client', 'ratio_consommation']
+
+def _valeur_unite(valeur, unite_defaut):
+    """Analyse d'une valeur de type '5000 Wh' (ou déjà numérique) en (nombre, unité)"""
+    if isinstance(valeur, str):
+        parties = valeur.split()
+        return float(parties[0]), parties[1] if len(parties) > 1 else unite_defaut
+    return float(valeur), unite_defaut
+
+class MesureCompteur:
+    """Relevé de compteur dont les valeurs numériques et l'horodatage sont déjà analysés
+
+    Les filtres se transmettent cet objet ; la mise en forme textuelle
+    ("5.00000 kWh", ...) n'a lieu qu'à la sérialisation par vers_dict. Tant que la
+    mesure n'est pas normalisée (FiltreNormalisation), la consommation, le tarif et
+    la puissance souscrite sont sérialisés tels qu'ils ont été reçus (`brut`).
+    """
+    __slots__ = ('compteur_id', 'timestamp', 'horodatage', 'consommation', 'unite', 'type_client',
+                 'wilaya', 'ville', 'localisation', 'region', 'code_postal', 'fournisseur', 'tarif',
+                 'puissance_souscrite', 'type_compteur', 'consommation_8h', 'categorie_client',
+                 'ratio_consommation', 'brut')
+
+    @classmethod
+    def depuis_dict(cls, donnees, valeurs=None):
+        """Construction à partir d'un dictionnaire brut et des valeurs déjà analysées"""
+        valeurs = valeurs or {}
+        mesure = cls.__new__(cls)
+        mesure.compteur_id = donnees['compteur_id']
+        mesure.timestamp = donnees['timestamp']
+        mesure.horodatage = valeurs.get('timestamp') or datetime.fromisoformat(donnees['timestamp'])
+        mesure.consommation, mesure.unite = _valeur_unite(donnees['consommation'], 'kWh')
+        if 'consommation' in valeurs:
+            mesure.consommation = valeurs['consommation']
+        mesure.type_client = donnees['type_client']
+        mesure.wilaya = donnees['wilaya']
+        mesure.ville = donnees['ville']
+        mesure.localisation = donnees['localisation']
+        mesure.region = donnees['region']
+        mesure.code_postal = donnees['code_postal']
+        mesure.fournisseur = donnees['fournisseur']
+        mesure.tarif = valeurs['tarif'] if 'tarif' in valeurs else float(donnees['tarif'])
+        mesure.puissance_souscrite = valeurs.get('puissance_souscrite')
+        if mesure.puissance_souscrite is None:
+            mesure.puissance_souscrite = _valeur_unite(donnees['puissance_souscrite'], 'kW')[0]
+        mesure.type_compteur = donnees['type_compteur']
+        mesure.consommation_8h = donnees.get('consommation_8h')
+        if isinstance(mesure.consommation_8h, str):
+            mesure.consommation_8h = _valeur_unite(mesure.consommation_8h, 'kWh')[0]
+        mesure.categorie_client = donnees.get('categorie_client')
+        mesure.ratio_consommation = donnees.get('ratio_consommation')
+        mesure.brut = (donnees['consommation'], donnees['tarif'], donnees['puissance_souscrite'])
+        return mesure
+
+    @classmethod
+    def depuis(cls, donnees):
+        """Mesure telle quelle, ou construite à partir d'un dictionnaire"""
+        if isinstance(donnees, cls):
+            return donnees
+        return cls.depuis_dict(donnees)
+
+    def consommation_kwh(self):
+        """Consommation en kWh, que la mesure soit normalisée ou non (voir _consommation_kwh)"""
+        return self.consommation / 1000 if self.unite == 'Wh' else self.consommation
+
+    def copier(self):
+        """Copie superficielle : les filtres modifient la mesure sur place"""
+        return _mesure_depuis_valeurs(self._valeurs())
+
+    def _valeurs(self):
+        return tuple(getattr(self, champ) for champ in self.__slots__)
+
+    def __reduce__(self):
+        # Sérialisation compacte (tuple des valeurs) pour les échanges entre processus
+        return _mesure_depuis_valeurs, (self._valeurs(),)
+
+    def vers_dict(self):
+        """Sérialisation en dictionnaire, au format de sortie du pipeline"""
+        if self.brut is None:
+            consommation, tarif, puissance_souscrite = (f"{self.consommation:.5f} {self.unite}",
+                                                        self.tarif, self.puissance_souscrite)
+        else:
+            consommation, tarif, puissance_souscrite = self.brut
+        donnees = {
+            'compteur_id': self.compteur_id,
+            'timestamp': self.timestamp,
+            'consommation': consommation,
+            'type_client': self.type_client,
+            'wilaya': self.wilaya,
+            'ville': self.ville,
+            'localisation': self.localisation,
+            'region': self.region,
+            'code_postal': self.code_postal,
+            'fournisseur': self.fournisseur,
+            'tarif': tarif,
+            'puissance_souscrite': puissance_souscrite,
+            'type_compteur': self.type_compteur,
+        }
+        if self.consommation_8h is not None:
+            donnees['consommation_8h'] = f"{self.consommation_8h:.5f} kWh"
+        if self.categorie_client is not None:
+            donnees['categorie_client'] = self.categorie_client
+        if self.ratio_consommation is not None:
+            donnees['ratio_consommation'] = self.ratio_consommation
+        return donnees
+
+    def __repr__(self):
+        return f"MesureCompteur({self.vers_dict()!r})"
+
+def _mesure_depuis_valeurs(valeurs):
+    """MesureCompteur reconstruite à partir du tuple de ses valeurs (voir MesureCompteur.__reduce__)"""
+    mesure = MesureCompteur.__new__(MesureCompteur)
+    for champ, valeur in zip(MesureCompteur.__slots__, valeurs):
+        setattr(mesure, champ, valeur)
+    return mesure
+
+def _vers_dict(donnees):
+    """Sérialisation d'une mesure en sortie de pipeline (les dictionnaires passent tels quels)"""
+    if isinstance(donnees, MesureCompteur):
+        return donnees.vers_dict()
+    return donnees
+
+def _instantane(donnees):
+    """Copie d'une entrée à conserver en cas de rejet
+
+    Les filtres modifient les mesures sur place, jamais les dictionnaires reçus.
+    """
+    return donnees.copier() if isinstance(donnees, MesureCompteur) else donnees
 
 class Filtre(ABC):
-    """Interface de base pour les filtres"""
+    """Interface de base pour les filtres
+
+    Un filtre reçoit soit un dictionnaire brut, soit une MesureCompteur produite
+    par un filtre précédent ; MesureCompteur.depuis accepte les deux.
+    Les anomalies qui ne provoquent pas de rejet sont signalées dans `puits`
+    (anomalies.PuitsAnomalies), attribué par le pipeline s'il n'est pas fourni.
+
+    Après traiter_lot, `anomalies_lot` donne les anomalies (au sens de traiter) de
+    chaque ligne du lot, jointes par "; " ; None si un filtre vectorisé n'en
+    distingue pas ses raisons de rejet. De même, `erreurs_lot` donne les erreurs
+    (voir erreurs_rejet) des lignes rejetées.
+    """
+    puits = None
+    anomalies_lot = None
+    erreurs_lot = None
+
+    def signaler(self, anomalie, source=None, details=None):
+        if self.puits is not None:
+            self.puits.signaler(anomalie, source, details)
+
     @abstractmethod
     def traiter(self, donnees):
         """Méthode à implémenter pour traiter les données"""
         pass
 
+    def erreurs_rejet(self, donnees):
+        """Erreurs ayant provoqué le rejet de `donnees` par traiter
+
+        Appelée après le rejet seulement ; un filtre à état ne doit pas retraiter
+        l'enregistrement. Par défaut, le nom du filtre.
+        """
+        return [f"Erreur dans le filtre {self.__class__.__name__}"]
+
+    def etat(self):
+        """État à conserver dans un point de reprise (sérialisable en JSON), None si le filtre n'en a pas"""
+        return None
+
+    def restaurer(self, etat):
+        """Restauration d'un état retourné par etat()"""
+        pass
+
+    def traiter_lot(self, lot):
+        """Traitement d'un lot (DataFrame), enregistrement par enregistrement par défaut
+
+        Retourne le DataFrame des lignes acceptées, le masque des lignes rejetées
+        et les raisons du rejet, indexés comme le lot d'entrée.
+        """
+        import pandas as pd
+        acceptes = []
+        index_acceptes = []
+        rejet = pd.Series(False, index=lot.index)
+        raisons = pd.Series('', index=lot.index, dtype=object)
+        self.anomalies_lot = pd.Series('', index=lot.index, dtype=object)
+        self.erreurs_lot = pd.Series('', index=lot.index, dtype=object)
+        for index, entree in zip(lot.index, lot.to_dict(orient='records')):
+            donnees, anomalies = self.traiter(entree)
+            if anomalies:
+                self.anomalies_lot[index] = "; ".join(anomalies)
+            if donnees is None:
+                rejet[index] = True
+                self.erreurs_lot[index] = "; ".join(self.erreurs_rejet(entree))
+                raisons[index] = "; ".join(anomalies) or self.erreurs_lot[index]
+            else:
+                acceptes.append(_vers_dict(donnees))
+                index_acceptes.append(index)
+        return pd.DataFrame(acceptes, index=index_acceptes), rejet, raisons
+
 class FiltreValidation(Filtre):
     """Filtre de validation des données"""
-    def traiter(self, donnees):
-        erreurs = []
-        anomalies = []
+    def __init__(self, schema=None, arret_premiere_erreur=False, puits=None):
+        self.schema = SCHEMA_VALIDATION if schema is None else schema
+        self.arret_premiere_erreur = arret_premiere_erreur
+        self.puits = puits
+        self._valider = _compiler_schema(self.schema, arret_premiere_erreur)
+        # Une fonction par règle pour les lots, appliquée aux valeurs distinctes de son champ
+        self._valider_regles = [_compiler_schema([regle]) for regle in self.schema]
+
+    def __getstate__(self):
+        # Les règles compilées ne sont pas sérialisables : seul le schéma est transmis
+        return {'schema': self.schema, 'arret_premiere_erreur': self.arret_premiere_erreur,
+                'puits': self.puits}
+
+    def __setstate__(self, etat):
+        self.__init__(**etat)
+
+    def valider(self, donnees):
+        """Application des règles du schéma, retourne les erreurs et les anomalies"""
+        erreurs, anomalies, _ = self._valider(donnees)
+        return erreurs, anomalies
+
+    def erreurs_rejet(self, donnees):
+        # Les règles sont sans état : l'enregistrement rejeté est simplement revalidé
+        return self.valider(donnees)[0]
 
-        # Validation de l'ID du compteur
-        if not re.match(r'^\d{6}$', str(donnees['compteur_id'])):
-            erreurs.append("ID de compteur invalide")
-            anomalies.append("Tentative d'injection avec ID de compteur")
-
-        # Validation de l'horodatage
-        try:
-            datetime.fromisoformat(donnees['timestamp'])
-        except ValueError:
-            erreurs.append("Horodatage invalide")
-            anomalies.append("Tentative d'injection avec horodatage")
-
-        # Validation de la consommation
-        try:
-            consommation = float(donnees['consommation'].split()[0])
-            if consommation < 0 or consommation > 10000:
-                erreurs.append("Valeur de consommation invalide")
-        except ValueError:
-            erreurs.append("Valeur de consommation invalide")
-            anomalies.append("Tentative d'injection avec consommation")
-
-        # Validation du type de client
-        type_client = donnees['type_client'].lower()
-        if type_client not in ['residentiel', 'commercial', 'industriel']:
-            erreurs.append("Type de client invalide")
-            anomalies.append("Tentative d'injection avec type de client")
-
-        # Validation de la wilaya
-        if not all(x.isalpha() or x.isspace() for x in donnees['wilaya']):
-            erreurs.append("Wilaya invalide")
-            anomalies.append("Tentative d'injection avec wilaya")
-
-        # Validation de la ville
-        if not all(x.isalpha() or x.isspace() or x in ['"', "'"] for x in donnees['ville']):
-            erreurs.append("Ville invalide")
-            anomalies.append("Tentative d'injection avec ville")
-
-        # Validation de la localisation (latitude, longitude)
-        localisation_pattern = r'^-?\d+\.\d+,-?\d+\.\d+$'
-        if not re.match(localisation_pattern, donnees['localisation']):
-            erreurs.append("Localisation invalide")
-            anomalies.append("Tentative d'injection avec localisation")
-
-        # Validation de la région
-        if not donnees['region'].isalpha():
-            erreurs.append("Région invalide")
-            anomalies.append("Tentative d'injection avec région")
-
-        # Validation du code postal
-        if not re.match(r'^\d{5}$', str(donnees['code_postal'])):
-            erreurs.append("Code postal invalide")
-            anomalies.append("Tentative d'injection avec code postal")
-
-        # Validation du fournisseur
-        if not all(x.isalnum() or x.isspace() for x in donnees['fournisseur']):
-            erreurs.append("Fournisseur invalide")
-            anomalies.append("Tentative d'injection avec fournisseur")
-
-        # Validation du tarif
-        try:
-            tarif = float(donnees['tarif'])
-            if tarif <= 0:
-                erreurs.append("Tarif invalide")
-        except ValueError:
-            erreurs.append("Tarif invalide")
-            anomalies.append("Tentative d'injection avec tarif")
-
-        # Validation de la puissance souscrite
-        try:
-            puissance_souscrite = float(donnees['puissance_souscrite'].split()[0])
-            if puissance_souscrite <= 0:
-                erreurs.append("Puissance souscrite invalide")
-        except ValueError:
-            erreurs.append("Puissance souscrite invalide")
-            anomalies.append("Tentative d'injection avec puissance souscrite")
-
-        # Validation du type de compteur
-        if not all(x.isalnum() or x.isspace() for x in donnees['type_compteur']):
-            erreurs.append("Type de compteur invalide")
-            anomalies.append("Tentative d'injection avec type de compteur")
+    def traiter(self, donnees):
+        erreurs, anomalies, valeurs = self._valider(donnees)
 
         if erreurs:
-            for erreur in erreurs:
-                print("-", erreur)
+            # Les erreurs sont signalées par le pipeline (voir erreurs_rejet)
             return None, anomalies
 
-        return donnees, anomalies
+        # Les valeurs analysées pendant la validation sont conservées dans la mesure
+        return MesureCompteur.depuis_dict(donnees, valeurs), anomalies
+
+    def traiter_lot(self, lot):
+        """Validation d'un lot (DataFrame)
+
+        Chaque règle est évaluée une fois par valeur distincte de son champ, par la
+        même fonction compilée que pour un enregistrement isolé : les deux modes
+        acceptent et refusent les mêmes valeurs.
+        """
+        import numpy as np
+        import pandas as pd
+        rejet = np.zeros(len(lot), dtype=bool)
+        raisons = pd.Series('', index=lot.index, dtype=object)
+        anomalies = pd.Series('', index=lot.index, dtype=object)
+        for regle, valider in zip(self.schema, self._valider_regles):
+            champ = regle['champ']
+            colonne = lot[champ] if champ in lot else pd.Series(None, index=lot.index, dtype=object)
+            codes, distinctes = pd.factorize(colonne, use_na_sentinel=False)
+            resultats = [valider({champ: valeur}) for valeur in distinctes.tolist()]
+            echec = np.array([bool(erreurs) for erreurs, _, _ in resultats], dtype=bool)[codes]
+            suspect = np.array([bool(anomalies_valeur) for _, anomalies_valeur, _ in resultats], dtype=bool)[codes]
+            if self.arret_premiere_erreur:
+                echec &= ~rejet
+                suspect &= echec
+            rejet |= echec
+            raisons[echec] = raisons[echec] + regle['erreur'] + "; "
+            if suspect.any():
+                anomalies[suspect] = anomalies[suspect] + regle['anomalie'] + "; "
+        raisons = raisons.str.rstrip("; ")
+        self.anomalies_lot = anomalies.str.rstrip("; ")
+        self.erreurs_lot = raisons
+
+        rejet = pd.Series(rejet, index=lot.index)
+        return lot[~rejet], rejet, raisons
 
 class FiltreNormalisation(Filtre):
     """Filtre de normalisation des données"""
     def traiter(self, donnees):
-        # Conversion de l'unité de consommation en kWh
-        consommation, unite = donnees['consommation'].split()
-        consommation = float(consommation)
-        if unite == 'Wh':
-            consommation /= 1000
-        donnees['consommation'] = f"{consommation:.5f} kWh"
+        mesure = MesureCompteur.depuis(donnees)
+
+        # Conversion de l'unité de consommation en kWh, arrondie à la précision de la sortie
+        if mesure.unite == 'Wh':
+            mesure.consommation /= 1000
+        mesure.consommation = round(mesure.consommation, 5)
+        mesure.unite = 'kWh'
 
         # Normalisation du type de client
-        donnees['type_client'] = donnees['type_client'].capitalize()
+        mesure.type_client = mesure.type_client.capitalize()
 
         # Normalisation de la wilaya et de la ville
-        donnees['wilaya'] = donnees['wilaya'].upper()
-        donnees['ville'] = donnees['ville'].upper()
+        mesure.wilaya = mesure.wilaya.upper()
+        mesure.ville = mesure.ville.upper()
 
         # Normalisation du fournisseur
-        donnees['fournisseur'] = donnees['fournisseur'].replace(' ', '_').upper()
-
-        # Conversion de la puissance souscrite en float
-        puissance_souscrite = float(donnees['puissance_souscrite'].split()[0])
-        donnees['puissance_souscrite'] = puissance_souscrite
+        mesure.fournisseur = mesure.fournisseur.replace(' ', '_').upper()
 
         # Conversion du code postal en int
-        donnees['code_postal'] = int(donnees['code_postal'])
+        mesure.code_postal = int(mesure.code_postal)
 
-        # Conversion du tarif en float
-        donnees['tarif'] = float(donnees['tarif'])
+        # Les valeurs reçues ne sont plus sérialisées telles quelles
+        mesure.brut = None
 
-        return donnees, []
+        return mesure, []
+
+    def traiter_lot(self, lot):
+        """Normalisation vectorisée d'un lot (DataFrame)"""
+        import pandas as pd
+        # Conversion de l'unité de consommation en kWh
+        consommation = _consommation_kwh(lot['consommation'])
+
+        lot = lot.assign(
+            consommation=consommation.map("{:.5f} kWh".format),
+            type_client=_par_valeurs_distinctes(lot['type_client'], lambda valeurs: valeurs.str.capitalize()),
+            wilaya=_par_valeurs_distinctes(lot['wilaya'], lambda valeurs: valeurs.str.upper()),
+            ville=_par_valeurs_distinctes(lot['ville'], lambda valeurs: valeurs.str.upper()),
+            fournisseur=_par_valeurs_distinctes(lot['fournisseur'],
+                                                lambda valeurs: valeurs.str.replace(' ', '_').str.upper()),
+            puissance_souscrite=_premier_terme(lot['puissance_souscrite']).astype(float),
+            code_postal=lot['code_postal'].astype(int),
+            tarif=lot['tarif'].astype(float),
+        )
+        return lot, pd.Series(False, index=lot.index), pd.Series('', index=lot.index, dtype=object)
 
 class FiltreTransformation(Filtre):
     """Filtre de transformation des données"""
     def traiter(self, donnees):
-        # Calcul de la consommation pour 8 heures
-        consommation_kwh = float(donnees['consommation'].split()[0])
-        consommation_8h = consommation_kwh * 8
-        donnees['consommation_8h'] = f"{consommation_8h:.5f} kWh"
+        mesure = MesureCompteur.depuis(donnees)
+
+        # Calcul de la consommation pour 8 heures (mesure éventuellement non normalisée)
+        consommation_kwh = mesure.consommation_kwh()
+        mesure.consommation_8h = consommation_kwh * 8
 
         # Catégorisation des clients selon la consommation
         if consommation_kwh < 1.67:
-            donnees['categorie_client'] = 'Faible consommation'
+            mesure.categorie_client = 'Faible consommation'
         elif consommation_kwh < 6.67:
-            donnees['categorie_client'] = 'Consommation moyenne'
+            mesure.categorie_client = 'Consommation moyenne'
         else:
-            donnees['categorie_client'] = 'Forte consommation'
+            mesure.categorie_client = 'Forte consommation'
 
         # Ajout du ratio consommation/puissance souscrite
-        puissance_souscrite = donnees['puissance_souscrite']
-        ratio = consommation_kwh / puissance_souscrite
-        donnees['ratio_consommation'] = ratio
+        mesure.ratio_consommation = consommation_kwh / mesure.puissance_souscrite
+
+        return mesure, []
+
+    def traiter_lot(self, lot):
+        """Transformation vectorisée d'un lot (DataFrame)"""
+        import numpy as np
+        import pandas as pd
+        consommation_kwh = _consommation_kwh(lot['consommation'])
+
+        lot = lot.assign(
+            consommation_8h=(consommation_kwh * 8).map("{:.5f} kWh".format),
+            categorie_client=np.select(
+                [consommation_kwh < 1.67, consommation_kwh < 6.67],
+                ['Faible consommation', 'Consommation moyenne'],
+                'Forte consommation',
+            ),
+            ratio_consommation=consommation_kwh / _premier_terme(lot['puissance_souscrite']),
+        )
+        return lot, pd.Series(False, index=lot.index), pd.Series('', index=lot.index, dtype=object)
+
+class FiltreLimiteDebit(Filtre):
+    """Limitation du débit par source (seau à jetons), à placer en tête de pipeline
+
+    Chaque source (compteur_id par défaut) dispose d'un seau de `capacite` jetons
+    rechargé de `debit` jetons par seconde ; un message arrivant sur un seau vide est
+    rejeté avant les filtres coûteux. Seules les `nb_sources_max` sources les plus
+    récemment actives sont conservées (éviction LRU des sources inactives). Le
+    filtre précède la validation : un message sans source est rejeté.
+    """
+    def __init__(self, debit=1.0, capacite=10, champ_source='compteur_id',
+                 nb_sources_max=100_000, horloge=time.monotonic, puits=None):
+        self.debit = debit
+        self.capacite = capacite
+        self.champ_source = champ_source
+        self.nb_sources_max = nb_sources_max
+        self.horloge = horloge
+        # source -> [jetons, date de la dernière mise à jour, source limitée]
+        self.seaux = OrderedDict()
+        self.nb_rejets = 0
+        self.puits = puits
+
+    def _source(self, donnees):
+        if isinstance(donnees, MesureCompteur):
+            return getattr(donnees, self.champ_source, None)
+        return donnees.get(self.champ_source)
+
+    def erreurs_rejet(self, donnees):
+        if self._source(donnees) is None:
+            return ["Message sans source"]
+        return ["Débit excessif de la source"]
 
+    def traiter(self, donnees):
+        source = self._source(donnees)
+        if source is None:
+            self.nb_rejets += 1
+            return None, ["Message sans source"]
+        maintenant = self.horloge()
+
+        seau = self.seaux.get(source)
+        if seau is None:
+            if len(self.seaux) >= self.nb_sources_max:
+                self.seaux.popitem(last=False)
+            seau = self.seaux[source] = [self.capacite, maintenant, False]
+        else:
+            self.seaux.move_to_end(source)
+            seau[0] = min(self.capacite, seau[0] + (maintenant - seau[1]) * self.debit)
+            seau[1] = maintenant
+
+        if seau[0] < 1:
+            self.nb_rejets += 1
+            # Un seul avertissement par épisode de dépassement
+            if not seau[2]:
+                seau[2] = True
+                self.signaler("Débit excessif de la source : messages rejetés", source)
+            return None, ["Attaque DoS : débit excessif de la source"]
+
+        seau[0] -= 1
+        seau[2] = False
         return donnees, []
 
+    def etat(self):
+        # L'horloge est monotone : seul l'âge de la dernière mise à jour de chaque seau a un sens
+        maintenant = self.horloge()
+        return {'seaux': [[source, jetons, maintenant - date, limitee]
+                          for source, (jetons, date, limitee) in self.seaux.items()],
+                'nb_rejets': self.nb_rejets}
+
+    def restaurer(self, etat):
+        maintenant = self.horloge()
+        self.seaux = OrderedDict((source, [jetons, maintenant - age, limitee])
+                                 for source, jetons, age, limitee in etat['seaux'])
+        self.nb_rejets = etat['nb_rejets']
+
+class Pseudonymiseur:
+    """Pseudonymisation des identifiants avec mémoïsation bornée
+
+    L'empreinte est un SHA-256, ou un HMAC-SHA-256 si un secret est fourni (les
+    empreintes ne peuvent alors pas être recalculées sans le secret). Les dernières
+    `taille_cache` valeurs sont conservées dans un cache LRU.
+    """
+    def __init__(self, taille_cache=1024, secret=None):
+        self.taille_cache = taille_cache
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.cache = OrderedDict()
+        self.nb_succes = 0
+        self.nb_echecs = 0
+
+    def __call__(self, valeur):
+        empreinte = self.cache.get(valeur)
+        if empreinte is not None:
+            self.nb_succes += 1
+            self.cache.move_to_end(valeur)
+            return empreinte
+
+        self.nb_echecs += 1
+        texte = str(valeur).encode()
+        if self.secret is None:
+            empreinte = hashlib.sha256(texte).hexdigest()
+        else:
+            empreinte = hmac.new(self.secret, texte, hashlib.sha256).hexdigest()
+        self.cache[valeur] = empreinte
+        if len(self.cache) > self.taille_cache:
+            self.cache.popitem(last=False)
+        return empreinte
+
+    def statistiques(self):
+        """Succès, échecs et taille du cache"""
+        return {'succes': self.nb_succes, 'echecs': self.nb_echecs, 'taille': len(self.cache)}
+
+# Politiques appliquées par FiltreSecurite aux relevés arrivés en retard
+POLITIQUES_RETARD = ('accepter', 'rejeter', 'cote')
+
 class FiltreSecurite(Filtre):
-    """Filtre combiné pour la sécurité"""
-    def __init__(self):
+    """Filtre combiné pour la sécurité
+
+    Un relevé est en retard lorsque son horodatage précède de plus de
+    `retard_autorise` secondes le plus récent déjà reçu de son compteur (filigrane
+    par source, en temps de l'événement). Selon `politique_retard`, il est signalé
+    puis accepté, rejeté, ou dérivé vers `sortie_retard` (sortie secondaire).
+    """
+    def __init__(self, taille_cache=1024, secret=None, puits=None, retard_autorise=10.0,
+                 politique_retard='accepter', sortie_retard=None, nb_sources_max=100_000):
+        if politique_retard not in POLITIQUES_RETARD:
+            raise ValueError(f"Politique de retard inconnue : {politique_retard}")
+        if politique_retard == 'cote' and sortie_retard is None:
+            raise ValueError("La politique 'cote' nécessite une sortie_retard")
+        self.puits = puits
         self.traffic_count = 0
         self.start_time = time.time()
+        self.pseudonymiser = Pseudonymiseur(taille_cache, secret)
+        self.retard_autorise = retard_autorise
+        self.politique_retard = politique_retard
+        self.sortie_retard = sortie_retard
+        self.filigranes = FiligranesSources(nb_sources_max)
+        self.nb_retards = 0
 
     def traiter(self, donnees):
+        mesure = MesureCompteur.depuis(donnees)
+
         # Détection d'attaques DoS
         self.traffic_count += 1
         current_time = time.time()
@@ -180,74 +687,291 @@ class FiltreSecurite(Filtre):
 
         if elapsed_time < 60:  # Surveillance sur une période de 60 secondes
             if self.traffic_count > 1000:  # Seuil de trafic suspect
-                logging.warning("Attaque DoS détectée : trafic anormalement élevé")
+                self.signaler("Attaque DoS détectée : trafic anormalement élevé", details=self.traffic_count)
         else:
             self.traffic_count = 0
             self.start_time = current_time
 
-        # Détection de retard de message
-        timestamp_envoi = datetime.fromisoformat(donnees['timestamp'])
-        timestamp_reception = datetime.now()
-        delai_transmission = (timestamp_reception - timestamp_envoi).total_seconds()
-
-        if delai_transmission > 10:  # Seuil de retard suspect
-            logging.warning(f"Retard de message détecté : {delai_transmission} secondes")
+        # Détection de retard de message, par rapport au filigrane du compteur
+        retard = self.filigranes.observer(mesure.compteur_id, mesure.horodatage)
 
         # Limitation de l'exposition
-        donnees['compteur_id'] = hashlib.sha256(donnees['compteur_id'].encode()).hexdigest()
-        donnees['fournisseur'] = hashlib.sha256(donnees['fournisseur'].encode()).hexdigest()
-        donnees['type_compteur'] = hashlib.sha256(donnees['type_compteur'].encode()).hexdigest()
-
-        return donnees, []
+        mesure.compteur_id = self.pseudonymiser(mesure.compteur_id)
+        mesure.fournisseur = self.pseudonymiser(mesure.fournisseur)
+        mesure.type_compteur = self.pseudonymiser(mesure.type_compteur)
+
+        if retard > self.retard_autorise:
+            self.nb_retards += 1
+            if self.politique_retard == 'rejeter':
+                return None, ["Relevé arrivé en retard"]
+            if self.politique_retard == 'cote':
+                self.sortie_retard(mesure.vers_dict())
+                return None, ["Relevé arrivé en retard dérivé vers la sortie secondaire"]
+            self.signaler("Relevé arrivé en retard", mesure.compteur_id, retard)
+
+        return mesure, []
+
+    def etat(self):
+        # Le cache de pseudonymisation se reconstitue : les empreintes ne dépendent que du secret
+        return {'traffic_count': self.traffic_count, 'start_time': self.start_time,
+                'filigranes': self.filigranes.etat(), 'nb_retards': self.nb_retards}
+
+    def restaurer(self, etat):
+        self.traffic_count = etat['traffic_count']
+        self.start_time = etat['start_time']
+        self.filigranes.restaurer(etat['filigranes'])
+        self.nb_retards = etat['nb_retards']
 
 class Pipeline:
-    """Pipeline de filtres"""
-    def __init__(self, filtres):
+    """Pipeline de filtres
+
+    Si un objet de statistiques (statistiques.StatistiquesPipeline) est fourni, la
+    durée de chaque filtre, les rejets et les anomalies y sont enregistrés ; sans
+    lui, aucune mesure n'est effectuée.
+
+    Les erreurs et anomalies sont signalées dans `puits` (anomalies.PuitsAnomalies,
+    créé par défaut), également attribué aux filtres qui n'en ont pas. Si un écrivain
+    de lettres mortes (lettres_mortes.EcrivainLettresMortes) est fourni, les
+    enregistrements rejetés y sont conservés tels qu'ils ont été reçus.
+    """
+    def __init__(self, filtres, statistiques=None, puits=None, lettres_mortes=None):
         self.filtres = filtres
-
-    def traiter(self, donnees):
+        self.statistiques = statistiques
+        self.lettres_mortes = lettres_mortes
+        self.puits = PuitsAnomalies() if puits is None else puits
+        for filtre in filtres:
+            if filtre.puits is None:
+                filtre.puits = self.puits
+        # Bilan du dernier flux traité par traiter_flux
+        self.nb_rejets = 0
+        self.bilan_anomalies = Counter()
+        # Erreurs et anomalies des lignes rejetées du dernier lot traité par traiter_lot
+        self.erreurs_lot = None
+        self.anomalies_lot = None
+
+    def etat(self):
+        """États des filtres, dans l'ordre du pipeline (voir Filtre.etat)"""
+        return [filtre.etat() for filtre in self.filtres]
+
+    def restaurer(self, etats):
+        if len(etats) != len(self.filtres):
+            raise ValueError(f"{len(etats)} états pour {len(self.filtres)} filtres")
+        for filtre, etat in zip(self.filtres, etats):
+            if etat is not None:
+                filtre.restaurer(etat)
+
+    def _appliquer_filtres(self, donnees):
+        if self.statistiques is not None:
+            return self._appliquer_filtres_mesures(donnees)
         erreurs = []
         anomalies = []
         for filtre in self.filtres:
-            donnees, anomalies_filtre = filtre.traiter(donnees)
+            entree, (donnees, anomalies_filtre) = donnees, filtre.traiter(donnees)
             if donnees is None:
-                erreurs.append(f"Erreur dans le filtre {filtre.__class__.__name__}")
+                erreurs.extend(filtre.erreurs_rejet(entree))
                 anomalies.extend(anomalies_filtre)
                 break
+        return donnees, erreurs, anomalies
 
-        if erreurs:
-            logging.warning(f"Erreurs rencontrées : {erreurs}")
-        if anomalies:
-            logging.warning(f"Anomalies détectées : {anomalies}")
+    def _appliquer_filtres_mesures(self, donnees):
+        statistiques = self.statistiques
+        erreurs = []
+        anomalies = []
+        nom_filtre_rejet = None
+        for filtre in self.filtres:
+            nom = filtre.__class__.__name__
+            debut = time.perf_counter_ns()
+            entree, (donnees, anomalies_filtre) = donnees, filtre.traiter(donnees)
+            statistiques.enregistrer_filtre(nom, time.perf_counter_ns() - debut)
+            if anomalies_filtre:
+                statistiques.enregistrer_anomalies(anomalies_filtre)
+            if donnees is None:
+                erreurs.extend(filtre.erreurs_rejet(entree))
+                anomalies.extend(anomalies_filtre)
+                nom_filtre_rejet = nom
+                break
+        statistiques.enregistrer_resultat(nom_filtre_rejet)
+        return donnees, erreurs, anomalies
 
-        return donnees
+    def _signaler_rejet(self, entree, erreurs, anomalies):
+        source = entree.get('compteur_id') if isinstance(entree, dict) else None
+        self.puits.signaler_tout(erreurs, source)
+        self.puits.signaler_tout(anomalies, source)
+        if self.lettres_mortes is not None:
+            self.lettres_mortes.ecrire(entree, erreurs, anomalies)
 
-# Création des filtres
-filtre_validation = FiltreValidation()
-filtre_normalisation = FiltreNormalisation()
-filtre_transformation = FiltreTransformation()
-filtre_securite = FiltreSecurite()
-
-# Création du pipeline
-pipeline = Pipeline([filtre_validation, filtre_normalisation, filtre_transformation, filtre_securite])
-
-# Exemple de données d'entrée
-donnees = {
-    'compteur_id': '123456',
-    'timestamp': '2024-05-26T14:00:00',
-    'consommation': '5000 Wh',
-    'type_client': 'Residentiel',
-    'wilaya': 'Alger',
-    'ville': 'Alger',
-    'localisation': '36.7538,3.0588',
-    'region': 'Centre',
-    'code_postal': '16000',
-    'fournisseur': 'Sonelgaz',
-    'tarif': '4.5',
-    'puissance_souscrite': '10 kW',
-    'type_compteur': 'Electronique'
-}
-
-# Traitement des données via le pipeline
-donnees_traitees = pipeline.traiter(donnees)
-print(donnees_traitees)
+    def traiter(self, donnees):
+        entree = _instantane(donnees)
+        donnees, erreurs, anomalies = self._appliquer_filtres(donnees)
+        if donnees is None:
+            self._signaler_rejet(_vers_dict(entree), erreurs, anomalies)
+        return _vers_dict(donnees)
+
+    def traiter_flux(self, flux, vider=True):
+        """Traitement paresseux d'un flux d'enregistrements
+
+        Génère les enregistrements acceptés au fil de l'eau ; le nombre de rejets
+        et le bilan des anomalies sont journalisés à la fin du flux. Comme pour
+        PipelineEtages, les filtres qui accumulent (FiltreAgregation...) sont vidés
+        en fin de flux, sauf avec `vider=False` (flux poursuivi à l'appel suivant).
+        """
+        self.nb_rejets = 0
+        self.bilan_anomalies = Counter()
+        for donnees in flux:
+            entree = _instantane(donnees)
+            donnees, erreurs, anomalies = self._appliquer_filtres(donnees)
+            if donnees is None:
+                self.nb_rejets += 1
+                self.bilan_anomalies.update(anomalies)
+                self._signaler_rejet(_vers_dict(entree), erreurs, anomalies)
+            else:
+                yield _vers_dict(donnees)
+
+        if vider:
+            for filtre in self.filtres:
+                if hasattr(filtre, 'vider'):
+                    filtre.vider()
+        if self.nb_rejets:
+            journal.warning("Enregistrements rejetés : %d", self.nb_rejets)
+        if self.bilan_anomalies:
+            journal.warning("Bilan des anomalies : %s", self.bilan_anomalies)
+
+    def traiter_lot(self, lot):
+        """Traitement d'un lot (DataFrame) par tous les filtres
+
+        Retourne le DataFrame des lignes acceptées, le masque des lignes rejetées
+        et les raisons du rejet, indexés comme le lot d'entrée. Les erreurs et
+        anomalies des lignes rejetées sont conservées dans `erreurs_lot` et
+        `anomalies_lot`, comme dans les lettres mortes.
+        """
+        import pandas as pd
+        if not lot.index.is_unique:
+            lot = lot.reset_index(drop=True)
+        entree = lot
+
+        masque_rejet = pd.Series(False, index=lot.index)
+        raisons = pd.Series('', index=lot.index, dtype=object)
+        # Erreurs et anomalies des lignes rejetées, comme en traitement par enregistrement
+        self.erreurs_lot = pd.Series('', index=lot.index, dtype=object)
+        self.anomalies_lot = pd.Series('', index=lot.index, dtype=object)
+        for filtre in self.filtres:
+            if lot.empty:
+                break
+            nb = len(lot)
+            debut = time.perf_counter_ns()
+            lot, rejet, raisons_filtre = filtre.traiter_lot(lot)
+            rejetes = rejet.index[rejet.to_numpy()]
+            masque_rejet[rejetes] = True
+            raisons[rejetes] = raisons_filtre[rejetes]
+            anomalies_filtre = filtre.anomalies_lot
+            if anomalies_filtre is None:
+                anomalies_filtre = raisons_filtre[rejetes]
+            if len(rejetes):
+                self.anomalies_lot[rejetes] = anomalies_filtre[rejetes]
+                self.erreurs_lot[rejetes] = (f"Erreur dans le filtre {filtre.__class__.__name__}"
+                                             if filtre.erreurs_lot is None else filtre.erreurs_lot[rejetes])
+
+            if self.statistiques is not None:
+                # Mêmes mesures qu'enregistrement par enregistrement : un appel par
+                # enregistrement, anomalies seulement (pas les messages d'erreur)
+                nom = filtre.__class__.__name__
+                self.statistiques.enregistrer_filtre(nom, time.perf_counter_ns() - debut, nb)
+                if len(rejetes):
+                    self.statistiques.enregistrer_resultat(nom, len(rejetes))
+                for anomalies in anomalies_filtre[anomalies_filtre != '']:
+                    self.statistiques.enregistrer_anomalies(anomalies.split("; "))
+
+        if self.statistiques is not None:
+            self.statistiques.enregistrer_resultat(nb=len(lot))
+
+        nb_rejets = int(masque_rejet.sum())
+        if nb_rejets:
+            journal.warning("%d enregistrement(s) rejeté(s) sur %d", nb_rejets, len(masque_rejet))
+            sources = entree['compteur_id'][masque_rejet] if 'compteur_id' in entree else [None] * nb_rejets
+            erreurs, anomalies = self.erreurs_lot[masque_rejet], self.anomalies_lot[masque_rejet]
+            for source, erreurs_ligne, anomalies_ligne in zip(sources, erreurs, anomalies):
+                self.puits.signaler_tout(erreurs_ligne.split("; "), source)
+                if anomalies_ligne:
+                    self.puits.signaler_tout(anomalies_ligne.split("; "), source)
+            if self.lettres_mortes is not None:
+                self.lettres_mortes.ecrire_lot(entree[masque_rejet], erreurs, anomalies)
+
+        return lot, masque_rejet, raisons
+
+# Pipeline propre à chaque processus de travail, construit une seule fois par processus
+_pipeline_processus = None
+
+def _initialiser_processus(filtres):
+    """Initialisation d'un processus de travail : les filtres ne sont transmis qu'une fois"""
+    global _pipeline_processus
+    # Puits déjà attribué aux filtres par le pipeline d'origine (copie propre au processus)
+    _pipeline_processus = Pipeline(filtres, puits=next((filtre.puits for filtre in filtres
+                                                        if filtre.puits is not None), None))
+
+def _traiter_morceau(morceau):
+    """Traitement d'un morceau d'enregistrements dans un processus de travail"""
+    return [_pipeline_processus.traiter(donnees) for donnees in morceau]
+
+class PipelineParallele:
+    """Pipeline de filtres réparti sur plusieurs processus
+
+    Chaque processus possède sa propre copie des filtres : l'état des filtres
+    (par exemple les compteurs de FiltreSecurite) est donc propre à chaque processus.
+    """
+    def __init__(self, filtres, nb_processus=None, taille_morceau=1000):
+        self.filtres = filtres
+        self.nb_processus = nb_processus or os.cpu_count()
+        self.taille_morceau = taille_morceau
+
+    def _morceaux(self, donnees):
+        iterateur = iter(donnees)
+        while True:
+            morceau = list(islice(iterateur, self.taille_morceau))
+            if not morceau:
+                return
+            yield morceau
+
+    def traiter_tout(self, donnees):
+        """Traitement d'une séquence d'enregistrements, résultats dans l'ordre d'entrée"""
+        from concurrent.futures import ProcessPoolExecutor
+        resultats = []
+        with ProcessPoolExecutor(max_workers=self.nb_processus,
+                                 initializer=_initialiser_processus,
+                                 initargs=(self.filtres,)) as executeur:
+            for resultats_morceau in executeur.map(_traiter_morceau, self._morceaux(donnees)):
+                resultats.extend(resultats_morceau)
+        return resultats
+
+if __name__ == '__main__':
+    # Configuration du logging pour afficher les avertissements dans la console
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Création des filtres
+    filtre_validation = FiltreValidation()
+    filtre_normalisation = FiltreNormalisation()
+    filtre_transformation = FiltreTransformation()
+    filtre_securite = FiltreSecurite()
+
+    # Création du pipeline
+    pipeline = Pipeline([filtre_validation, filtre_normalisation, filtre_transformation, filtre_securite])
+
+    # Exemple de données d'entrée
+    donnees = {
+        'compteur_id': '123456',
+        'timestamp': '2024-05-26T14:00:00',
+        'consommation': '5000 Wh',
+        'type_client': 'Residentiel',
+        'wilaya': 'Alger',
+        'ville': 'Alger',
+        'localisation': '36.7538,3.0588',
+        'region': 'Centre',
+        'code_postal': '16000',
+        'fournisseur': 'Sonelgaz',
+        'tarif': '4.5',
+        'puissance_souscrite': '10 kW',
+        'type_compteur': 'Electronique'
+    }
+
+    # Traitement des données via le pipeline
+    donnees_traitees = pipeline.traiter(donnees)
+    print(donnees_traitees)
@@ -1,33 +1,23 @@
-import pandas as pd
-import numpy as np
 from Pipe_filter import Pipeline, FiltreValidation, FiltreNormalisation, FiltreTransformation
-
-# Lire les données CSV
-df = pd.read_csv('Pipe-Filter/dataset_consommation_energie_algerie.csv')
-
-# Convertir le DataFrame en une liste de dictionnaires
-donnees_brutes = df.to_dict(orient='records')
-
-# Diviser les données en deux parties de taille égale
-donnees_parts = np.array_split(donnees_brutes, 2)
-donnees_part1, donnees_part2 = donnees_parts
-
-# Créer deux instances du pipeline
-pipeline1 = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()])
-pipeline2 = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()])
-
-# Traiter chaque partie des données brutes avec un pipeline distinct
-donnees_traitees_part1 = [pipeline1.traiter(donnees) for donnees in donnees_part1]
-donnees_traitees_part2 = [pipeline2.traiter(donnees) for donnees in donnees_part2]
-
-# Combiner les deux parties traitées
-donnees_traitees = donnees_traitees_part1 + donnees_traitees_part2
-
-# Filtrer les résultats pour enlever les entrées traitées sans erreurs (None)
-donnees_traitees = [donnees for donnees in donnees_traitees if donnees is not None]
-
-# Convertir les données traitées en DataFrame
-df_traite = pd.DataFrame(donnees_traitees)
-
-# Sauvegarder le DataFrame traité en CSV
-df_traite.to_csv('Pipe-Filter/dataset_consommation_energie_algerie_traite.csv', index=False)
\ No newline at end of file
+from ingestion_incrementale import traiter_csv_incremental
+from lettres_mortes import EcrivainLettresMortes
+import logging
+
+# Configuration du logging pour afficher les avertissements dans la console
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Créer le pipeline ; les enregistrements rejetés sont conservés pour être rejoués
+# (python lettres_mortes.py ...)
+lettres_mortes = EcrivainLettresMortes('Pipe-Filter/dataset_consommation_energie_algerie_rejets.jsonl')
+pipeline = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()],
+                    lettres_mortes=lettres_mortes)
+
+# Traiter par morceaux (lots vectorisés) les seules lignes ajoutées depuis l'exécution
+# précédente et les ajouter à la sortie ; les relevés déjà traités sont écartés
+traiter_csv_incremental(
+    pipeline,
+    'Pipe-Filter/dataset_consommation_energie_algerie.csv',
+    'Pipe-Filter/dataset_consommation_energie_algerie_traite.csv',
+    taille_morceau=50_000,
+)
+lettres_mortes.fermer()
@@ -1,4 +1,5 @@
 import socket
+from tramage import recevoir_trame, envoyer_trame, TrameTropGrande, MESSAGE_PANNE
 
 # Définir l'adresse et le port du serveur
 HOST = '192.168.43.202'  # Adresse IP du serveur
@@ -15,21 +16,12 @@ with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
         simuler_panne = input("Voulez-vous simuler une panne ? (o/n) ").lower()
 
         if simuler_panne == "o":
-            # Envoyer un message de panne au serveur
-            message_panne = "enpanne"
-            client_socket.sendall(message_panne.encode())
+            # Envoyer un message de panne au serveur (trame comme les relevés)
+            envoyer_trame(client_socket, MESSAGE_PANNE)
             print("Message de panne envoyé au serveur.")
         else:
-            # Recevoir les données du serveur
-            taille_fichier_bytes = client_socket.recv(4)
-            taille_fichier = int.from_bytes(taille_fichier_bytes, byteorder='big')
-
-            donnees_recues = b''
-            while len(donnees_recues) < taille_fichier:
-                paquet = client_socket.recv(4096)
-                if not paquet:
-                    break
-                donnees_recues += paquet
+            # Recevoir les données du serveur (taille puis contenu exact)
+            donnees_recues = recevoir_trame(client_socket)
             print("Message recu du  serveur.")
             # Traiter les données reçues
              
@@ -38,6 +30,9 @@ with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
     except socket.error as e:
         print(f"Erreur de socket : {e}")
 
+    except TrameTropGrande as e:
+        print(f"Trame refusée : {e}")
+
     finally:
         # Fermer la connexion
         client_socket.close()
\ No newline at end of file
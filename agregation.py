@@ -0,0 +1,197 @@
+from collections import deque
+from datetime import datetime, timezone
+from Pipe_filter import Filtre, MesureCompteur, _consommation_kwh, _premier_terme, _texte
+
+# Agrégation de la consommation par fenêtres de temps (temps de l'événement), au fil
+# du flux. Les relevés sont cumulés dans des panneaux de `pas` secondes ; une fenêtre
+# de `taille` secondes est la combinaison des taille / pas derniers panneaux fermés
+# (fenêtre fixe si pas == taille, glissante sinon). Un panneau ne contient qu'un
+# cumul [somme, nombre, maximum, puissance souscrite] par clé : l'état est
+# proportionnel au nombre de clés, jamais à l'historique.
+
+NIVEAUX = ('compteur_id', 'wilaya', 'region')
+
+EPOQUE = datetime(1970, 1, 1)
+
+def _secondes(horodatage):
+    """Horodatage en secondes depuis l'epoch (les horodatages sans fuseau sont en UTC)"""
+    if horodatage.tzinfo is not None:
+        horodatage = horodatage.astimezone(timezone.utc).replace(tzinfo=None)
+    return (horodatage - EPOQUE).total_seconds()
+
+def _cumuler(cumuls, cle, somme, nb, maximum, puissance):
+    cumul = cumuls.get(cle)
+    if cumul is None:
+        cumuls[cle] = [somme, nb, maximum, puissance]
+    else:
+        cumul[0] += somme
+        cumul[1] += nb
+        if maximum > cumul[2]:
+            cumul[2] = maximum
+        cumul[3] = puissance
+
+class FiltreAgregation(Filtre):
+    """Agrégation par fenêtres de la consommation par compteur, wilaya et région
+
+    Les relevés traversent le filtre sans modification. Une fenêtre est émise
+    lorsque le filigrane (horodatage maximal vu moins `retard_max`) dépasse sa
+    fin : vers `sortie` si elle est fournie, sinon dans `fenetres` (voir extraire).
+    Un relevé arrivant après la fermeture de son panneau n'est pas compté.
+    """
+    def __init__(self, taille=3600, pas=None, niveaux=NIVEAUX, retard_max=0, sortie=None, puits=None):
+        self.taille = taille
+        self.pas = pas or taille
+        if self.taille % self.pas:
+            raise ValueError("La taille de la fenêtre doit être un multiple du pas")
+        self.niveaux = niveaux
+        self.retard_max = retard_max
+        self.sortie = sortie
+        self.puits = puits
+        self.fenetres = []
+        self.nb_retardataires = 0
+        # début du panneau -> {(niveau, clé): [somme, nombre, maximum, puissance souscrite]}
+        self._panneaux = {}
+        # Derniers panneaux fermés, encore nécessaires aux fenêtres glissantes
+        self._fermes = deque()
+        self._prochaine_fin = None
+        self._filigrane = float('-inf')
+
+    def traiter(self, donnees):
+        mesure = MesureCompteur.depuis(donnees)
+        instant = _secondes(mesure.horodatage)
+        debut = instant - instant % self.pas
+
+        if self._prochaine_fin is not None and debut < self._prochaine_fin - self.pas:
+            self.nb_retardataires += 1
+            self.signaler("Relevé arrivé après la fermeture de sa fenêtre", mesure.compteur_id)
+            return mesure, []
+
+        consommation = mesure.consommation_kwh()
+        cumuls = self._panneaux.get(debut)
+        if cumuls is None:
+            cumuls = self._panneaux[debut] = {}
+            if self._prochaine_fin is None:
+                self._prochaine_fin = debut + self.pas
+        for niveau in self.niveaux:
+            puissance = mesure.puissance_souscrite if niveau == 'compteur_id' else None
+            _cumuler(cumuls, (niveau, getattr(mesure, niveau)), consommation, 1, consommation, puissance)
+
+        if instant - self.retard_max > self._filigrane:
+            self._filigrane = instant - self.retard_max
+            self._avancer(self._filigrane)
+        return mesure, []
+
+    def traiter_lot(self, lot):
+        """Agrégation vectorisée d'un lot (DataFrame), transmis sans modification"""
+        import pandas as pd
+        # Comme _secondes : les horodatages sans fuseau sont en UTC, les autres y sont convertis
+        instants = pd.to_datetime(_texte(lot['timestamp']), format='ISO8601', errors='coerce', utc=True)
+        horodates = instants.notna().to_numpy()
+        instants = instants.dt.tz_localize(None).astype('datetime64[s]').astype('int64').to_numpy()
+        debuts = instants - instants % self.pas
+        consommation = _consommation_kwh(lot['consommation']).to_numpy()
+
+        # Les relevés sans horodatage lisible ne sont rattachés à aucun panneau
+        ecartes = ~horodates
+        if self._prochaine_fin is not None:
+            en_retard = horodates & (debuts < self._prochaine_fin - self.pas)
+            self.nb_retardataires += int(en_retard.sum())
+            ecartes |= en_retard
+
+        valides = pd.DataFrame({'debut': debuts, 'consommation': consommation})[~ecartes]
+        for niveau in self.niveaux:
+            valides['cle'] = lot[niveau].to_numpy()[~ecartes]
+            groupes = valides.groupby(['debut', 'cle'], sort=False)['consommation'].agg(['sum', 'count', 'max'])
+            if niveau == 'compteur_id':
+                puissances = _premier_terme(lot['puissance_souscrite']).to_numpy()[~ecartes]
+                groupes['puissance'] = (valides.assign(puissance=puissances)
+                                        .groupby(['debut', 'cle'], sort=False)['puissance'].last())
+            else:
+                groupes['puissance'] = None
+            for (debut, cle), somme, nb, maximum, puissance in zip(groupes.index, groupes['sum'], groupes['count'],
+                                                                  groupes['max'], groupes['puissance']):
+                cumuls = self._panneaux.setdefault(int(debut), {})
+                _cumuler(cumuls, (niveau, cle), somme, nb, maximum, puissance)
+
+        if len(valides):
+            if self._prochaine_fin is None:
+                self._prochaine_fin = min(self._panneaux) + self.pas
+            filigrane = int(instants[~ecartes].max()) - self.retard_max
+            if filigrane > self._filigrane:
+                self._filigrane = filigrane
+                self._avancer(filigrane)
+        return lot, pd.Series(False, index=lot.index), pd.Series('', index=lot.index, dtype=object)
+
+    def _avancer(self, filigrane):
+        """Fermeture des panneaux terminés avant le filigrane et émission des fenêtres"""
+        while self._prochaine_fin is not None and self._prochaine_fin <= filigrane:
+            fin = self._prochaine_fin
+            cumuls = self._panneaux.pop(fin - self.pas, None)
+            if cumuls:
+                self._fermes.append((fin - self.pas, cumuls))
+            while self._fermes and self._fermes[0][0] < fin - self.taille:
+                self._fermes.popleft()
+            if self._fermes:
+                self._emettre(fin - self.taille, fin)
+                self._prochaine_fin = fin + self.pas
+            elif self._panneaux:
+                # Aucune donnée avant le prochain panneau : saut direct
+                self._prochaine_fin = min(self._panneaux) + self.pas
+            else:
+                self._prochaine_fin = fin + self.pas
+                return
+
+    def _emettre(self, debut, fin):
+        if len(self._fermes) == 1:
+            fenetre = self._fermes[0][1]
+        else:
+            fenetre = {}
+            for _, cumuls in self._fermes:
+                for cle, (somme, nb, maximum, puissance) in cumuls.items():
+                    _cumuler(fenetre, cle, somme, nb, maximum, puissance)
+
+        debut_iso = datetime.fromtimestamp(debut, timezone.utc).replace(tzinfo=None).isoformat()
+        fin_iso = datetime.fromtimestamp(fin, timezone.utc).replace(tzinfo=None).isoformat()
+        for (niveau, cle), (somme, nb, maximum, puissance) in fenetre.items():
+            resultat = {
+                'niveau': niveau,
+                'cle': cle,
+                'debut': debut_iso,
+                'fin': fin_iso,
+                'consommation_kwh': somme,
+                'nb_releves': nb,
+                'consommation_max_kwh': maximum,
+                'puissance_souscrite': puissance,
+                'ratio_pic': maximum / puissance if puissance else None,
+            }
+            if self.sortie is not None:
+                self.sortie(resultat)
+            else:
+                self.fenetres.append(resultat)
+
+    def etat(self):
+        def cumuls_liste(cumuls):
+            return [[niveau, cle, *cumul] for (niveau, cle), cumul in cumuls.items()]
+        return {'panneaux': [[debut, cumuls_liste(cumuls)] for debut, cumuls in self._panneaux.items()],
+                'fermes': [[debut, cumuls_liste(cumuls)] for debut, cumuls in self._fermes],
+                'prochaine_fin': self._prochaine_fin, 'filigrane': self._filigrane,
+                'fenetres': self.fenetres, 'nb_retardataires': self.nb_retardataires}
+
+    def restaurer(self, etat):
+        def cumuls_dict(cumuls):
+            return {(niveau, cle): cumul for niveau, cle, *cumul in cumuls}
+        self._panneaux = {debut: cumuls_dict(cumuls) for debut, cumuls in etat['panneaux']}
+        self._fermes = deque((debut, cumuls_dict(cumuls)) for debut, cumuls in etat['fermes'])
+        self._prochaine_fin = etat['prochaine_fin']
+        self._filigrane = etat['filigrane']
+        self.fenetres = etat['fenetres']
+        self.nb_retardataires = etat['nb_retardataires']
+
+    def extraire(self):
+        """Fenêtres fermées depuis le dernier appel (si aucune sortie n'est fournie)"""
+        fenetres, self.fenetres = self.fenetres, []
+        return fenetres
+
+    def vider(self):
+        """Fermeture de toutes les fenêtres en cours (fin du flux)"""
+        self._avancer(float('inf'))
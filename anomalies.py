@@ -0,0 +1,149 @@
+import atexit
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+# Puits des anomalies signalées par les filtres et le pipeline. Un signalement ne
+# coûte qu'un ajout dans une file circulaire et un compteur : aucun message n'est
+# mis en forme ni écrit à ce moment-là. Les avertissements sont regroupés par type
+# (au plus un par intervalle, avec le nombre d'occurrences masquées) et l'écriture
+# dans le fichier se fait par lots dans un fil d'exécution dédié.
+
+journal = logging.getLogger(__name__)
+
+class PuitsAnomalies:
+    """Collecte des anomalies : file circulaire, compteurs et écriture asynchrone
+
+    Les `capacite` dernières anomalies sont conservées en mémoire. Si un chemin est
+    fourni, les anomalies y sont ajoutées (une ligne JSON par anomalie) par lots de
+    `taille_lot` ou toutes les `intervalle_vidage` secondes ; si l'écriture ne suit
+    pas, au plus `capacite` anomalies attendent et les plus anciennes sont perdues.
+    """
+    def __init__(self, chemin=None, capacite=10_000, taille_lot=1000, intervalle_vidage=1.0,
+                 intervalle_avertissement=10.0, horloge=time.monotonic):
+        self.chemin = chemin
+        self.capacite = capacite
+        self.taille_lot = taille_lot
+        self.intervalle_vidage = intervalle_vidage
+        self.intervalle_avertissement = intervalle_avertissement
+        self.horloge = horloge
+        self.recentes = deque(maxlen=capacite)
+        self.compteurs = Counter()
+        self.nb_pertes = 0
+        # type d'anomalie -> [date du dernier avertissement, occurrences masquées depuis]
+        self._avertissements = {}
+        self._en_attente = deque()
+        self._verrou = threading.Lock()
+        self._reveil = threading.Event()
+        self._arret = False
+        self._ecrivain = None
+
+    def __getstate__(self):
+        # Seule la configuration est transmise (par exemple aux processus de travail)
+        return {'chemin': self.chemin, 'capacite': self.capacite, 'taille_lot': self.taille_lot,
+                'intervalle_vidage': self.intervalle_vidage,
+                'intervalle_avertissement': self.intervalle_avertissement}
+
+    def __setstate__(self, etat):
+        self.__init__(**etat)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def signaler(self, anomalie, source=None, details=None):
+        """Enregistrement d'une anomalie, sans mise en forme ni écriture immédiate
+
+        Le puits peut être partagé entre fils d'exécution (étages de PipelineEtages,
+        collecte des rejets) : les compteurs sont mis à jour sous verrou.
+        """
+        evenement = (time.time(), anomalie, source, details)
+        with self._verrou:
+            self.recentes.append(evenement)
+            self.compteurs[anomalie] += 1
+            masquees = self._a_avertir(anomalie)
+            if self.chemin is not None:
+                if len(self._en_attente) >= self.capacite:
+                    self._en_attente.popleft()
+                    self.nb_pertes += 1
+                self._en_attente.append(evenement)
+                nb_en_attente = len(self._en_attente)
+
+        # Mise en forme différée : les arguments ne sont formatés que si le message est émis
+        if masquees:
+            journal.warning("%s (source : %s, détails : %s) ; %d occurrence(s) non affichée(s) depuis %.0f s",
+                            anomalie, source, details, masquees, self.intervalle_avertissement)
+        elif masquees is not None:
+            journal.warning("%s (source : %s, détails : %s)", anomalie, source, details)
+
+        if self.chemin is not None:
+            if self._ecrivain is None:
+                self._demarrer()
+            if nb_en_attente >= self.taille_lot:
+                self._reveil.set()
+
+    def signaler_tout(self, anomalies, source=None):
+        for anomalie in anomalies:
+            self.signaler(anomalie, source)
+
+    def _a_avertir(self, anomalie):
+        """Nombre d'occurrences masquées à mentionner si un avertissement est dû, None sinon (sous verrou)"""
+        maintenant = self.horloge()
+        etat = self._avertissements.get(anomalie)
+        if etat is None:
+            etat = self._avertissements[anomalie] = [maintenant, 0]
+        elif maintenant - etat[0] < self.intervalle_avertissement:
+            etat[1] += 1
+            return None
+        else:
+            etat[0] = maintenant
+        masquees, etat[1] = etat[1], 0
+        return masquees
+
+    def _demarrer(self):
+        with self._verrou:
+            if self._ecrivain is not None:
+                return
+            self._ecrivain = threading.Thread(target=self._ecrire_en_continu, daemon=True)
+            self._ecrivain.start()
+        atexit.register(self.fermer)
+
+    def _ecrire_en_continu(self):
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            while not self._arret:
+                self._reveil.wait(self.intervalle_vidage)
+                self._reveil.clear()
+                self._ecrire_lot(fichier)
+            self._ecrire_lot(fichier)
+
+    def _ecrire_lot(self, fichier):
+        with self._verrou:
+            lot, self._en_attente = self._en_attente, deque()
+        if not lot:
+            return
+        # Une seule écriture par lot
+        fichier.write(''.join(
+            json.dumps({'instant': instant, 'anomalie': anomalie, 'source': source, 'details': details},
+                       ensure_ascii=False, default=str) + '\n'
+            for instant, anomalie, source, details in lot
+        ))
+        fichier.flush()
+
+    def fermer(self):
+        """Écriture des anomalies en attente et arrêt du fil d'écriture"""
+        if self._ecrivain is None or self._arret:
+            return
+        self._arret = True
+        self._reveil.set()
+        self._ecrivain.join()
+        atexit.unregister(self.fermer)
+
+    def instantane(self):
+        """Compteurs par type d'anomalie et nombre d'anomalies perdues"""
+        with self._verrou:
+            return {'total': sum(self.compteurs.values()), 'anomalies': dict(self.compteurs),
+                    'pertes': self.nb_pertes}
@@ -0,0 +1,49 @@
+import argparse
+import csv
+import io
+import time
+import pandas as pd
+from Pipe_filter import CHAMPS_MESURE
+from format_binaire import encoder_lot, vers_dataframe, decoder_enregistrements
+
+# Comparaison du format binaire et du CSV : taille des données transmises et
+# temps de décodage, sur le jeu de données fourni répliqué jusqu'au nombre de lignes demandé
+
+def chronometrer(fonction, *args):
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    return resultat, time.perf_counter() - debut
+
+def lire_csv_en_dictionnaires(contenu):
+    texte = io.StringIO(contenu.decode('utf-8'))
+    return [dict(zip(CHAMPS_MESURE, ligne)) for ligne in csv.reader(texte)]
+
+def lire_csv_en_dataframe(contenu):
+    return pd.read_csv(io.BytesIO(contenu), header=None, names=CHAMPS_MESURE)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Taille et temps de décodage : binaire contre CSV")
+    parser.add_argument('--fichier', default='dataset_consommation_energie_algerie.csv')
+    parser.add_argument('--lignes', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.fichier)
+    df = pd.concat([df] * (-(-args.lignes // len(df))), ignore_index=True).head(args.lignes)
+
+    contenu_csv = df.to_csv(index=False, header=False).encode('utf-8')
+    contenu_binaire, duree_encodage = chronometrer(encoder_lot, df)
+
+    print(f"Lignes                       : {len(df)}")
+    print(f"Taille CSV                   : {len(contenu_csv) / 1e6:10.2f} Mo")
+    print(f"Taille binaire               : {len(contenu_binaire) / 1e6:10.2f} Mo "
+          f"({len(contenu_binaire) / len(contenu_csv):.0%})")
+    print(f"Encodage binaire             : {duree_encodage:10.3f} s")
+
+    for nom, fonction, contenu in [
+        ("CSV -> DataFrame", lire_csv_en_dataframe, contenu_csv),
+        ("binaire -> DataFrame", vers_dataframe, contenu_binaire),
+        ("CSV -> dictionnaires", lire_csv_en_dictionnaires, contenu_csv),
+        ("binaire -> dictionnaires", decoder_enregistrements, contenu_binaire),
+    ]:
+        _, duree = chronometrer(fonction, contenu)
+        print(f"Décodage {nom:20s}: {duree:10.3f} s")
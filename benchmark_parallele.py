@@ -0,0 +1,44 @@
+import argparse
+import os
+import time
+import pandas as pd
+from Pipe_filter import Pipeline, PipelineParallele, FiltreValidation, FiltreNormalisation, FiltreTransformation
+
+# Débit du pipeline en fonction du nombre de processus, sur le jeu de données
+# fourni répliqué synthétiquement jusqu'au nombre de lignes demandé
+
+def creer_filtres():
+    return [FiltreValidation(), FiltreNormalisation(), FiltreTransformation()]
+
+def charger_donnees(chemin, nb_lignes):
+    df = pd.read_csv(chemin)
+    repetitions = -(-nb_lignes // len(df))
+    df = pd.concat([df] * repetitions, ignore_index=True).head(nb_lignes)
+    return df.to_dict(orient='records')
+
+def mesurer(traitement, donnees):
+    debut = time.perf_counter()
+    traitement(donnees)
+    return len(donnees) / (time.perf_counter() - debut)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Débit du pipeline selon le nombre de processus")
+    parser.add_argument('--fichier', default='dataset_consommation_energie_algerie.csv')
+    parser.add_argument('--lignes', type=int, default=200_000)
+    parser.add_argument('--taille-morceau', type=int, default=2000)
+    parser.add_argument('--max-processus', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    donnees = charger_donnees(args.fichier, args.lignes)
+
+    # Référence séquentielle
+    pipeline = Pipeline(creer_filtres())
+    debit = mesurer(lambda d: [pipeline.traiter(x) for x in d], donnees)
+    print(f"séquentiel      : {debit:12.0f} enr/s")
+
+    nb_processus = 1
+    while nb_processus <= args.max_processus:
+        parallele = PipelineParallele(creer_filtres(), nb_processus, args.taille_morceau)
+        debit = mesurer(parallele.traiter_tout, donnees)
+        print(f"{nb_processus:3d} processus    : {debit:12.0f} enr/s")
+        nb_processus *= 2
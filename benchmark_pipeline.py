@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from queue import Queue
+from threading import Thread
+
+# Suite de benchmarks reproductible : débit (enregistrements/s) et pic de mémoire
+# résidente de chaque filtre et de chaque mode d'exécution du pipeline, sur des
+# données générées par energy_datset (graine fixe). Chaque cas est exécuté dans un
+# processus séparé pour que le pic de mémoire lui soit propre ; la génération des
+# données a aussi son propre processus, le processus principal n'important ni
+# pandas ni le pipeline. Les résultats sont enregistrés en JSON et peuvent être
+# comparés à une exécution précédente.
+
+DEBUT_DONNEES = datetime(2024, 5, 24)
+
+def creer_filtres():
+    from Pipe_filter import FiltreValidation, FiltreNormalisation, FiltreTransformation, FiltreSecurite
+    return [FiltreValidation(), FiltreNormalisation(), FiltreTransformation(), FiltreSecurite()]
+
+def preparer_entrees(enregistrements, nb_filtres_amont):
+    """Entrées d'un filtre : sorties des filtres qui le précèdent dans le pipeline (non chronométré)"""
+    filtres = creer_filtres()[:nb_filtres_amont]
+    entrees = []
+    for donnees in enregistrements:
+        for filtre in filtres:
+            donnees, _ = filtre.traiter(donnees)
+            if donnees is None:
+                break
+        if donnees is not None:
+            entrees.append(donnees)
+    return entrees
+
+def cas_filtre(indice):
+    def executer(chemin):
+        import pandas as pd
+        enregistrements = pd.read_csv(chemin).to_dict(orient='records')
+        entrees = preparer_entrees(enregistrements, indice)
+        filtre = creer_filtres()[indice]
+        debut = time.perf_counter()
+        for donnees in entrees:
+            filtre.traiter(donnees)
+        return len(entrees), time.perf_counter() - debut
+    return executer
+
+def cas_sequentiel(chemin):
+    # Mode de Unite_reception.py d'origine : un dictionnaire à la fois
+    import pandas as pd
+    from Pipe_filter import Pipeline
+    enregistrements = pd.read_csv(chemin).to_dict(orient='records')
+    pipeline = Pipeline(creer_filtres())
+    debut = time.perf_counter()
+    resultats = [pipeline.traiter(donnees) for donnees in enregistrements]
+    return len(resultats), time.perf_counter() - debut
+
+def cas_deux_threads(chemin):
+    # Mode d'origine de unite_reception_threads.py : deux fils, chacun avec son pipeline
+    import numpy as np
+    import pandas as pd
+    from Pipe_filter import Pipeline
+    def traiter_partie(pipeline, partie, file):
+        file.put([pipeline.traiter(donnees) for donnees in partie])
+
+    enregistrements = pd.read_csv(chemin).to_dict(orient='records')
+    debut = time.perf_counter()
+    file = Queue()
+    fils = [Thread(target=traiter_partie, args=(Pipeline(creer_filtres()), partie, file))
+            for partie in np.array_split(enregistrements, 2)]
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    nb = sum(len(file.get()) for _ in fils)
+    return nb, time.perf_counter() - debut
+
+def cas_flux(chemin):
+    from Pipe_filter import Pipeline
+    from flux_csv import lire_csv_par_morceaux
+    pipeline = Pipeline(creer_filtres())
+    debut = time.perf_counter()
+    nb = sum(1 for _ in pipeline.traiter_flux(lire_csv_par_morceaux(chemin)))
+    return nb + pipeline.nb_rejets, time.perf_counter() - debut
+
+def cas_lot(chemin):
+    import pandas as pd
+    from Pipe_filter import Pipeline
+    lot = pd.read_csv(chemin)
+    pipeline = Pipeline(creer_filtres()[:3])
+    debut = time.perf_counter()
+    pipeline.traiter_lot(lot)
+    return len(lot), time.perf_counter() - debut
+
+def cas_csv_par_morceaux(chemin):
+    from Pipe_filter import Pipeline
+    from flux_csv import traiter_csv_par_morceaux
+    pipeline = Pipeline(creer_filtres()[:3])
+    debut = time.perf_counter()
+    nb, _, _ = traiter_csv_par_morceaux(pipeline, chemin, os.devnull)
+    return nb, time.perf_counter() - debut
+
+def cas_etages(mode):
+    # Mode de unite_reception_threads.py : étages reliés par des files bornées
+    def executer(chemin):
+        from flux_csv import lire_csv_par_morceaux
+        from pipeline_etages import PipelineEtages, Etage
+        filtres = creer_filtres()
+        pipeline = PipelineEtages([Etage(filtres[:2], mode), Etage(filtres[2:], mode)])
+        debut = time.perf_counter()
+        nb = sum(1 for _ in pipeline.traiter_flux(lire_csv_par_morceaux(chemin)))
+        return nb + pipeline.nb_rejets, time.perf_counter() - debut
+    return executer
+
+def cas_graphe(chemin):
+    # Graphe de filtres : validation diffusée vers la transformation et l'agrégation
+    from flux_csv import lire_csv_par_morceaux
+    from graphe import Graphe
+    from agregation import FiltreAgregation
+    filtres = creer_filtres()
+    graphe = Graphe()
+    validation = graphe.noeud('validation', filtres[:2])
+    graphe.relier(validation, graphe.noeud('transformation', filtres[2:]))
+    graphe.relier(validation, graphe.noeud('agregation', [FiltreAgregation()]))
+    debut = time.perf_counter()
+    bilan = graphe.executer(lire_csv_par_morceaux(chemin))
+    return bilan['validation']['recus'], time.perf_counter() - debut
+
+def cas_mmap(chemin):
+    # Lecture par projection en mémoire, plages réparties sur les processus
+    from Pipe_filter import Pipeline
+    from lecture_mmap import traiter_csv_mmap
+    pipeline = Pipeline(creer_filtres()[:3])
+    debut = time.perf_counter()
+    nb, _, _ = traiter_csv_mmap(pipeline, chemin, os.devnull, taille_plage=4 * 1024 * 1024)
+    return nb, time.perf_counter() - debut
+
+def cas_parallele(chemin):
+    import pandas as pd
+    from Pipe_filter import PipelineParallele
+    enregistrements = pd.read_csv(chemin).to_dict(orient='records')
+    pipeline = PipelineParallele(creer_filtres(), taille_morceau=5000)
+    debut = time.perf_counter()
+    resultats = pipeline.traiter_tout(enregistrements)
+    return len(resultats), time.perf_counter() - debut
+
+CAS = {
+    'filtre:FiltreValidation': cas_filtre(0),
+    'filtre:FiltreNormalisation': cas_filtre(1),
+    'filtre:FiltreTransformation': cas_filtre(2),
+    'filtre:FiltreSecurite': cas_filtre(3),
+    'pipeline:sequentiel': cas_sequentiel,
+    'pipeline:deux_threads': cas_deux_threads,
+    'pipeline:flux': cas_flux,
+    'pipeline:lot': cas_lot,
+    'pipeline:csv_par_morceaux': cas_csv_par_morceaux,
+    'pipeline:parallele': cas_parallele,
+    'pipeline:etages_threads': cas_etages('thread'),
+    'pipeline:etages_processus': cas_etages('processus'),
+    'pipeline:graphe': cas_graphe,
+    'pipeline:mmap': cas_mmap,
+}
+
+def _reinitialiser_pic_memoire():
+    """Remise à zéro du pic de mémoire résidente (VmHWM, Linux)
+
+    Le pic mesuré par ru_maxrss est conservé à travers fork+exec : sans remise à
+    zéro, un cas hériterait de celui du processus qui l'a lancé.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fichier:
+            fichier.write('5')
+    except OSError:
+        pass
+
+def _pic_memoire_mo():
+    try:
+        with open('/proc/self/status') as fichier:
+            for ligne in fichier:
+                if ligne.startswith('VmHWM:'):
+                    return int(ligne.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss est en kilo-octets sous Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def executer_cas(nom, chemin):
+    """Exécution d'un cas dans le processus courant, résultat JSON sur la sortie standard"""
+    _reinitialiser_pic_memoire()
+    import logging
+    logging.disable(logging.WARNING)
+    nb, duree = CAS[nom](chemin)
+    rss_max = _pic_memoire_mo()
+    print(json.dumps({'enregistrements': nb, 'duree_s': duree,
+                      'enr_par_s': nb / duree if duree else 0.0, 'rss_max_mo': rss_max}))
+
+def generer_donnees(chemin, lignes, seed):
+    from energy_datset import generate_csv
+    generate_csv(chemin, lignes, seed=seed, debut=DEBUT_DONNEES)
+
+def preparer_donnees(lignes, seed, repertoire):
+    """Chemin des données du benchmark, générées dans un processus séparé si besoin"""
+    os.makedirs(repertoire, exist_ok=True)
+    chemin = os.path.join(repertoire, f'donnees_{lignes}_{seed}.csv')
+    if not os.path.exists(chemin):
+        subprocess.run([sys.executable, __file__, '--generer', chemin, '--lignes', str(lignes),
+                        '--seed', str(seed)], check=True)
+    return chemin
+
+def comparer(resultats, reference, tolerance):
+    """Liste des cas dont le débit a baissé de plus de `tolerance` par rapport à la référence"""
+    regressions = []
+    for nom, mesure in resultats.items():
+        ancien = reference.get(nom)
+        if ancien and mesure['enr_par_s'] < ancien['enr_par_s'] * (1 - tolerance):
+            regressions.append((nom, ancien['enr_par_s'], mesure['enr_par_s']))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline (débit et pic de mémoire)")
+    parser.add_argument('--lignes', type=int, default=100_000, help="Nombre de lignes générées par energy_datset")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--cas', nargs='+', default=list(CAS), choices=list(CAS))
+    parser.add_argument('--donnees', default='benchmark_donnees', help="Répertoire des données générées")
+    parser.add_argument('--sortie', default='benchmark_resultats.json')
+    parser.add_argument('--reference', help="Résultats JSON d'une version précédente à comparer")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--executer', help=argparse.SUPPRESS)
+    parser.add_argument('--fichier', help=argparse.SUPPRESS)
+    parser.add_argument('--generer', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executer:
+        executer_cas(args.executer, args.fichier)
+        sys.exit(0)
+    if args.generer:
+        generer_donnees(args.generer, args.lignes, args.seed)
+        sys.exit(0)
+
+    chemin = preparer_donnees(args.lignes, args.seed, args.donnees)
+    resultats = {}
+    for nom in args.cas:
+        sortie = subprocess.run([sys.executable, __file__, '--executer', nom, '--fichier', chemin],
+                                check=True, capture_output=True, text=True).stdout
+        resultats[nom] = json.loads(sortie.strip().splitlines()[-1])
+        print(f"{nom:30s} {resultats[nom]['enr_par_s']:12.0f} enr/s  {resultats[nom]['rss_max_mo']:8.1f} Mo")
+
+    with open(args.sortie, 'w', encoding='utf-8') as fichier:
+        json.dump({
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'lignes': args.lignes,
+            'seed': args.seed,
+            'python': platform.python_version(),
+            'plateforme': platform.platform(),
+            'resultats': resultats,
+        }, fichier, indent=2)
+
+    if args.reference:
+        with open(args.reference, encoding='utf-8') as fichier:
+            reference = json.load(fichier)['resultats']
+        regressions = comparer(resultats, reference, args.tolerance)
+        for nom, ancien, nouveau in regressions:
+            print(f"RÉGRESSION {nom} : {ancien:.0f} -> {nouveau:.0f} enr/s")
+        sys.exit(1 if regressions else 0)
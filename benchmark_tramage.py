@@ -0,0 +1,65 @@
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+from tramage import TAILLE_ENTETE, recevoir_trame, recevoir_trame_vers_fichier
+
+# Débit de réception sur la boucle locale pour des trames de 1 Mo à 1 Go :
+# concaténation de bytes (ancienne boucle), recv_into en mémoire, recv_into vers fichier
+
+MO = 1 << 20
+
+def envoyer(sock, taille):
+    bloc = os.urandom(MO)
+    sock.sendall(taille.to_bytes(TAILLE_ENTETE, byteorder='big'))
+    restant = taille
+    while restant:
+        morceau = memoryview(bloc)[:min(restant, MO)]
+        sock.sendall(morceau)
+        restant -= len(morceau)
+    sock.close()
+
+def recevoir_par_concatenation(sock):
+    taille = int.from_bytes(sock.recv(4), byteorder='big')
+    donnees_recues = b''
+    while len(donnees_recues) < taille:
+        paquet = sock.recv(4096)
+        if not paquet:
+            break
+        donnees_recues += paquet
+    return donnees_recues
+
+def mesurer(reception, taille):
+    serveur = socket.create_server(('127.0.0.1', 0))
+    emetteur = socket.create_connection(serveur.getsockname())
+    recepteur, _ = serveur.accept()
+    serveur.close()
+    fil = threading.Thread(target=envoyer, args=(emetteur, taille))
+    debut = time.perf_counter()
+    fil.start()
+    reception(recepteur)
+    duree = time.perf_counter() - debut
+    fil.join()
+    recepteur.close()
+    return taille / MO / duree
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Débit de réception des trames sur la boucle locale")
+    parser.add_argument('--tailles', type=int, nargs='+', default=[1, 16, 256, 1024], help="Tailles en Mo")
+    parser.add_argument('--max-concatenation', type=int, default=16,
+                        help="Taille maximale (Mo) testée par concaténation (coût quadratique)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as repertoire:
+        chemin = os.path.join(repertoire, 'trame.bin')
+        for taille_mo in args.tailles:
+            taille = taille_mo * MO
+            resultats = {}
+            if taille_mo <= args.max_concatenation:
+                resultats['concaténation'] = mesurer(recevoir_par_concatenation, taille)
+            resultats['recv_into mémoire'] = mesurer(recevoir_trame, taille)
+            resultats['recv_into fichier'] = mesurer(lambda sock: recevoir_trame_vers_fichier(sock, chemin), taille)
+            for mode, debit in resultats.items():
+                print(f"{taille_mo:5d} Mo  {mode:20s} {debit:10.1f} Mo/s")
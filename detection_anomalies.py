@@ -0,0 +1,160 @@
+import json
+import math
+import os
+from Pipe_filter import Filtre, MesureCompteur, _consommation_kwh
+
+# Détection statistique des consommations anormales. Chaque compteur et chaque type
+# de client a sa référence, mise à jour en O(1) par relevé : moyenne et variance de
+# Welford, ou moyennes mobiles exponentielles si `alpha` est fourni (la référence
+# suit alors les évolutions lentes de la consommation). Un relevé est anormal si
+# son écart réduit (z) dépasse `seuil_z` pour son compteur ou pour son type de
+# client ; il n'est alors intégré à la référence que ramené à moyenne ± seuil_z
+# écarts-types : un pic isolé la déplace peu, un changement durable de niveau
+# finit par être absorbé. L'écart-type est borné inférieurement par
+# `ecart_type_min` (kWh), sans quoi un compteur constant ne serait jamais signalé.
+
+class FiltreDetectionAnomalies(Filtre):
+    """Signalement des relevés qui s'écartent de l'historique du compteur ou du type de client
+
+    Les relevés anormaux sont signalés dans le puits d'anomalies et transmis, ou
+    rejetés si `rejeter` est vrai. Les références ne sont utilisées qu'après
+    `nb_min` relevés ; les consommations manquantes (NaN) sont ignorées. Si `chemin_etat` est fourni, les références y sont chargées
+    au démarrage, sauvegardées tous les `frequence_sauvegarde` relevés et en fin
+    de flux (vider).
+    """
+    def __init__(self, seuil_z=4.0, nb_min=30, alpha=None, rejeter=False,
+                 chemin_etat=None, frequence_sauvegarde=100_000, puits=None, ecart_type_min=0.01):
+        self.seuil_z = seuil_z
+        self.nb_min = nb_min
+        self.alpha = alpha
+        self.ecart_type_min = ecart_type_min
+        self.rejeter = rejeter
+        self.chemin_etat = chemin_etat
+        self.frequence_sauvegarde = frequence_sauvegarde
+        self.puits = puits
+        # clé -> [nombre, moyenne, M2 (Welford) ou variance (moyenne exponentielle)]
+        self.compteurs = {}
+        self.types_client = {}
+        self.nb_releves = 0
+        self.nb_anomalies = 0
+        if chemin_etat is not None and os.path.exists(chemin_etat):
+            self.charger(chemin_etat)
+
+    def _ecart_type(self, reference):
+        """Écart-type de la référence, au moins ecart_type_min (None pendant l'apprentissage)"""
+        if reference is None or reference[0] < self.nb_min:
+            return None
+        variance = reference[2] if self.alpha is not None else reference[2] / (reference[0] - 1)
+        return max(math.sqrt(max(variance, 0.0)), self.ecart_type_min)
+
+    def _ecart(self, reference, valeur):
+        """Écart réduit de la valeur par rapport à la référence (0 pendant l'apprentissage)"""
+        ecart_type = self._ecart_type(reference)
+        if ecart_type is None:
+            return 0.0
+        return (valeur - reference[1]) / ecart_type
+
+    def _mettre_a_jour(self, references, cle, valeur):
+        reference = references.get(cle)
+        if reference is None:
+            references[cle] = [1, valeur, 0.0]
+            return
+        ecart_type = self._ecart_type(reference)
+        if ecart_type is not None:
+            # Valeur anormale ramenée à la borne : la référence n'en suit que lentement le niveau
+            borne = self.seuil_z * ecart_type
+            valeur = min(max(valeur, reference[1] - borne), reference[1] + borne)
+        reference[0] += 1
+        ecart = valeur - reference[1]
+        if self.alpha is None:
+            reference[1] += ecart / reference[0]
+            reference[2] += ecart * (valeur - reference[1])
+        else:
+            increment = self.alpha * ecart
+            reference[1] += increment
+            reference[2] = (1 - self.alpha) * (reference[2] + ecart * increment)
+
+    def examiner(self, compteur_id, type_client, consommation):
+        """Écarts réduits (compteur, type de client) d'un relevé anormal, None sinon
+
+        Les relevés anormaux sont intégrés aux références ramenés à leurs bornes.
+        """
+        if math.isnan(consommation):
+            return None
+        cle_compteur = str(compteur_id)
+        cle_type = str(type_client).lower()
+        z_compteur = self._ecart(self.compteurs.get(cle_compteur), consommation)
+        z_type = self._ecart(self.types_client.get(cle_type), consommation)
+
+        self.nb_releves += 1
+        if self.chemin_etat is not None and self.nb_releves % self.frequence_sauvegarde == 0:
+            self.sauvegarder(self.chemin_etat)
+
+        self._mettre_a_jour(self.compteurs, cle_compteur, consommation)
+        self._mettre_a_jour(self.types_client, cle_type, consommation)
+        if abs(z_compteur) > self.seuil_z or abs(z_type) > self.seuil_z:
+            self.nb_anomalies += 1
+            return z_compteur, z_type
+        return None
+
+    def _anomalie(self, compteur_id, ecarts):
+        z_compteur, z_type = ecarts
+        anomalie = ("Consommation anormale pour le compteur" if abs(z_compteur) > self.seuil_z
+                    else "Consommation anormale pour le type de client")
+        self.signaler(anomalie, compteur_id, {'z_compteur': round(z_compteur, 2), 'z_type': round(z_type, 2)})
+        return anomalie
+
+    def vider(self):
+        """Sauvegarde des références en fin de flux, relevés depuis la dernière sauvegarde compris"""
+        if self.chemin_etat is not None:
+            self.sauvegarder(self.chemin_etat)
+
+    def traiter(self, donnees):
+        mesure = MesureCompteur.depuis(donnees)
+        consommation = mesure.consommation_kwh()
+        ecarts = self.examiner(mesure.compteur_id, mesure.type_client, consommation)
+        if ecarts is None:
+            return mesure, []
+        anomalie = self._anomalie(mesure.compteur_id, ecarts)
+        if self.rejeter:
+            return None, [anomalie]
+        return mesure, []
+
+    def traiter_lot(self, lot):
+        """Examen d'un lot (DataFrame) dans l'ordre des lignes, sans construire de MesureCompteur"""
+        import pandas as pd
+        consommation = _consommation_kwh(lot['consommation'])
+        rejet = pd.Series(False, index=lot.index)
+        raisons = pd.Series('', index=lot.index, dtype=object)
+        for index, compteur_id, type_client, valeur in zip(lot.index, lot['compteur_id'].tolist(),
+                                                           lot['type_client'].tolist(), consommation.tolist()):
+            ecarts = self.examiner(compteur_id, type_client, valeur)
+            if ecarts is not None:
+                anomalie = self._anomalie(compteur_id, ecarts)
+                if self.rejeter:
+                    rejet[index] = True
+                    raisons[index] = anomalie
+        return lot[~rejet], rejet, raisons
+
+    def etat(self):
+        return {'compteurs': self.compteurs, 'types_client': self.types_client,
+                'nb_releves': self.nb_releves, 'nb_anomalies': self.nb_anomalies}
+
+    def restaurer(self, etat):
+        self.compteurs = etat['compteurs']
+        self.types_client = etat['types_client']
+        self.nb_releves = etat['nb_releves']
+        self.nb_anomalies = etat['nb_anomalies']
+
+    def sauvegarder(self, chemin):
+        """Sauvegarde atomique des références (fichier temporaire puis renommage)"""
+        temporaire = f"{chemin}.tmp"
+        with open(temporaire, 'w', encoding='utf-8') as fichier:
+            json.dump(self.etat(), fichier)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        os.replace(temporaire, chemin)
+
+    def charger(self, chemin):
+        with open(chemin, encoding='utf-8') as fichier:
+            self.restaurer(json.load(fichier))
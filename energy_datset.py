@@ -1,6 +1,13 @@
+import argparse
+import csv
+import io
+import socket
+import time
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-import random
-from datetime import datetime, timedelta
+from Pipe_filter import CHAMPS_MESURE
 
 # Définir les attributs
 compteur_ids = [123456, 789012, 345678, 654321, 987654]
@@ -29,69 +36,267 @@ tarifs = [0.12, 0.14, 0.16]
 puissances_souscrites = [3, 6, 9, 12, 15]
 types_compteur = ['Smart Meter Gen 1', 'Smart Meter Gen 2', 'Smart Meter Gen 3']
 
+# Relevé anormal injecté (valeurs nécessitant conversion, capitalisation ou nettoyage)
+ANOMALIE = {
+    'compteur_id': 999999,
+    'consommation': 0.5,  # '500 Wh', à convertir en kWh
+    'type_client': 'residentiel',
+    'wilaya': 'alger',
+    'ville': 'alger',
+    'localisation': "36.7538,3.0588",
+    'region': 'Nord',
+    'code_postal': 16000,
+    'fournisseur': 'Énergie Plus ',
+    'tarif': 0.12,
+    'puissance_souscrite': 5,
+    'type_compteur': 'Smart Meter Gen 3',
+}
+
+INTERVALLE_RELEVE = 15 * 60
+
+# Génération vectorisée (NumPy) par lots : chaque compteur a des attributs fixes
+# (type de client, ville, région, fournisseur, tarif, puissance, modèle), tirés une
+# fois, et relève sa consommation tous les INTERVALLE_RELEVE secondes, tous les
+# compteurs relevant à chaque intervalle. Une proportion `taux_anomalies` des
+# lignes est remplacée par le relevé anormal ANOMALIE. Avec une graine et une date
+# de début fixées, les données sont reproductibles, quelle que soit la taille des lots.
+#
+# Un lot tiré est un couple (colonnes, dictionnaire) au format de format_binaire :
+# colonnes numériques (consommation en kWh, horodatage en secondes depuis l'epoch),
+# champs énumérés codés dans le dictionnaire. Il est mis en forme en DataFrame au
+# format du jeu de données (vers_dataframe) ou encodé en lot binaire (vers_binaire).
+
+class Catalogue:
+    """Valeurs possibles des champs énumérés, complétées par celles du relevé anormal"""
+    def __init__(self, localisations=localisations):
+        villes = [(entree['wilaya'], ville) for entree in localisations for ville in entree['villes']]
+        self.villes = len(villes)
+        wilayas = list(dict.fromkeys(wilaya for wilaya, _ in villes))
+        self.wilaya_ville = np.array([wilayas.index(wilaya) for wilaya, _ in villes])
+        self.code_postal_ville = np.array([ville['code_postal'] for _, ville in villes])
+        self.dictionnaire = {
+            'type_client': types_client,
+            'wilaya': wilayas,
+            'ville': [ville['ville'] for _, ville in villes],
+            'localisation': [f"{ville['coord'][0]},{ville['coord'][1]}" for _, ville in villes],
+            'region': regions,
+            'fournisseur': fournisseurs,
+            'type_compteur': types_compteur,
+        }
+        # Le code de la valeur anormale est le dernier de chaque champ
+        self.dictionnaire = {champ: valeurs + [ANOMALIE[champ]] for champ, valeurs in self.dictionnaire.items()}
+
+def tirer_compteurs(rng, nb_compteurs, catalogue):
+    """Identifiants et attributs fixes (codes du catalogue) de chaque compteur"""
+    if nb_compteurs is None:
+        identifiants = np.array(compteur_ids)
+    elif not 0 < nb_compteurs < 900_000:
+        raise ValueError("Le nombre de compteurs doit être compris entre 1 et 899999")
+    else:
+        # Identifiants à 6 chiffres ; 999999 est réservé au relevé anormal
+        identifiants = 100_000 + rng.permutation(899_999)[:nb_compteurs]
+    nb = len(identifiants)
+    ville = rng.integers(catalogue.villes, size=nb)
+    return {
+        'compteur_id': identifiants,
+        'type_client': rng.integers(len(types_client), size=nb),
+        'wilaya': catalogue.wilaya_ville[ville],
+        'ville': ville,
+        'localisation': ville,
+        'region': rng.integers(len(regions), size=nb),
+        'code_postal': catalogue.code_postal_ville[ville],
+        'fournisseur': rng.integers(len(fournisseurs), size=nb),
+        'tarif': np.array(tarifs)[rng.integers(len(tarifs), size=nb)],
+        'puissance_souscrite': np.array(puissances_souscrites, dtype=float)[rng.integers(len(puissances_souscrites), size=nb)],
+        'type_compteur': rng.integers(len(types_compteur), size=nb),
+    }
+
+def tirer_lots(nb_lignes, nb_compteurs=None, seed=None, debut=None, taux_anomalies=0.1,
+               localisations=localisations, taille_lot=100_000):
+    """Lots tirés (colonnes, dictionnaire) de `taille_lot` lignes au plus, `nb_lignes` au total"""
+    # Un générateur par tirage : les données ne dépendent pas de la taille des lots
+    rng_compteurs, rng_consommation, rng_anomalies = (np.random.default_rng(graine) for graine
+                                                      in np.random.SeedSequence(seed).spawn(3))
+    catalogue = Catalogue(localisations)
+    compteurs = tirer_compteurs(rng_compteurs, nb_compteurs, catalogue)
+    nb = len(compteurs['compteur_id'])
+    # Secondes depuis l'epoch de l'heure locale affichée : les horodatages écrits commencent à `debut`
+    origine = int(((debut or datetime.now()).replace(tzinfo=None) - datetime(1970, 1, 1)).total_seconds())
+
+    for premiere in range(0, nb_lignes, taille_lot):
+        lignes = np.arange(premiere, min(premiere + taille_lot, nb_lignes))
+        compteur = lignes % nb
+        colonnes = {champ: valeurs[compteur] for champ, valeurs in compteurs.items()}
+        colonnes['timestamp'] = origine + (lignes // nb + 1) * INTERVALLE_RELEVE
+        # Consommation uniforme entre 0,1 et 100 kWh, au Wh près
+        colonnes['consommation'] = rng_consommation.integers(100, 100_001, size=len(lignes)) / 1000
+        anomalie = rng_anomalies.random(len(lignes)) < taux_anomalies
+        for champ, valeurs in colonnes.items():
+            if champ == 'timestamp':
+                continue
+            if champ in catalogue.dictionnaire:
+                valeurs[anomalie] = len(catalogue.dictionnaire[champ]) - 1
+            else:
+                valeurs[anomalie] = ANOMALIE[champ]
+        colonnes['anomalie'] = anomalie
+        # Source des champs fixes de la ligne : numéro du compteur, ou nb pour le relevé anormal
+        colonnes['source'] = np.where(anomalie, nb, compteur)
+        yield colonnes, catalogue.dictionnaire
+
+@lru_cache(maxsize=None)
+def _textes_consommation():
+    """Texte ('45.313 kWh') de chaque consommation possible, indexé par Wh"""
+    return np.array([f"{valeur!r} kWh" for valeur in (np.arange(100_001) / 1000).tolist()], dtype=object)
+
+@lru_cache(maxsize=None)
+def _textes_puissance():
+    return np.array([f"{puissance} kW" for puissance in range(max(puissances_souscrites + [ANOMALIE['puissance_souscrite']]) + 1)],
+                    dtype=object)
+
+CHAMPS_FIXES = ['type_client', 'wilaya', 'ville', 'localisation', 'region', 'code_postal',
+                'fournisseur', 'tarif', 'puissance_souscrite', 'type_compteur']
+
+def _textes(colonnes, dictionnaire):
+    """Colonnes du lot au format du jeu de données ('45.313 kWh', '2024-05-24 04:08:39', ...)"""
+    instants, inverse = np.unique(colonnes['timestamp'], return_inverse=True)
+    horodatages = np.array([texte.replace('T', ' ') for texte in
+                            np.datetime_as_string(instants.astype('datetime64[s]')).tolist()], dtype=object)
+    consommation = _textes_consommation()[np.rint(colonnes['consommation'] * 1000).astype(np.int64)]
+    consommation[colonnes['anomalie']] = "500 Wh"
+    lot = {
+        'compteur_id': colonnes['compteur_id'],
+        'timestamp': horodatages[inverse.reshape(-1)],
+        'consommation': consommation,
+    }
+    for champ in CHAMPS_FIXES:
+        if champ in dictionnaire:
+            lot[champ] = np.asarray(dictionnaire[champ], dtype=object)[colonnes[champ]]
+        elif champ == 'puissance_souscrite':
+            lot[champ] = _textes_puissance()[colonnes[champ].astype(np.int64)]
+        else:
+            lot[champ] = colonnes[champ]
+    return lot
+
+def vers_dataframe(colonnes, dictionnaire):
+    """Mise en forme d'un lot tiré au format du jeu de données"""
+    return pd.DataFrame(_textes(colonnes, dictionnaire))
+
+def vers_csv(colonnes, dictionnaire):
+    """Lignes CSV (sans en-tête) d'un lot tiré, identiques à celles de DataFrame.to_csv
+
+    Les champs fixes ne sont mis en forme qu'une fois par source présente dans le
+    lot ; chaque ligne est ensuite assemblée par concaténation de tableaux.
+    """
+    lot = _textes(colonnes, dictionnaire)
+    sources, premieres, inverse = np.unique(colonnes['source'], return_index=True, return_inverse=True)
+    tampon = io.StringIO()
+    csv.writer(tampon, lineterminator='\n').writerows(
+        [''] + [lot[champ][premiere] for champ in CHAMPS_FIXES] for premiere in premieres.tolist())
+    fixes = np.array(tampon.getvalue().splitlines(keepends=True), dtype=object)[inverse.reshape(-1)]
+    identifiants = np.array([f"{identifiant}," for identifiant in lot['compteur_id'][premieres].tolist()],
+                            dtype=object)[inverse.reshape(-1)]
+    lignes = identifiants + lot['timestamp'] + ',' + lot['consommation'] + fixes
+    return ''.join(lignes.tolist())
+
+def vers_binaire(colonnes, dictionnaire, debut=0, fin=None):
+    """Encodage des lignes [debut, fin) d'un lot tiré au format binaire (format_binaire)"""
+    from format_binaire import DTYPE_MESURE, _assembler
+    fin = len(colonnes['compteur_id']) if fin is None else fin
+    tableau = np.zeros(fin - debut, dtype=DTYPE_MESURE)
+    for champ in DTYPE_MESURE.names:
+        tableau[champ] = colonnes[champ][debut:fin]
+    return _assembler(tableau, dictionnaire)
+
+# Relevés sous forme de dictionnaires, lot par lot (mémoire constante)
+def iter_data(num_entries, seed=None, debut=None, **options):
+    for colonnes, dictionnaire in tirer_lots(num_entries, seed=seed, debut=debut, **options):
+        yield from vers_dataframe(colonnes, dictionnaire).to_dict('records')
+
 # Fonction pour générer des données aléatoires
-def generate_data(num_entries):
-    data = []
-    timestamp = datetime.now()
-    for _ in range(num_entries):
-        compteur_id = random.choice(compteur_ids)
-        timestamp += timedelta(minutes=15)
-        consommation = round(random.uniform(0.1, 100), 3)
-        type_client = random.choice(types_client)
-        localisation = random.choice(localisations)
-        ville_info = random.choice(localisation['villes'])
-        wilaya = localisation['wilaya']
-        ville = ville_info['ville']
-        coord = ville_info['coord']
-        code_postal = ville_info['code_postal']
-        region = random.choice(regions)
-        fournisseur = random.choice(fournisseurs)
-        tarif = random.choice(tarifs)
-        puissance = f"{random.choice(puissances_souscrites)} kW"
-        type_compteur = random.choice(types_compteur)
-
-        if random.random() < 0.1:  # 10% de chance pour chaque entrée
-            data.append({
-                'compteur_id': 999999,  # ID spécifique pour l'exemple
-                'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                'consommation': f"500 Wh",  # Exemple nécessitant une conversion en kWh
-                'type_client': 'residentiel',  # Exemple nécessitant une capitalisation
-                'wilaya': 'alger',  # Exemple nécessitant une capitalisation
-                'ville': 'alger',  # Exemple nécessitant une capitalisation
-                'localisation': f"{36.7538},{3.0588}",
-                'region': 'Nord',
-                'code_postal': '16000',
-                'fournisseur': 'Énergie Plus ',  # Exemple nécessitant une suppression d'espace
-                'tarif': 0.12,
-                'puissance_souscrite': '5 kW',
-                'type_compteur': 'Smart Meter Gen 3'
-            })
-        
-        data.append({
-            'compteur_id': compteur_id,
-            'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'consommation': f"{consommation} kWh",
-            'type_client': type_client,
-            'wilaya': wilaya,
-            'ville': ville,
-            'localisation': f"{coord[0]},{coord[1]}",
-            'region': region,
-            'code_postal': code_postal,
-            'fournisseur': fournisseur,
-            'tarif': tarif,
-            'puissance_souscrite': puissance,
-            'type_compteur': type_compteur
-        })
-    return data
-
-# Générer le dataset
-num_entries = 100  # Nombre de lignes de données
-data = generate_data(num_entries)
-
-# Créer un DataFrame
-df = pd.DataFrame(data)
-
-# Sauvegarder le dataset en CSV
-df.to_csv('Pipe-Filter/dataset_consommation_energie_algerie.csv', index=False)
-
-print("Dataset généré et sauvegardé sous 'dataset_consommation_energie_algerie.csv'")
+def generate_data(num_entries, seed=None, debut=None, **options):
+    return list(iter_data(num_entries, seed, debut, **options))
+
+def generate_csv(chemin, num_entries, seed=None, debut=None, taille_morceau=100_000, **options):
+    """Écriture de num_entries lignes dans un CSV, lot par lot (mémoire constante)"""
+    with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+        fichier.write(','.join(CHAMPS_MESURE) + '\n')
+        for colonnes, dictionnaire in tirer_lots(num_entries, seed=seed, debut=debut,
+                                                 taille_lot=taille_morceau, **options):
+            fichier.write(vers_csv(colonnes, dictionnaire))
+
+def generate_binaire(chemin, num_entries, seed=None, debut=None, taille_morceau=100_000, **options):
+    """Écriture de num_entries lignes dans un fichier de trames binaires (une trame par lot)
+
+    Chaque trame est précédée de sa taille sur 4 octets, comme sur la socket.
+    """
+    from tramage import TAILLE_ENTETE
+    with open(chemin, 'wb') as fichier:
+        for colonnes, dictionnaire in tirer_lots(num_entries, seed=seed, debut=debut,
+                                                 taille_lot=taille_morceau, **options):
+            contenu = vers_binaire(colonnes, dictionnaire)
+            fichier.write(len(contenu).to_bytes(TAILLE_ENTETE, byteorder='big'))
+            fichier.write(contenu)
+
+def _trames(num_entries, lignes_par_trame, binaire, **options):
+    """Trames (contenu, nombre de lignes) au format de l'unité de réception"""
+    taille_lot = max(lignes_par_trame, 100_000 // lignes_par_trame * lignes_par_trame)
+    for colonnes, dictionnaire in tirer_lots(num_entries, taille_lot=taille_lot, **options):
+        nb = len(colonnes['compteur_id'])
+        if binaire:
+            for debut in range(0, nb, lignes_par_trame):
+                fin = min(debut + lignes_par_trame, nb)
+                yield vers_binaire(colonnes, dictionnaire, debut, fin), fin - debut
+        else:
+            # Lignes CSV sans en-tête, dans l'ordre des colonnes du jeu de données
+            lignes = vers_csv(colonnes, dictionnaire).splitlines(keepends=True)
+            for debut in range(0, nb, lignes_par_trame):
+                morceau = lignes[debut:debut + lignes_par_trame]
+                yield ''.join(morceau).encode('utf-8'), len(morceau)
+
+def rejouer(hote, port, num_entries, debit=None, lignes_par_trame=256, binaire=False, **options):
+    """Envoi de num_entries lignes générées à l'unité de réception, à `debit` lignes/s
+
+    Sans débit cible, les trames sont envoyées au plus vite. Retourne le nombre de
+    lignes envoyées et la durée de l'envoi.
+    """
+    from tramage import envoyer_trame
+    nb_lignes = 0
+    with socket.create_connection((hote, port)) as sock:
+        debut = time.perf_counter()
+        for contenu, nb in _trames(num_entries, lignes_par_trame, binaire, **options):
+            envoyer_trame(sock, contenu)
+            nb_lignes += nb
+            if debit:
+                # Attente jusqu'à l'instant prévu pour la trame suivante (pas de dérive cumulée)
+                avance = debut + nb_lignes / debit - time.perf_counter()
+                if avance > 0:
+                    time.sleep(avance)
+        duree = time.perf_counter() - debut
+    return nb_lignes, duree
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Génération de relevés de compteurs synthétiques")
+    parser.add_argument('--lignes', type=int, default=100)
+    parser.add_argument('--compteurs', type=int, help="Nombre de compteurs (par défaut : compteur_ids)")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--debut', type=datetime.fromisoformat, help="Date du premier relevé (par défaut : maintenant)")
+    parser.add_argument('--taux-anomalies', type=float, default=0.1)
+    parser.add_argument('--taille-morceau', type=int, default=100_000)
+    parser.add_argument('--sortie', default='dataset_consommation_energie_algerie.csv')
+    parser.add_argument('--format', choices=['csv', 'binaire'], default='csv')
+    parser.add_argument('--rejouer', metavar='HOTE:PORT', help="Envoi à l'unité de réception au lieu d'un fichier")
+    parser.add_argument('--debit', type=float, help="Débit cible de l'envoi (lignes/s)")
+    parser.add_argument('--lignes-par-trame', type=int, default=256)
+    args = parser.parse_args()
+
+    options = {'nb_compteurs': args.compteurs, 'seed': args.seed, 'debut': args.debut,
+               'taux_anomalies': args.taux_anomalies}
+    if args.rejouer:
+        hote, _, port = args.rejouer.rpartition(':')
+        nb, duree = rejouer(hote, int(port), args.lignes, args.debit, args.lignes_par_trame,
+                            args.format == 'binaire', **options)
+        print(f"{nb} lignes envoyées en {duree:.1f} s ({nb / duree:.0f} lignes/s)")
+    else:
+        generer = generate_binaire if args.format == 'binaire' else generate_csv
+        generer(args.sortie, args.lignes, taille_morceau=args.taille_morceau, **options)
+        print(f"Dataset généré et sauvegardé sous '{args.sortie}'")
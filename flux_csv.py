@@ -0,0 +1,56 @@
+import logging
+from collections import Counter
+from itertools import islice
+import pandas as pd
+
+# Lecture et écriture de fichiers CSV par morceaux, à mémoire constante
+
+journal = logging.getLogger(__name__)
+
+def lire_csv_par_morceaux(chemin, taille_morceau=10_000):
+    """Lecture paresseuse d'un CSV, enregistrement par enregistrement"""
+    for morceau in pd.read_csv(chemin, chunksize=taille_morceau):
+        yield from morceau.to_dict(orient='records')
+
+def ecrire_csv_par_morceaux(enregistrements, chemin, taille_morceau=10_000):
+    """Écriture incrémentale d'un flux d'enregistrements dans un CSV
+
+    Les enregistrements sont ajoutés au fichier par morceaux ; retourne le nombre
+    d'enregistrements écrits.
+    """
+    nb_ecrits = 0
+    iterateur = iter(enregistrements)
+    with open(chemin, 'w', newline='', encoding='utf-8') as fichier:
+        while True:
+            morceau = list(islice(iterateur, taille_morceau))
+            if not morceau:
+                break
+            pd.DataFrame(morceau).to_csv(fichier, header=(nb_ecrits == 0), index=False)
+            nb_ecrits += len(morceau)
+    return nb_ecrits
+
+def traiter_csv_par_morceaux(pipeline, entree, sortie, taille_morceau=10_000):
+    """Traitement d'un CSV de taille quelconque par lots vectorisés, à mémoire constante
+
+    Retourne le nombre de lignes lues, le nombre de rejets et le bilan des raisons de rejet.
+    """
+    nb_lignes = 0
+    nb_rejets = 0
+    bilan = Counter()
+    entete = True
+    with open(sortie, 'w', newline='', encoding='utf-8') as fichier:
+        for morceau in pd.read_csv(entree, chunksize=taille_morceau):
+            lot, masque_rejet, raisons = pipeline.traiter_lot(morceau)
+            if not lot.empty:
+                lot.to_csv(fichier, header=entete, index=False)
+                entete = False
+            nb_lignes += len(morceau)
+            nb_rejets += int(masque_rejet.sum())
+            for raison in raisons[masque_rejet]:
+                bilan.update(raison.split("; "))
+
+    if nb_rejets:
+        journal.warning("%d enregistrement(s) rejeté(s) sur %d", nb_rejets, nb_lignes)
+        journal.warning("Bilan des anomalies : %s", dict(bilan))
+
+    return nb_lignes, nb_rejets, bilan
@@ -0,0 +1,158 @@
+import json
+import numpy as np
+import pandas as pd
+from Pipe_filter import CHAMPS_MESURE
+from tramage import envoyer_trame
+
+# Format binaire compact des relevés de compteurs, encodé et décodé par lots.
+#
+# Un lot est composé de :
+#   - la signature MAGIC (4 octets),
+#   - le nombre d'enregistrements et la taille du dictionnaire (2 x uint32, little-endian),
+#   - le dictionnaire des champs énumérés (JSON UTF-8 : champ -> liste des valeurs),
+#   - les enregistrements, tableau NumPy structuré de type DTYPE_MESURE.
+# Les champs énumérés sont transmis sous forme de codes dans le dictionnaire du lot,
+# l'horodatage en secondes depuis l'epoch et la consommation en kWh. La localisation,
+# constante pour un compteur donné, est elle aussi codée par dictionnaire.
+# L'identifiant du compteur et le code postal sont transmis en texte ASCII de
+# largeur fixe : les zéros de tête sont conservés ('01000') et ils sont restitués
+# en chaînes, comme dans un CSV reçu.
+
+# Signature du format ; changée à chaque modification de DTYPE_MESURE
+MAGIC = b'MCB2'
+
+DTYPE_ENTETE = np.dtype([('nb_enregistrements', '<u4'), ('taille_dictionnaire', '<u4')])
+
+DTYPE_MESURE = np.dtype([
+    ('compteur_id', 'S6'),
+    ('timestamp', '<i8'),
+    ('consommation', '<f8'),
+    ('type_client', 'u1'),
+    ('wilaya', '<u2'),
+    ('ville', '<u2'),
+    ('localisation', '<u4'),
+    ('region', 'u1'),
+    ('code_postal', 'S5'),
+    ('fournisseur', 'u1'),
+    ('tarif', '<f8'),
+    ('puissance_souscrite', '<f8'),
+    ('type_compteur', 'u1'),
+])
+
+# Champs codés par dictionnaire
+CHAMPS_ENUMERES = ['type_client', 'wilaya', 'ville', 'localisation', 'region', 'fournisseur', 'type_compteur']
+
+# Facteurs de conversion des unités de consommation vers le kWh
+UNITES_CONSOMMATION = {'kWh': 1.0, 'Wh': 1e-3}
+
+def _texte_fixe(colonne, champ):
+    """Colonne convertie en texte ASCII de la largeur du champ dans DTYPE_MESURE"""
+    largeur = DTYPE_MESURE[champ].itemsize
+    texte = colonne.astype(str)
+    if (texte.str.len() > largeur).any():
+        raise ValueError(f"Valeur de plus de {largeur} caractères pour le champ {champ}")
+    try:
+        return texte.to_numpy(dtype=object).astype(DTYPE_MESURE[champ])
+    except UnicodeEncodeError as e:
+        raise ValueError(f"Valeur non ASCII pour le champ {champ}") from e
+
+def est_lot_binaire(contenu):
+    """Vrai si le contenu commence par la signature du format binaire"""
+    return bytes(contenu[:len(MAGIC)]) == MAGIC
+
+def encoder_lot(lot):
+    """Encodage d'un lot (DataFrame au format du jeu de données) en octets"""
+    tableau = np.zeros(len(lot), dtype=DTYPE_MESURE)
+    if lot.empty:
+        return _assembler(tableau, {champ: [] for champ in CHAMPS_ENUMERES})
+
+    tableau['compteur_id'] = _texte_fixe(lot['compteur_id'], 'compteur_id')
+    horodatage = pd.to_datetime(lot['timestamp'], format='ISO8601')
+    tableau['timestamp'] = (horodatage - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+
+    parties = lot['consommation'].astype(str).str.split(n=1, expand=True)
+    facteur = parties[1].map(UNITES_CONSOMMATION) if 1 in parties else 1.0
+    if np.isnan(np.asarray(facteur, dtype=float)).any():
+        raise ValueError("Unité de consommation inconnue")
+    tableau['consommation'] = parties[0].astype(float) * facteur
+
+    tableau['code_postal'] = _texte_fixe(lot['code_postal'], 'code_postal')
+    tableau['tarif'] = pd.to_numeric(lot['tarif'], errors='raise')
+    tableau['puissance_souscrite'] = lot['puissance_souscrite'].astype(str).str.split().str[0].astype(float)
+
+    dictionnaire = {}
+    for champ in CHAMPS_ENUMERES:
+        codes, valeurs = pd.factorize(lot[champ].astype(str))
+        if len(valeurs) > np.iinfo(DTYPE_MESURE[champ]).max + 1:
+            raise ValueError(f"Trop de valeurs distinctes pour le champ {champ} : {len(valeurs)}")
+        tableau[champ] = codes
+        dictionnaire[champ] = list(valeurs)
+
+    return _assembler(tableau, dictionnaire)
+
+def _assembler(tableau, dictionnaire):
+    dictionnaire_octets = json.dumps(dictionnaire, ensure_ascii=False).encode('utf-8')
+    entete = np.array([(len(tableau), len(dictionnaire_octets))], dtype=DTYPE_ENTETE)
+    return b''.join([MAGIC, entete.tobytes(), dictionnaire_octets, tableau.tobytes()])
+
+def encoder_enregistrements(enregistrements):
+    """Encodage d'une liste de dictionnaires en octets"""
+    return encoder_lot(pd.DataFrame(enregistrements))
+
+def envoyer_lot(sock, lot):
+    """Envoi d'un lot (DataFrame) encodé comme une trame"""
+    envoyer_trame(sock, encoder_lot(lot))
+
+def decoder_lot(contenu):
+    """Décodage d'un lot en tableau structuré et dictionnaire des champs énumérés
+
+    Le tableau est une vue sur les octets reçus, sans copie.
+    """
+    if not est_lot_binaire(contenu):
+        raise ValueError("Signature du format binaire absente")
+    debut = len(MAGIC)
+    entete = np.frombuffer(contenu, dtype=DTYPE_ENTETE, count=1, offset=debut)[0]
+    debut += DTYPE_ENTETE.itemsize
+    fin_dictionnaire = debut + int(entete['taille_dictionnaire'])
+    dictionnaire = json.loads(bytes(contenu[debut:fin_dictionnaire]).decode('utf-8'))
+    tableau = np.frombuffer(contenu, dtype=DTYPE_MESURE, count=int(entete['nb_enregistrements']),
+                            offset=fin_dictionnaire)
+    return tableau, dictionnaire
+
+def _formater(valeurs, suffixe):
+    """Mise en forme textuelle d'une colonne numérique ('45.313 kWh')
+
+    Seules les valeurs distinctes sont mises en forme, puis réparties sur les lignes.
+    """
+    distinctes, inverse = np.unique(valeurs, return_inverse=True)
+    textes = np.array([f"{valeur!r}{suffixe}" for valeur in distinctes.tolist()], dtype=object)
+    return textes[inverse.reshape(-1)]
+
+def _colonnes(contenu):
+    """Décodage d'un lot en colonnes au format du jeu de données
+
+    L'horodatage est restitué au format ISO 8601 ('2024-05-24T04:08:39').
+    """
+    tableau, dictionnaire = decoder_lot(contenu)
+    colonnes = {
+        'compteur_id': tableau['compteur_id'].astype('U').astype(object),
+        'timestamp': np.datetime_as_string(tableau['timestamp'].astype('datetime64[s]')).astype(object),
+        'consommation': _formater(tableau['consommation'], ' kWh'),
+        'code_postal': tableau['code_postal'].astype('U').astype(object),
+        'tarif': tableau['tarif'],
+        'puissance_souscrite': _formater(tableau['puissance_souscrite'], ' kW'),
+    }
+    for champ in CHAMPS_ENUMERES:
+        colonnes[champ] = np.asarray(dictionnaire[champ], dtype=object)[tableau[champ]]
+    return colonnes
+
+def vers_dataframe(contenu):
+    """Décodage d'un lot en DataFrame (entrée de Pipeline.traiter_lot)"""
+    colonnes = _colonnes(contenu)
+    return pd.DataFrame({champ: colonnes[champ] for champ in CHAMPS_MESURE})
+
+def decoder_enregistrements(contenu):
+    """Décodage d'un lot en liste de dictionnaires (entrée de Pipeline.traiter)"""
+    colonnes = _colonnes(contenu)
+    lignes = zip(*(colonnes[champ].tolist() for champ in CHAMPS_MESURE))
+    return [dict(zip(CHAMPS_MESURE, ligne)) for ligne in lignes]
@@ -0,0 +1,211 @@
+import logging
+import threading
+from itertools import islice
+from queue import Queue
+from Pipe_filter import Pipeline, MesureCompteur, _vers_dict, _instantane
+
+# Graphe orienté acyclique de filtres. Chaque nœud applique une séquence de filtres
+# (comme un Pipeline) dans son propre thread, puis transmet les enregistrements
+# acceptés à ses successeurs : à tous (diffusion) ou seulement à ceux dont le
+# prédicat est vrai (routage). Un enregistrement rejeté, ou qu'aucun prédicat ne
+# retient, ne va pas plus loin.
+#
+# Les nœuds échangent des micro-lots d'enregistrements par des files bornées : un
+# nœud trop lent bloque ses prédécesseurs (contre-pression). La fin du flux est
+# propagée par un marqueur ; un nœud s'arrête après l'avoir reçu de tous ses
+# prédécesseurs, et appelle alors `vider` sur ceux de ses filtres qui en ont une
+# (FiltreAgregation ferme ainsi ses dernières fenêtres).
+
+journal = logging.getLogger(__name__)
+
+FIN = None
+
+def valeur(donnees, champ):
+    """Valeur d'un champ d'une MesureCompteur ou d'un dictionnaire brut"""
+    if isinstance(donnees, MesureCompteur):
+        return getattr(donnees, champ)
+    return donnees.get(champ)
+
+def champ_parmi(champ, *valeurs):
+    """Prédicat de routage : le champ vaut l'une des valeurs (sans tenir compte de la casse)"""
+    valeurs = {str(v).lower() for v in valeurs}
+    return lambda donnees: str(valeur(donnees, champ)).lower() in valeurs
+
+def _copier(donnees):
+    return donnees.copier() if isinstance(donnees, MesureCompteur) else dict(donnees)
+
+class Noeud:
+    """Nœud du graphe : séquence de filtres, file d'entrée bornée et successeurs
+
+    Les enregistrements acceptés par un nœud sans successeur sont transmis à
+    `sortie` (sérialisés en dictionnaires), si elle est fournie.
+    """
+    def __init__(self, nom, filtres, sortie=None, taille_file=64, **options_pipeline):
+        self.nom = nom
+        # Le pipeline du nœud porte le puits d'anomalies, les statistiques et les lettres mortes
+        self.pipeline = Pipeline(list(filtres), **options_pipeline)
+        self.sortie = sortie
+        self.file = Queue(maxsize=taille_file)
+        # (successeur, prédicat ou None)
+        self.successeurs = []
+        self.nb_predecesseurs = 0
+        self.nb_recus = 0
+        self.nb_rejets = 0
+        self.erreur = None
+
+    def __repr__(self):
+        return f"Noeud({self.nom!r})"
+
+    def _traiter(self, lot):
+        """Application des filtres à un micro-lot ; retourne les micro-lots de chaque successeur"""
+        pipeline = self.pipeline
+        sorties = [[] for _ in self.successeurs]
+        for donnees in lot:
+            entree = _instantane(donnees)
+            donnees, erreurs, anomalies = pipeline._appliquer_filtres(donnees)
+            if donnees is None:
+                self.nb_rejets += 1
+                pipeline._signaler_rejet(_vers_dict(entree), erreurs, anomalies)
+                continue
+            if not self.successeurs:
+                if self.sortie is not None:
+                    self.sortie(_vers_dict(donnees))
+                continue
+            destinations = [sortie for sortie, (_, predicat) in zip(sorties, self.successeurs)
+                            if predicat is None or predicat(donnees)]
+            # Chaque branche reçoit sa propre copie, sauf la dernière
+            for sortie in destinations[:-1]:
+                sortie.append(_copier(donnees))
+            if destinations:
+                destinations[-1].append(donnees)
+        self.nb_recus += len(lot)
+        return sorties
+
+    def executer(self):
+        """Boucle du thread du nœud, jusqu'à la fin du flux de tous les prédécesseurs"""
+        # Les nœuds sans prédécesseur ne reçoivent que la fin du flux d'entrée
+        fins = 0
+        while fins < max(self.nb_predecesseurs, 1):
+            lot = self.file.get()
+            if lot is FIN:
+                fins += 1
+                continue
+            if self.erreur is not None:
+                # Après une erreur, la file est seulement vidée pour ne pas bloquer l'amont
+                continue
+            try:
+                sorties = self._traiter(lot)
+            except Exception as e:
+                journal.exception("Erreur dans le nœud %s", self.nom)
+                self.erreur = e
+                continue
+            for sortie, (successeur, _) in zip(sorties, self.successeurs):
+                if sortie:
+                    successeur.file.put(sortie)
+
+        if self.erreur is None:
+            for filtre in self.pipeline.filtres:
+                if hasattr(filtre, 'vider'):
+                    filtre.vider()
+        for successeur, _ in self.successeurs:
+            successeur.file.put(FIN)
+
+class Graphe:
+    """Graphe orienté acyclique de filtres, alimenté par un flux d'enregistrements
+
+    Les nœuds sans prédécesseur reçoivent tous les enregistrements du flux. Le
+    même puits d'anomalies est partagé par tous les nœuds qui n'en ont pas.
+    """
+    def __init__(self, taille_lot=256, puits=None):
+        self.taille_lot = taille_lot
+        self.noeuds = []
+        self.puits = puits
+
+    def noeud(self, nom, filtres, sortie=None, taille_file=64, **options_pipeline):
+        """Ajout d'un nœud appliquant les filtres en séquence"""
+        if any(noeud.nom == nom for noeud in self.noeuds):
+            raise ValueError(f"Nœud déjà présent : {nom}")
+        options_pipeline.setdefault('puits', self.puits)
+        noeud = Noeud(nom, filtres, sortie, taille_file, **options_pipeline)
+        if self.puits is None:
+            self.puits = noeud.pipeline.puits
+        self.noeuds.append(noeud)
+        return noeud
+
+    def relier(self, origine, destination, predicat=None):
+        """Ajout d'une arête ; sans prédicat, tous les enregistrements acceptés la suivent"""
+        origine.successeurs.append((destination, predicat))
+        destination.nb_predecesseurs += 1
+
+    def _verifier(self):
+        """Contrôle de l'absence de cycle (tri topologique)"""
+        degres = {noeud: noeud.nb_predecesseurs for noeud in self.noeuds}
+        prets = [noeud for noeud, degre in degres.items() if degre == 0]
+        nb_visites = 0
+        while prets:
+            noeud = prets.pop()
+            nb_visites += 1
+            for successeur, _ in noeud.successeurs:
+                degres[successeur] -= 1
+                if degres[successeur] == 0:
+                    prets.append(successeur)
+        if nb_visites < len(self.noeuds):
+            raise ValueError("Le graphe de filtres contient un cycle")
+
+    def executer(self, flux):
+        """Traitement complet d'un flux ; retourne le bilan (reçus, rejets) de chaque nœud"""
+        self._verifier()
+        racines = [noeud for noeud in self.noeuds if noeud.nb_predecesseurs == 0]
+        threads = [threading.Thread(target=noeud.executer, name=f"noeud-{noeud.nom}", daemon=True)
+                   for noeud in self.noeuds]
+        for thread in threads:
+            thread.start()
+        try:
+            iterateur = iter(flux)
+            while True:
+                lot = list(islice(iterateur, self.taille_lot))
+                if not lot:
+                    break
+                for noeud in racines[:-1]:
+                    noeud.file.put([_copier(donnees) for donnees in lot])
+                racines[-1].file.put(lot)
+        finally:
+            for noeud in racines:
+                noeud.file.put(FIN)
+            for thread in threads:
+                thread.join()
+
+        for noeud in self.noeuds:
+            if noeud.erreur is not None:
+                raise RuntimeError(f"Échec du nœud {noeud.nom}") from noeud.erreur
+        return {noeud.nom: {'recus': noeud.nb_recus, 'rejets': noeud.nb_rejets} for noeud in self.noeuds}
+
+if __name__ == '__main__':
+    import csv
+    from Pipe_filter import (CHAMPS_MESURE, CHAMPS_DERIVES, FiltreValidation, FiltreNormalisation,
+                             FiltreTransformation, FiltreSecurite)
+    from agregation import FiltreAgregation
+    from detection_anomalies import FiltreDetectionAnomalies
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with open('dataset_consommation_energie_algerie.csv', newline='', encoding='utf-8') as entree, \
+            open('dataset_consommation_energie_algerie_archive.csv', 'w', newline='', encoding='utf-8') as archive:
+        ecrivain = csv.DictWriter(archive, fieldnames=CHAMPS_MESURE + CHAMPS_DERIVES)
+        ecrivain.writeheader()
+        fenetres = []
+
+        # validation -> agrégation, validation -> transformation -> sécurité -> archive,
+        # et pour les seuls clients industriels : validation -> détection d'anomalies
+        graphe = Graphe()
+        validation = graphe.noeud('validation', [FiltreValidation(), FiltreNormalisation()])
+        agregation = graphe.noeud('agregation', [FiltreAgregation(sortie=fenetres.append)])
+        archivage = graphe.noeud('archivage', [FiltreTransformation(), FiltreSecurite()], sortie=ecrivain.writerow)
+        industriels = graphe.noeud('industriels', [FiltreDetectionAnomalies()])
+        graphe.relier(validation, agregation)
+        graphe.relier(validation, archivage)
+        graphe.relier(validation, industriels, champ_parmi('type_client', 'Industriel'))
+
+        bilan = graphe.executer(csv.DictReader(entree))
+    print(bilan)
+    print(f"{len(fenetres)} agrégats de fenêtres")
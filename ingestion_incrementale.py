@@ -0,0 +1,221 @@
+import hashlib
+import io
+import json
+import logging
+import os
+from itertools import islice
+
+journal = logging.getLogger(__name__)
+
+# Ingestion incrémentale d'un CSV alimenté par ajouts successifs : seules les lignes
+# ajoutées depuis l'exécution précédente sont lues, traitées et ajoutées à la sortie.
+#
+# Deux fichiers accompagnent la sortie :
+#   - l'état (JSON), point de reprise réécrit atomiquement après chaque morceau :
+#     position de lecture atteinte dans l'entrée, empreinte des derniers octets lus
+#     et en-tête, tailles de la sortie, de l'index et des lettres mortes du
+#     pipeline, états des filtres (Pipeline.etat) ; si l'entrée a été réécrite ou tronquée, l'empreinte ne
+#     correspond plus et tout est retraité ;
+#   - l'index des clés (compteur_id|timestamp) des enregistrements déjà traités, une
+#     par ligne, chargé en mémoire dans un ensemble : les relevés en double sont
+#     écartés en O(1), y compris lorsqu'ils sont renvoyés plus tard.
+# Après un arrêt brutal, la sortie, l'index et les lettres mortes sont tronqués à leur
+# taille au dernier point de reprise et les filtres retrouvent leur état : le morceau interrompu est
+# retraité sans doublon ni perte (au plus un morceau à refaire).
+# Les lignes de l'entrée ne doivent pas contenir de saut de ligne entre guillemets.
+
+TAILLE_EMPREINTE = 4096
+
+def _empreinte(fichier, position):
+    """Empreinte des TAILLE_EMPREINTE octets précédant la position"""
+    debut = max(0, position - TAILLE_EMPREINTE)
+    fichier.seek(debut)
+    return hashlib.sha256(fichier.read(position - debut)).hexdigest()
+
+class IndexCles:
+    """Ensemble des clés des enregistrements traités, persisté par ajouts dans un fichier"""
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.cles = set()
+        if os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as fichier:
+                self.cles.update(ligne.rstrip('\n') for ligne in fichier)
+
+    def __contains__(self, cle):
+        return cle in self.cles
+
+    def __len__(self):
+        return len(self.cles)
+
+    def ajouter(self, cles):
+        cles = [cle for cle in cles if cle not in self.cles]
+        if not cles:
+            return
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            fichier.write(''.join(f"{cle}\n" for cle in cles))
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        self.cles.update(cles)
+
+    def taille(self):
+        """Taille du fichier de l'index (position de reprise)"""
+        return os.path.getsize(self.chemin) if os.path.exists(self.chemin) else 0
+
+    def effacer(self):
+        self.cles.clear()
+        if os.path.exists(self.chemin):
+            os.remove(self.chemin)
+
+def cles_lot(lot):
+    """Clés (compteur_id|timestamp) des lignes d'un lot (DataFrame)"""
+    return lot['compteur_id'].astype(str) + '|' + lot['timestamp'].astype(str)
+
+def lire_etat(chemin):
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin, encoding='utf-8') as fichier:
+        return json.load(fichier)
+
+def _valeur_json(valeur):
+    # Scalaires NumPy (clés et cumuls issus des traitements par lots)
+    if hasattr(valeur, 'item'):
+        return valeur.item()
+    raise TypeError(f"Valeur non sérialisable : {valeur!r}")
+
+def ecrire_etat(chemin, etat):
+    """Écriture atomique de l'état (fichier temporaire puis renommage)"""
+    temporaire = f"{chemin}.tmp"
+    with open(temporaire, 'w', encoding='utf-8') as fichier:
+        json.dump(etat, fichier, default=_valeur_json)
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(temporaire, chemin)
+
+def tronquer(chemin, taille):
+    """Retour d'un fichier à sa taille au point de reprise (écritures postérieures annulées)"""
+    if taille is not None and os.path.exists(chemin) and os.path.getsize(chemin) > taille:
+        with open(chemin, 'r+b') as fichier:
+            fichier.truncate(taille)
+
+def position_reprise(fichier, etat):
+    """Position de reprise dans l'entrée ouverte (après l'en-tête), None si l'état ne lui correspond plus
+
+    La position courante du fichier doit être la fin de l'en-tête.
+    """
+    debut = fichier.tell()
+    fichier.seek(0)
+    entete = fichier.readline()
+    taille = os.fstat(fichier.fileno()).st_size
+    valide = (etat is not None and etat['entete'] == entete.decode('utf-8')
+              and etat['position'] <= taille
+              and _empreinte(fichier, etat['position']) == etat['empreinte'])
+    fichier.seek(debut)
+    return etat['position'] if valide else None
+
+def point_reprise(fichier, position, entete, **autres):
+    """État à écrire après un morceau lu jusqu'à `position`"""
+    return {'position': position, 'empreinte': _empreinte(fichier, position),
+            'entete': entete.decode('utf-8'), **autres}
+
+def synchroniser(fichier):
+    """Écriture sur disque d'un fichier de sortie ; retourne sa taille"""
+    fichier.flush()
+    os.fsync(fichier.fileno())
+    return os.fstat(fichier.fileno()).st_size
+
+def taille_lettres_mortes(pipeline):
+    """Taille des lettres mortes du pipeline une fois écrites sur disque, None s'il n'en a pas"""
+    lettres_mortes = getattr(pipeline, 'lettres_mortes', None)
+    return None if lettres_mortes is None else lettres_mortes.synchroniser()
+
+def tronquer_lettres_mortes(pipeline, etat):
+    """Retour des lettres mortes du pipeline à leur taille au point de reprise"""
+    lettres_mortes = getattr(pipeline, 'lettres_mortes', None)
+    if lettres_mortes is not None:
+        lettres_mortes.vider()
+        tronquer(lettres_mortes.chemin, etat.get('position_lettres_mortes'))
+
+def effacer_lettres_mortes(pipeline):
+    """Lettres mortes du pipeline remises à zéro (retraitement complet de l'entrée)"""
+    tronquer_lettres_mortes(pipeline, {'position_lettres_mortes': 0})
+
+def lignes_completes(fichier, taille_morceau):
+    """Lignes complètes (terminées par un saut de ligne) à partir de la position courante
+
+    Une dernière ligne incomplète, en cours d'écriture, est laissée pour l'exécution suivante.
+    """
+    while True:
+        lignes = list(islice(fichier, taille_morceau))
+        fin = bool(lignes) and not lignes[-1].endswith(b'\n')
+        if fin:
+            lignes.pop()
+        if not lignes:
+            return
+        yield lignes
+        if fin:
+            return
+
+def traiter_csv_incremental(pipeline, entree, sortie, taille_morceau=50_000,
+                            chemin_etat=None, chemin_index=None):
+    """Traitement des seules lignes ajoutées à `entree` depuis l'exécution précédente
+
+    Les lignes acceptées sont ajoutées à `sortie`, les relevés déjà traités sont
+    écartés. Retourne le nombre de lignes lues, de doublons écartés et de rejets.
+    """
+    import pandas as pd
+    chemin_etat = chemin_etat or f"{sortie}.etat.json"
+    chemin_index = chemin_index or f"{sortie}.cles"
+    etat = lire_etat(chemin_etat)
+
+    nb_lignes = nb_doublons = nb_rejets = 0
+    with open(entree, 'rb') as fichier:
+        entete = fichier.readline()
+        position = position_reprise(fichier, etat)
+        if position is not None:
+            # Annulation de ce qui a été écrit après le dernier point de reprise
+            tronquer(sortie, etat.get('position_sortie'))
+            tronquer(chemin_index, etat.get('position_index'))
+            tronquer_lettres_mortes(pipeline, etat)
+            if etat.get('filtres') is not None:
+                pipeline.restaurer(etat['filtres'])
+            index = IndexCles(chemin_index)
+        else:
+            if etat is not None:
+                journal.warning("%s a été réécrit depuis la dernière exécution : retraitement complet", entree)
+            position = fichier.tell()
+            index = IndexCles(chemin_index)
+            index.effacer()
+            if os.path.exists(sortie):
+                os.remove(sortie)
+            effacer_lettres_mortes(pipeline)
+
+        with open(sortie, 'a', newline='', encoding='utf-8') as fichier_sortie:
+            fichier.seek(position)
+            for lignes in lignes_completes(fichier, taille_morceau):
+                morceau = pd.read_csv(io.BytesIO(entete + b''.join(lignes)))
+                position += sum(map(len, lignes))
+                nb_lignes += len(morceau)
+
+                # Doublons : relevés déjà traités ou répétés dans le morceau
+                cles = cles_lot(morceau)
+                doublon = cles.map(index.__contains__).astype(bool) | cles.duplicated()
+                nb_doublons += int(doublon.sum())
+                morceau, cles = morceau[~doublon], cles[~doublon]
+
+                if not morceau.empty:
+                    lot, masque_rejet, _ = pipeline.traiter_lot(morceau)
+                    nb_rejets += int(masque_rejet.sum())
+                    if not lot.empty:
+                        lot.to_csv(fichier_sortie, header=fichier_sortie.tell() == 0, index=False)
+                        # Seuls les relevés acceptés sont indexés : un relevé rejeté puis corrigé reste admis
+                        index.ajouter(cles[~masque_rejet])
+
+                # Le point de reprise n'avance qu'une fois la sortie, l'index et les lettres mortes sur disque
+                ecrire_etat(chemin_etat, point_reprise(fichier, position, entete,
+                                                       position_sortie=synchroniser(fichier_sortie),
+                                                       position_index=index.taille(),
+                                                       position_lettres_mortes=taille_lettres_mortes(pipeline),
+                                                       filtres=pipeline.etat()))
+                fichier.seek(position)
+
+    return nb_lignes, nb_doublons, nb_rejets
@@ -1,5 +1,6 @@
 # Client 1
 import socket
+from tramage import envoyer_trame
 
 # Créer un socket
 client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -19,9 +20,9 @@ print(f"En attente de connexion sur {host}:{port}...")
 conn, addr = client_socket.accept()
 print(f"Connecté à {addr}")
 
-# Envoyer un message
+# Envoyer un message (précédé de sa taille)
 message = "Salut, je suis le client 1!"
-conn.send(message.encode())
+envoyer_trame(conn, message.encode())
 
 # Fermer la connexion
 conn.close()
\ No newline at end of file
@@ -0,0 +1,192 @@
+import io
+import logging
+import mmap
+import os
+from collections import Counter, deque
+import Pipe_filter
+from Pipe_filter import CHAMPS_MESURE, _initialiser_processus
+
+# Lecture d'un CSV reçu (Classeur.csv, jeu de données...) par projection en mémoire
+# (mmap). Le fichier est découpé en plages d'octets alignées sur les fins de ligne ;
+# chaque plage est analysée par un processus de travail qui projette lui-même le
+# fichier et n'en lit que sa plage : le fichier n'est ni copié dans chaque
+# processus ni transmis par le processus principal, qui ne reçoit que les résultats.
+#
+# Le schéma des 13 colonnes est fixé (SCHEMA_CSV) : les types ne sont pas inférés,
+# et la ligne d'en-tête est facultative (fichier reçu sans en-tête). L'analyse
+# utilise le lecteur natif de pyarrow s'il est installé, sinon celui de pandas
+# (moteur C). Une plage dont une valeur ne respecte pas le schéma (identifiant non
+# numérique...) est relue avec inférence des types, ses lignes étant alors
+# rejetées par FiltreValidation. Les lignes ne doivent pas contenir de saut de
+# ligne entre guillemets.
+
+journal = logging.getLogger(__name__)
+
+# Types des colonnes, tels que pandas les infère sur le jeu de données
+SCHEMA_CSV = {
+    'compteur_id': 'int64',
+    'timestamp': 'str',
+    'consommation': 'str',
+    'type_client': 'str',
+    'wilaya': 'str',
+    'ville': 'str',
+    'localisation': 'str',
+    'region': 'str',
+    'code_postal': 'int64',
+    'fournisseur': 'str',
+    'tarif': 'float64',
+    'puissance_souscrite': 'str',
+    'type_compteur': 'str',
+}
+if list(SCHEMA_CSV) != CHAMPS_MESURE:
+    raise ValueError("SCHEMA_CSV ne suit pas les colonnes de CHAMPS_MESURE")
+
+ENTETE = ','.join(CHAMPS_MESURE).encode('utf-8')
+TAILLE_PLAGE = 64 * 1024 * 1024
+
+def _pyarrow_disponible():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def plages_lignes(chemin, taille_plage=TAILLE_PLAGE):
+    """Découpage du fichier en plages (début, fin) d'environ `taille_plage` octets
+
+    Chaque plage commence au début d'une ligne et se termine après un saut de
+    ligne (ou à la fin du fichier) ; l'en-tête éventuel est exclu.
+    """
+    taille = os.path.getsize(chemin)
+    if taille == 0:
+        return []
+    plages = []
+    with open(chemin, 'rb') as fichier, mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as projection:
+        fin_ligne = projection.find(b'\n')
+        premiere = projection[:taille if fin_ligne < 0 else fin_ligne].rstrip(b'\r')
+        debut = (taille if fin_ligne < 0 else fin_ligne + 1) if premiere == ENTETE else 0
+        while debut < taille:
+            fin_ligne = projection.find(b'\n', min(debut + taille_plage, taille) - 1)
+            fin = taille if fin_ligne < 0 else fin_ligne + 1
+            plages.append((debut, fin))
+            debut = fin
+    return plages
+
+def lire_plage(chemin, debut, fin, moteur=None):
+    """Analyse d'une plage de lignes du fichier, DataFrame au schéma SCHEMA_CSV"""
+    import pandas as pd
+    moteur = moteur or ('pyarrow' if _pyarrow_disponible() else 'c')
+    with open(chemin, 'rb') as fichier, mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as projection:
+        # Seule la plage est lue (et copiée) depuis la projection
+        contenu = projection[debut:fin]
+    options = {'header': None, 'names': CHAMPS_MESURE, 'engine': moteur}
+    try:
+        return pd.read_csv(io.BytesIO(contenu), dtype=SCHEMA_CSV, **options)
+    except pd.errors.ParserError:
+        # Fichier mal formé (guillemet non fermé...) : l'inférence des types n'y changerait rien
+        raise
+    except (ValueError, TypeError) as e:
+        journal.warning("Plage %d-%d non conforme au schéma (%s) : types inférés", debut, fin, e)
+        return pd.read_csv(io.BytesIO(contenu), **options)
+
+def _executeur(nb_processus, **options):
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=nb_processus, **options)
+
+def _en_ordre(executeur, fonction, plages, nb_en_cours):
+    """Résultats de `fonction` sur chaque plage, dans l'ordre du fichier
+
+    Au plus `nb_en_cours` plages sont soumises à la fois : la mémoire occupée par
+    les résultats en attente reste bornée.
+    """
+    en_cours = deque()
+    for plage in plages:
+        en_cours.append(executeur.submit(fonction, *plage))
+        if len(en_cours) >= nb_en_cours:
+            yield en_cours.popleft().result()
+    while en_cours:
+        yield en_cours.popleft().result()
+
+def lire_csv_mmap(chemin, nb_processus=None, taille_plage=TAILLE_PLAGE):
+    """Lecture du fichier plage par plage, DataFrames dans l'ordre du fichier"""
+    nb_processus = nb_processus or os.cpu_count()
+    plages = [(chemin, debut, fin) for debut, fin in plages_lignes(chemin, taille_plage)]
+    if nb_processus == 1:
+        for plage in plages:
+            yield lire_plage(*plage)
+        return
+    with _executeur(nb_processus) as executeur:
+        yield from _en_ordre(executeur, lire_plage, plages, 2 * nb_processus)
+
+def _traiter_plage(chemin, debut, fin, pipeline=None):
+    """Analyse et traitement d'une plage
+
+    Retourne les champs et le CSV (sans en-tête) des lignes acceptées, le nombre
+    de lignes, les lignes rejetées, leurs raisons, leurs erreurs et leurs anomalies.
+    """
+    # Pipeline du processus de travail, construit par Pipe_filter._initialiser_processus
+    pipeline = pipeline or Pipe_filter._pipeline_processus
+    lot = lire_plage(chemin, debut, fin)
+    acceptes, masque_rejet, raisons = pipeline.traiter_lot(lot)
+    return (list(acceptes.columns), acceptes.to_csv(header=False, index=False, lineterminator='\n'),
+            len(lot), lot[masque_rejet], raisons[masque_rejet],
+            pipeline.erreurs_lot[masque_rejet], pipeline.anomalies_lot[masque_rejet])
+
+def traiter_csv_mmap(pipeline, entree, sortie, nb_processus=None, taille_plage=TAILLE_PLAGE):
+    """Traitement de `entree` par plages réparties sur plusieurs processus, lignes acceptées dans `sortie`
+
+    Comme pour PipelineParallele, chaque processus possède sa propre copie des
+    filtres ; les rejets sont conservés dans les lettres mortes du pipeline par le
+    processus principal. Retourne le nombre de lignes lues, le nombre de rejets et
+    le bilan des raisons de rejet.
+    """
+    nb_processus = nb_processus or os.cpu_count()
+    plages = [(entree, debut, fin) for debut, fin in plages_lignes(entree, taille_plage)]
+    nb_lignes = 0
+    nb_rejets = 0
+    bilan = Counter()
+    with open(sortie, 'w', newline='', encoding='utf-8') as fichier:
+        entete = True
+        if nb_processus == 1:
+            resultats = (_traiter_plage(*plage, pipeline=pipeline) for plage in plages)
+            executeur = None
+        else:
+            # Les lettres mortes restent dans le processus principal
+            executeur = _executeur(nb_processus, initializer=_initialiser_processus,
+                                   initargs=(pipeline.filtres,))
+            resultats = _en_ordre(executeur, _traiter_plage, plages, 2 * nb_processus)
+        try:
+            for champs, texte, nb, rejetes, raisons, erreurs, anomalies in resultats:
+                if texte:
+                    if entete:
+                        fichier.write(','.join(champs) + '\n')
+                        entete = False
+                    fichier.write(texte)
+                nb_lignes += nb
+                nb_rejets += len(rejetes)
+                for raison in raisons:
+                    bilan.update(raison.split("; "))
+                if executeur is not None and len(rejetes) and pipeline.lettres_mortes is not None:
+                    pipeline.lettres_mortes.ecrire_lot(rejetes, erreurs, anomalies)
+        finally:
+            if executeur is not None:
+                executeur.shutdown(cancel_futures=True)
+
+    if nb_rejets:
+        journal.warning("%d enregistrement(s) rejeté(s) sur %d", nb_rejets, nb_lignes)
+        journal.warning("Bilan des anomalies : %s", dict(bilan))
+
+    return nb_lignes, nb_rejets, bilan
+
+if __name__ == '__main__':
+    from Pipe_filter import Pipeline, FiltreValidation, FiltreNormalisation, FiltreTransformation
+    from lettres_mortes import EcrivainLettresMortes
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    lettres_mortes = EcrivainLettresMortes('dataset_consommation_energie_algerie_rejets.jsonl')
+    pipeline = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()],
+                        lettres_mortes=lettres_mortes)
+    print(traiter_csv_mmap(pipeline, 'dataset_consommation_energie_algerie.csv',
+                           'dataset_consommation_energie_algerie_traite.csv')[:2])
+    lettres_mortes.fermer()
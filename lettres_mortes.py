@@ -0,0 +1,114 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from itertools import islice
+
+# File des lettres mortes : les enregistrements rejetés par le pipeline sont
+# conservés tels qu'ils ont été reçus, avec leurs erreurs et anomalies, dans un
+# fichier JSONL (une ligne par enregistrement). Ils peuvent ensuite être corrigés
+# en masse puis rejoués par lots dans un pipeline, sans relancer toute l'ingestion.
+
+class EcrivainLettresMortes:
+    """Écriture tamponnée des enregistrements rejetés dans un fichier JSONL
+
+    Chaque ligne contient 'donnees' (l'enregistrement d'entrée), 'erreurs' et
+    'anomalies'. L'écrivain peut être partagé entre plusieurs fils d'exécution.
+    """
+    def __init__(self, chemin, taille_tampon=1 << 20):
+        self.chemin = chemin
+        self.nb_enregistrements = 0
+        self._fichier = open(chemin, 'a', encoding='utf-8', buffering=taille_tampon)
+        self._verrou = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    @staticmethod
+    def _ligne(donnees, erreurs, anomalies):
+        return json.dumps({'donnees': donnees, 'erreurs': erreurs, 'anomalies': anomalies},
+                          ensure_ascii=False, default=str) + '\n'
+
+    def ecrire(self, donnees, erreurs, anomalies=()):
+        """Ajout d'un enregistrement rejeté (dictionnaire d'entrée)"""
+        ligne = self._ligne(donnees, list(erreurs), list(anomalies))
+        with self._verrou:
+            self._fichier.write(ligne)
+            self.nb_enregistrements += 1
+
+    def ecrire_lot(self, lot, erreurs, anomalies=None):
+        """Ajout des lignes rejetées d'un lot (DataFrame), de leurs erreurs et anomalies (jointes par "; ")"""
+        anomalies = [''] * len(lot) if anomalies is None else anomalies
+        lignes = ''.join(self._ligne(donnees, erreurs_ligne.split("; "),
+                                     anomalies_ligne.split("; ") if anomalies_ligne else [])
+                         for donnees, erreurs_ligne, anomalies_ligne
+                         in zip(lot.to_dict(orient='records'), erreurs, anomalies))
+        with self._verrou:
+            self._fichier.write(lignes)
+            self.nb_enregistrements += len(lot)
+
+    def vider(self):
+        with self._verrou:
+            self._fichier.flush()
+
+    def synchroniser(self):
+        """Écriture sur disque des enregistrements reçus ; retourne la taille du fichier"""
+        with self._verrou:
+            self._fichier.flush()
+            os.fsync(self._fichier.fileno())
+            return os.fstat(self._fichier.fileno()).st_size
+
+    def fermer(self):
+        with self._verrou:
+            self._fichier.close()
+
+def lire_lettres_mortes(chemin, taille_lot=50_000):
+    """Lecture d'un fichier de lettres mortes par lots de dictionnaires d'entrée"""
+    with open(chemin, encoding='utf-8') as fichier:
+        lignes = (json.loads(ligne)['donnees'] for ligne in fichier if ligne.strip())
+        while True:
+            lot = list(islice(lignes, taille_lot))
+            if not lot:
+                return
+            yield lot
+
+def rejouer(chemin, pipeline, taille_lot=50_000):
+    """Traitement par lots des enregistrements d'un fichier de lettres mortes
+
+    Génère, pour chaque lot, le résultat de pipeline.traiter_lot : les lignes
+    acceptées, le masque des lignes rejetées et les raisons du rejet. Les lignes
+    encore rejetées vont dans les lettres mortes du pipeline, s'il en a.
+    """
+    import pandas as pd
+    for lot in lire_lettres_mortes(chemin, taille_lot):
+        yield pipeline.traiter_lot(pd.DataFrame(lot))
+
+if __name__ == '__main__':
+    from Pipe_filter import Pipeline, FiltreValidation, FiltreNormalisation, FiltreTransformation
+
+    parser = argparse.ArgumentParser(description="Rejeu des enregistrements rejetés (lettres mortes)")
+    parser.add_argument('fichier', help="Fichier JSONL des lettres mortes à rejouer")
+    parser.add_argument('--sortie', required=True, help="Fichier CSV des enregistrements acceptés")
+    parser.add_argument('--rejets', help="Nouveau fichier de lettres mortes pour les rejets restants")
+    parser.add_argument('--taille-lot', type=int, default=50_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    lettres_mortes = EcrivainLettresMortes(args.rejets) if args.rejets else None
+    pipeline = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()],
+                        lettres_mortes=lettres_mortes)
+    nb_acceptes = nb_rejets = 0
+    with open(args.sortie, 'w', newline='', encoding='utf-8') as sortie:
+        for acceptes, rejet, _ in rejouer(args.fichier, pipeline, args.taille_lot):
+            if not acceptes.empty:
+                acceptes.to_csv(sortie, header=(nb_acceptes == 0), index=False)
+            nb_acceptes += len(acceptes)
+            nb_rejets += int(rejet.sum())
+    if lettres_mortes is not None:
+        lettres_mortes.fermer()
+    print(f"Acceptés : {nb_acceptes}, toujours rejetés : {nb_rejets}")
@@ -0,0 +1,242 @@
+import logging
+import multiprocessing
+import pickle
+import queue
+import threading
+from itertools import islice
+from Pipe_filter import Pipeline, _vers_dict, _instantane
+
+# Exécution du pipeline par étages (pipe-and-filter) : chaque étage applique ses
+# filtres dans ses propres travailleurs, threads (étages d'entrées/sorties) ou
+# processus (étages de calcul), et les étages sont reliés par des files bornées de
+# micro-lots. Lecture de l'entrée, validation, transformation, hachage et écriture
+# de la sortie se recouvrent ; un étage trop lent bloque l'amont (contre-pression).
+#
+#   pipeline = PipelineEtages([Etage([FiltreValidation(), FiltreNormalisation()], 'processus', 2),
+#                              Etage([FiltreTransformation(), FiltreSecurite()], 'processus')])
+#   for donnees in pipeline.traiter_flux(flux): ...
+#
+# Les threads d'un étage partagent ses filtres : plusieurs threads ne conviennent
+# qu'à des filtres sans état. Chaque processus reçoit sa propre copie des filtres
+# (comme PipelineParallele) ; les sorties annexes d'un filtre (sortie de
+# FiltreAgregation...) restent alors dans le processus. Avec un seul travailleur
+# par étage, l'ordre des enregistrements est conservé.
+#
+# Les rejets de tous les étages remontent par une file commune au processus
+# principal, qui les signale au puits d'anomalies et aux lettres mortes. En fin de
+# flux, le processus d'un étage à un seul travailleur y renvoie aussi l'état de ses
+# filtres (Filtre.etat) : l'appel suivant de traiter_flux repart de cet état, et
+# etat() le fournit pour un point de reprise. L'état des filtres d'un étage à
+# plusieurs processus, réparti entre ses copies, n'est pas conservé.
+
+journal = logging.getLogger(__name__)
+
+FIN = None
+MODES = ('thread', 'processus')
+
+class Etage:
+    """Étage du pipeline : filtres appliqués en séquence par `nb_travailleurs` travailleurs"""
+    def __init__(self, filtres, mode='thread', nb_travailleurs=1, nom=None):
+        if mode not in MODES:
+            raise ValueError(f"Mode d'exécution inconnu : {mode}")
+        self.filtres = list(filtres)
+        self.mode = mode
+        self.nb_travailleurs = nb_travailleurs
+        self.nom = nom or '+'.join(filtre.__class__.__name__ for filtre in self.filtres)
+
+    def __repr__(self):
+        return f"Etage({self.nom!r}, {self.mode!r}, {self.nb_travailleurs})"
+
+def _travailler(nom, filtres, processus, entree, sortie, rejets, vider=True, renvoyer_etat=False):
+    """Boucle d'un travailleur : micro-lots de `entree` vers `sortie`, rejets vers `rejets`"""
+    if processus:
+        # Copie propre au processus (filtres sérialisés par le processus principal)
+        filtres = pickle.loads(filtres)
+    # Puits déjà attribué aux filtres par PipelineEtages (copie propre au processus le cas échéant)
+    pipeline = Pipeline(filtres, puits=next((filtre.puits for filtre in filtres if filtre.puits is not None), None))
+    erreur = None
+    while True:
+        lot = entree.get()
+        if lot is FIN:
+            break
+        if erreur is not None:
+            # Après une erreur, la file est seulement vidée pour ne pas bloquer l'amont
+            continue
+        try:
+            acceptes = []
+            rejetes = []
+            for donnees in lot:
+                # Entrée conservée telle que reçue par l'étage, avant les filtres
+                recu = _instantane(donnees)
+                resultat, erreurs, anomalies = pipeline._appliquer_filtres(donnees)
+                if resultat is None:
+                    rejetes.append((_vers_dict(recu), erreurs, anomalies))
+                else:
+                    acceptes.append(resultat)
+            if acceptes:
+                sortie.put(acceptes)
+            if rejetes:
+                rejets.put((nom, rejetes, None, None))
+        except Exception as e:
+            journal.exception("Erreur dans l'étage %s", nom)
+            erreur = e
+            rejets.put((nom, [], repr(e), None))
+
+    if processus:
+        if erreur is None:
+            if vider:
+                _vider(filtres)
+            if renvoyer_etat:
+                rejets.put((nom, [], None, pipeline.etat()))
+        pipeline.puits.fermer()
+
+def _vider(filtres):
+    """Fin du flux pour les filtres qui accumulent (FiltreAgregation...)"""
+    for filtre in filtres:
+        if hasattr(filtre, 'vider'):
+            filtre.vider()
+
+class PipelineEtages:
+    """Pipeline dont chaque étage s'exécute dans ses propres threads ou processus
+
+    Les files entre étages contiennent au plus `taille_file` micro-lots de
+    `taille_lot` enregistrements. `puits` et `lettres_mortes` ont le même rôle
+    que pour Pipeline.
+    """
+    def __init__(self, etages, taille_lot=256, taille_file=16, puits=None, lettres_mortes=None):
+        self.etages = etages
+        self.taille_lot = taille_lot
+        self.taille_file = taille_file
+        # Attribution du puits aux filtres qui n'en ont pas, signalement des rejets
+        self.pipeline = Pipeline([filtre for etage in etages for filtre in etage.filtres],
+                                 puits=puits, lettres_mortes=lettres_mortes)
+        self.puits = self.pipeline.puits
+        self.lettres_mortes = lettres_mortes
+        self.nb_rejets = 0
+        self.rejets_par_etage = {}
+
+    def etat(self):
+        """États des filtres de tous les étages (None pour les étages à plusieurs processus)"""
+        return [None if etage.mode == 'processus' and etage.nb_travailleurs > 1 else filtre.etat()
+                for etage in self.etages for filtre in etage.filtres]
+
+    def restaurer(self, etats):
+        self.pipeline.restaurer(etats)
+
+    def _file(self, contexte, multiprocessus, taille=0):
+        return contexte.Queue(taille) if multiprocessus else queue.Queue(taille)
+
+    def traiter_flux(self, flux, vider=True):
+        """Traitement d'un flux ; génère les enregistrements acceptés au fil de l'eau
+
+        Avec `vider=False`, les filtres qui accumulent (FiltreAgregation...) ne sont
+        pas vidés en fin de flux : le flux se poursuit à l'appel suivant (morceaux
+        d'une ingestion avec points de reprise).
+        """
+        contexte = multiprocessing.get_context()
+        processus = [etage.mode == 'processus' for etage in self.etages]
+        # Une file touchant un étage exécuté en processus doit être une file multiprocessus
+        files = [self._file(contexte, processus[0], self.taille_file)]
+        for numero in range(len(self.etages)):
+            suivant = numero + 1 < len(self.etages) and processus[numero + 1]
+            files.append(self._file(contexte, processus[numero] or suivant, self.taille_file))
+        rejets = self._file(contexte, any(processus))
+
+        travailleurs = []
+        for numero, etage in enumerate(self.etages):
+            filtres = pickle.dumps(etage.filtres) if processus[numero] else etage.filtres
+            arguments = (etage.nom, filtres, processus[numero], files[numero], files[numero + 1], rejets,
+                         vider, processus[numero] and etage.nb_travailleurs == 1)
+            travailleurs.append([(contexte.Process if processus[numero] else threading.Thread)(
+                target=_travailler, args=arguments, name=f"{etage.nom}-{indice}", daemon=True)
+                for indice in range(etage.nb_travailleurs)])
+
+        self.nb_rejets = 0
+        self.rejets_par_etage = {etage.nom: 0 for etage in self.etages}
+        erreurs = []
+        # Processus démarrés avant les threads : un fork ne copie pas de verrou tenu par un thread
+        for travailleur in sorted((travailleur for etage in travailleurs for travailleur in etage),
+                                  key=lambda travailleur: isinstance(travailleur, threading.Thread)):
+            travailleur.start()
+        collecteur = threading.Thread(target=self._collecter_rejets, args=(rejets, erreurs), daemon=True)
+        alimentation = threading.Thread(target=self._alimenter, args=(flux, files[0]), daemon=True)
+        coordination = threading.Thread(target=self._coordonner, args=(travailleurs, files, vider), daemon=True)
+        collecteur.start()
+        alimentation.start()
+        coordination.start()
+
+        sortie = files[-1]
+        termine = False
+        try:
+            while True:
+                lot = sortie.get()
+                if lot is FIN:
+                    termine = True
+                    break
+                for donnees in lot:
+                    yield _vers_dict(donnees)
+        finally:
+            # Flux abandonné par l'appelant : la sortie est vidée pour que les étages se terminent
+            while not termine:
+                termine = sortie.get() is FIN
+            alimentation.join()
+            coordination.join()
+            rejets.put(FIN)
+            collecteur.join()
+
+        if self.nb_rejets:
+            journal.warning("Enregistrements rejetés : %d (%s)", self.nb_rejets, self.rejets_par_etage)
+        if erreurs:
+            raise RuntimeError(f"Échec de l'étage {erreurs[0][0]} : {erreurs[0][1]}")
+
+    def traiter_tout(self, flux):
+        """Traitement complet d'un flux, liste des enregistrements acceptés"""
+        return list(self.traiter_flux(flux))
+
+    def _coordonner(self, travailleurs, files, vider=True):
+        """Transmission de la fin du flux d'un étage au suivant, une fois tous ses travailleurs terminés
+
+        Un processus ne se termine qu'après avoir écrit tous ses micro-lots dans la
+        file : la fin du flux ne peut pas les précéder.
+        """
+        for numero, etage in enumerate(self.etages):
+            for travailleur in travailleurs[numero]:
+                travailleur.join()
+            if etage.mode == 'thread' and vider:
+                _vider(etage.filtres)
+            nb_suivants = self.etages[numero + 1].nb_travailleurs if numero + 1 < len(self.etages) else 1
+            for _ in range(nb_suivants):
+                files[numero + 1].put(FIN)
+
+    def _alimenter(self, flux, entree):
+        """Découpage du flux en micro-lots vers le premier étage, puis fin du flux"""
+        try:
+            iterateur = iter(flux)
+            while True:
+                lot = list(islice(iterateur, self.taille_lot))
+                if not lot:
+                    break
+                entree.put(lot)
+        finally:
+            for _ in range(self.etages[0].nb_travailleurs):
+                entree.put(FIN)
+
+    def _collecter_rejets(self, rejets, erreurs):
+        """Signalement des rejets de tous les étages, jusqu'à la fin du flux"""
+        while True:
+            message = rejets.get()
+            if message is FIN:
+                return
+            nom, rejetes, erreur, etats = message
+            if erreur is not None:
+                erreurs.append((nom, erreur))
+            if etats is not None:
+                # État final des filtres d'un processus, reporté sur les filtres du processus principal
+                etage = next(etage for etage in self.etages if etage.nom == nom)
+                for filtre, etat in zip(etage.filtres, etats):
+                    if etat is not None:
+                        filtre.restaurer(etat)
+            self.nb_rejets += len(rejetes)
+            self.rejets_par_etage[nom] += len(rejetes)
+            for entree, erreurs_entree, anomalies in rejetes:
+                self.pipeline._signaler_rejet(entree, erreurs_entree, anomalies)
@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import csv
+import io
+import logging
+from Pipe_filter import (Pipeline, FiltreLimiteDebit, FiltreValidation, FiltreNormalisation, FiltreTransformation,
+                         CHAMPS_MESURE, CHAMPS_DERIVES)
+from format_binaire import MAGIC, decoder_enregistrements
+from tramage import TAILLE_ENTETE, MESSAGE_PANNE, encoder_trame
+
+# Unité de réception : serveur asyncio recevant les relevés de nombreux compteurs.
+# Chaque trame est précédée de sa taille sur 4 octets (big-endian) et contient soit
+# un lot au format binaire (format_binaire), soit des lignes CSV sans en-tête dans
+# l'ordre des colonnes du jeu de données.
+#
+# Le pipeline s'exécute dans un thread, hors de la boucle d'événements : la
+# réception des trames se poursuit pendant le traitement d'un micro-lot (dans la
+# limite du verrou global de l'interpréteur).
+
+journal = logging.getLogger(__name__)
+
+TAILLE_TRAME_MAX = 16 * 1024 * 1024
+
+def decoder_trame(trame):
+    """Décodage d'une trame (lot binaire ou lignes CSV sans en-tête) en enregistrements
+
+    Retourne les enregistrements complets et le nombre de lignes CSV écartées
+    faute d'avoir exactement les champs du jeu de données.
+    """
+    if trame[:len(MAGIC)] == MAGIC:
+        return decoder_enregistrements(trame), 0
+    texte = trame.decode('utf-8')
+    lignes = [ligne for ligne in csv.reader(io.StringIO(texte)) if ligne]
+    enregistrements = [dict(zip(CHAMPS_MESURE, ligne)) for ligne in lignes if len(ligne) == len(CHAMPS_MESURE)]
+    return enregistrements, len(lignes) - len(enregistrements)
+
+class ServeurReception:
+    """Serveur de réception alimentant le pipeline depuis de nombreux compteurs
+
+    Les connexions déposent les enregistrements dans une file bornée : lorsque le
+    pipeline ne suit plus, la lecture des sockets est suspendue (contre-pression).
+    """
+    def __init__(self, pipeline, hote='0.0.0.0', port=5000, taille_file=10_000,
+                 taille_lot=256, taille_trame_max=TAILLE_TRAME_MAX, sortie=None, backlog=4096):
+        self.pipeline = pipeline
+        self.hote = hote
+        self.port = port
+        self.taille_file = taille_file
+        self.taille_lot = taille_lot
+        self.taille_trame_max = taille_trame_max
+        self.sortie = sortie
+        self.backlog = backlog
+        self.file = None
+        self.serveur = None
+        self._consommateur = None
+        self.nb_connexions = 0
+        self.nb_trames = 0
+        self.nb_enregistrements = 0
+        self.nb_rejets = 0
+
+    async def demarrer(self):
+        """Démarrage de l'écoute et de la tâche de traitement"""
+        self.file = asyncio.Queue(maxsize=self.taille_file)
+        self._consommateur = asyncio.create_task(self._traiter_file())
+        self.serveur = await asyncio.start_server(self._recevoir, self.hote, self.port,
+                                                   backlog=self.backlog)
+        # Port effectif (utile lorsque le port 0 est demandé)
+        self.port = self.serveur.sockets[0].getsockname()[1]
+        journal.info("Unité de réception en écoute sur %s:%d", self.hote, self.port)
+
+    async def servir(self):
+        """Démarrage puis service jusqu'à l'arrêt"""
+        await self.demarrer()
+        async with self.serveur:
+            await self.serveur.serve_forever()
+
+    async def vider(self):
+        """Attente du traitement de tous les enregistrements reçus"""
+        await self.file.join()
+
+    async def arreter(self):
+        """Arrêt de l'écoute puis de la tâche de traitement"""
+        self.serveur.close()
+        await self.serveur.wait_closed()
+        await self.vider()
+        self._consommateur.cancel()
+
+    async def _recevoir(self, lecteur, ecrivain):
+        pair = ecrivain.get_extra_info('peername')
+        self.nb_connexions += 1
+        try:
+            while True:
+                entete = await lecteur.readexactly(TAILLE_ENTETE)
+                taille = int.from_bytes(entete, byteorder='big')
+                if taille > self.taille_trame_max:
+                    journal.warning("Trame de %d octets refusée (%s)", taille, pair)
+                    break
+                trame = await lecteur.readexactly(taille)
+                self.nb_trames += 1
+
+                if trame == MESSAGE_PANNE:
+                    journal.warning("Panne signalée par le compteur %s", pair)
+                    continue
+
+                enregistrements, nb_incomplets = decoder_trame(trame)
+                if nb_incomplets:
+                    # Lignes écartées avant le pipeline : comptées comme rejets
+                    self.nb_enregistrements += nb_incomplets
+                    self.nb_rejets += nb_incomplets
+                    journal.warning("%d ligne(s) incomplète(s) reçue(s) de %s", nb_incomplets, pair)
+                for donnees in enregistrements:
+                    # Suspendu tant que la file est pleine
+                    await self.file.put(donnees)
+        except asyncio.IncompleteReadError:
+            # Fermeture de la connexion par le compteur
+            pass
+        except (UnicodeDecodeError, csv.Error, ValueError, IndexError, KeyError) as e:
+            # IndexError, KeyError : dictionnaire d'un lot binaire incohérent
+            journal.warning("Trame illisible reçue de %s : %r", pair, e)
+        except ConnectionError as e:
+            journal.warning("Connexion interrompue avec %s : %s", pair, e)
+        finally:
+            ecrivain.close()
+
+    def _traiter_lot(self, lot):
+        """Traitement d'un micro-lot, dans un thread hors de la boucle d'événements
+
+        Retourne le nombre de rejets ; les compteurs ne sont mis à jour que par la boucle.
+        """
+        nb_rejets = 0
+        for donnees in lot:
+            try:
+                resultat = self.pipeline.traiter(donnees)
+                if resultat is not None and self.sortie is not None:
+                    self.sortie(resultat)
+            except Exception:
+                # Un enregistrement qui fait échouer un filtre est rejeté, le service continue
+                journal.exception("Échec du traitement d'un enregistrement")
+                resultat = None
+            if resultat is None:
+                nb_rejets += 1
+        return nb_rejets
+
+    async def _traiter_file(self):
+        boucle = asyncio.get_running_loop()
+        while True:
+            lot = [await self.file.get()]
+            while len(lot) < self.taille_lot and not self.file.empty():
+                lot.append(self.file.get_nowait())
+            try:
+                self.nb_rejets += await boucle.run_in_executor(None, self._traiter_lot, lot)
+                self.nb_enregistrements += len(lot)
+            finally:
+                for _ in lot:
+                    self.file.task_done()
+
+async def simuler_compteurs(hote, port, lignes, nb_compteurs=100, nb_trames=10, lignes_par_trame=4):
+    """Simulation de compteurs envoyant simultanément leurs relevés au serveur"""
+    async def compteur(numero):
+        _, ecrivain = await asyncio.open_connection(hote, port)
+        for i in range(nb_trames):
+            debut = (numero * nb_trames + i) * lignes_par_trame
+            contenu = "".join(lignes[(debut + k) % len(lignes)] for k in range(lignes_par_trame))
+            ecrivain.write(encoder_trame(contenu.encode('utf-8')))
+            await ecrivain.drain()
+        ecrivain.close()
+        await ecrivain.wait_closed()
+
+    await asyncio.gather(*(compteur(numero) for numero in range(nb_compteurs)))
+
+async def tester_boucle_locale(fichier, nb_compteurs=200, nb_trames=10, lignes_par_trame=4):
+    """Banc d'essai local : serveur sur 127.0.0.1 et compteurs simulés"""
+    with open(fichier, encoding='utf-8') as f:
+        lignes = f.readlines()[1:]
+
+    pipeline = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()])
+    serveur = ServeurReception(pipeline, hote='127.0.0.1', port=0)
+    await serveur.demarrer()
+
+    boucle = asyncio.get_running_loop()
+    debut = boucle.time()
+    await simuler_compteurs('127.0.0.1', serveur.port, lignes, nb_compteurs, nb_trames, lignes_par_trame)
+    await serveur.arreter()
+    duree = boucle.time() - debut
+
+    attendu = nb_compteurs * nb_trames * lignes_par_trame
+    print(f"Connexions : {serveur.nb_connexions}, trames : {serveur.nb_trames}, "
+          f"enregistrements : {serveur.nb_enregistrements}/{attendu}, rejets : {serveur.nb_rejets}")
+    print(f"Débit : {serveur.nb_enregistrements / duree:.0f} enr/s")
+    assert serveur.nb_enregistrements == attendu
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Unité de réception des relevés de compteurs")
+    parser.add_argument('--hote', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--taille-file', type=int, default=10_000)
+    parser.add_argument('--sortie', help="Fichier CSV des enregistrements traités")
+    parser.add_argument('--sortie-colonnaire', help="Répertoire de sortie colonnaire partitionnée (wilaya, jour)")
+    parser.add_argument('--test-local', action='store_true', help="Banc d'essai sur la boucle locale")
+    parser.add_argument('--fichier', default='dataset_consommation_energie_algerie.csv')
+    parser.add_argument('--compteurs', type=int, default=200)
+    parser.add_argument('--debit-compteur', type=float, default=1.0,
+                        help="Relevés par seconde admis par compteur (au-delà, rejetés comme attaque DoS)")
+    parser.add_argument('--rafale', type=int, default=10, help="Relevés admis d'un coup par compteur")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.test_local:
+        asyncio.run(tester_boucle_locale(args.fichier, nb_compteurs=args.compteurs))
+    else:
+        sortie = fichier_sortie = ecrivain_colonnaire = None
+        if args.sortie:
+            fichier_sortie = open(args.sortie, 'w', newline='', encoding='utf-8')
+            ecrivain_csv = csv.DictWriter(fichier_sortie, fieldnames=CHAMPS_MESURE + CHAMPS_DERIVES)
+            ecrivain_csv.writeheader()
+            sortie = ecrivain_csv.writerow
+        elif args.sortie_colonnaire:
+            from sortie_colonnaire import EcrivainColonnaire
+            ecrivain_colonnaire = EcrivainColonnaire(args.sortie_colonnaire)
+            sortie = ecrivain_colonnaire.ajouter
+
+        # La limitation de débit par compteur précède les filtres coûteux
+        pipeline = Pipeline([FiltreLimiteDebit(args.debit_compteur, args.rafale),
+                             FiltreValidation(), FiltreNormalisation(), FiltreTransformation()])
+        try:
+            asyncio.run(ServeurReception(pipeline, args.hote, args.port, args.taille_file, sortie=sortie).servir())
+        finally:
+            # Arrêt du service (Ctrl+C...) : les enregistrements déjà écrits sont conservés
+            if fichier_sortie is not None:
+                fichier_sortie.close()
+            if ecrivain_colonnaire is not None:
+                ecrivain_colonnaire.fermer()
@@ -0,0 +1,159 @@
+import os
+import uuid
+from urllib.parse import quote, unquote
+from Pipe_filter import _consommation_kwh
+
+# Sortie colonnaire typée des enregistrements traités, partitionnée par wilaya et
+# par jour (répertoires wilaya=.../date=.../, à la manière de Hive). Chaque lot
+# écrit ajoute un fichier par partition : Parquet ou Feather si pyarrow est
+# installé, sinon un répertoire contenant un fichier .npy par colonne (les colonnes
+# textuelles y sont codées par dictionnaire : codes entiers dans <champ>.npy et
+# valeurs distinctes dans <champ>.valeurs.npy).
+# Les champs numériques restent numériques : la consommation (et la consommation
+# sur 8 h) est en kWh, l'horodatage en datetime64, la puissance souscrite en kW.
+
+CHAMPS_PARTITION = ['wilaya', 'date']
+CHAMPS_KWH = ['consommation', 'consommation_8h']
+FORMATS = ['parquet', 'feather', 'npy']
+
+def _pyarrow_disponible():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def typer_lot(lot):
+    """Conversion des colonnes d'un lot de sortie du pipeline en types numériques"""
+    import pandas as pd
+    from pandas.api.types import is_numeric_dtype
+    colonnes = {}
+    for champ in CHAMPS_KWH:
+        if champ in lot and not is_numeric_dtype(lot[champ]):
+            # '45.31300 kWh' -> 45.313, '5000 Wh' -> 5.0 (sortie non normalisée)
+            colonnes[champ] = _consommation_kwh(lot[champ])
+    if 'puissance_souscrite' in lot and not is_numeric_dtype(lot['puissance_souscrite']):
+        colonnes['puissance_souscrite'] = pd.to_numeric(lot['puissance_souscrite'].astype(str).str.partition(' ')[0],
+                                                        errors='coerce')
+    for champ in ('tarif', 'ratio_consommation'):
+        if champ in lot:
+            colonnes[champ] = pd.to_numeric(lot[champ], errors='coerce')
+    if 'timestamp' in lot:
+        colonnes['timestamp'] = pd.to_datetime(lot['timestamp'], format='ISO8601').astype('datetime64[s]')
+    return lot.assign(**colonnes)
+
+class EcrivainColonnaire:
+    """Écriture incrémentale, lot par lot, d'une sortie colonnaire partitionnée
+
+    Les enregistrements isolés (ajouter) sont regroupés par lots de `taille_lot`
+    avant écriture ; `fermer` écrit le dernier lot incomplet.
+    """
+    def __init__(self, repertoire, format=None, taille_lot=50_000):
+        if format is None:
+            format = 'parquet' if _pyarrow_disponible() else 'npy'
+        if format not in FORMATS:
+            raise ValueError(f"Format de sortie inconnu : {format}")
+        if format != 'npy' and not _pyarrow_disponible():
+            raise ImportError(f"Le format {format} nécessite pyarrow")
+        self.repertoire = repertoire
+        self.format = format
+        self.taille_lot = taille_lot
+        self.nb_enregistrements = 0
+        self.nb_fichiers = 0
+        # Préfixe propre à cet écrivain : les écritures successives ne se remplacent pas
+        self._prefixe = uuid.uuid4().hex[:12]
+        self._tampon = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def ajouter(self, enregistrement):
+        """Ajout d'un enregistrement (dictionnaire) au lot en cours"""
+        self._tampon.append(enregistrement)
+        if len(self._tampon) >= self.taille_lot:
+            self.vider()
+
+    def vider(self):
+        if self._tampon:
+            import pandas as pd
+            lot, self._tampon = pd.DataFrame(self._tampon), []
+            self.ecrire_lot(lot)
+
+    def fermer(self):
+        self.vider()
+
+    def ecrire_lot(self, lot):
+        """Écriture d'un lot (DataFrame) : un fichier par couple (wilaya, jour)"""
+        if lot.empty:
+            return
+        lot = typer_lot(lot)
+        lot = lot.assign(date=lot['timestamp'].dt.strftime('%Y-%m-%d'))
+        for (wilaya, date), partition in lot.groupby(CHAMPS_PARTITION, sort=False):
+            repertoire = os.path.join(self.repertoire, f"wilaya={quote(str(wilaya), safe='')}", f"date={date}")
+            os.makedirs(repertoire, exist_ok=True)
+            nom = os.path.join(repertoire, f"part-{self._prefixe}-{self.nb_fichiers:06d}")
+            self._ecrire_partition(partition.drop(columns=CHAMPS_PARTITION).reset_index(drop=True), nom)
+            self.nb_fichiers += 1
+        self.nb_enregistrements += len(lot)
+
+    def _ecrire_partition(self, partition, nom):
+        if self.format == 'parquet':
+            partition.to_parquet(f"{nom}.parquet", index=False)
+        elif self.format == 'feather':
+            partition.to_feather(f"{nom}.feather")
+        else:
+            import numpy as np
+            import pandas as pd
+            # Écriture dans un répertoire temporaire renommé à la fin : une partie
+            # incomplète n'est jamais lue
+            temporaire = f"{nom}.tmp"
+            os.makedirs(temporaire)
+            for champ in partition.columns:
+                valeurs = partition[champ].to_numpy()
+                if valeurs.dtype == object:
+                    codes, distinctes = pd.factorize(partition[champ], use_na_sentinel=False)
+                    np.save(os.path.join(temporaire, f"{champ}.valeurs.npy"), np.asarray(distinctes, dtype=str),
+                            allow_pickle=False)
+                    valeurs = codes.astype(np.int32)
+                np.save(os.path.join(temporaire, f"{champ}.npy"), valeurs, allow_pickle=False)
+            os.replace(temporaire, nom)
+
+def lire_colonnaire(repertoire):
+    """Lecture d'une sortie colonnaire partitionnée en un seul DataFrame"""
+    import numpy as np
+    import pandas as pd
+    parties = []
+    for racine, _, fichiers in os.walk(repertoire):
+        for nom in fichiers:
+            chemin = os.path.join(racine, nom)
+            if nom.endswith('.parquet'):
+                partie = pd.read_parquet(chemin)
+            elif nom.endswith('.feather'):
+                partie = pd.read_feather(chemin)
+            else:
+                continue
+            parties.append(_avec_partition(partie, racine, repertoire))
+        if os.path.basename(racine).startswith('part-') and not racine.endswith('.tmp'):
+            colonnes = {}
+            for nom in sorted(fichiers):
+                if nom.endswith('.npy') and not nom.endswith('.valeurs.npy'):
+                    champ = nom[:-len('.npy')]
+                    colonnes[champ] = np.load(os.path.join(racine, nom), allow_pickle=False)
+                    if f"{champ}.valeurs.npy" in fichiers:
+                        distinctes = np.load(os.path.join(racine, f"{champ}.valeurs.npy"), allow_pickle=False)
+                        colonnes[champ] = distinctes.astype(object)[colonnes[champ]]
+            parties.append(_avec_partition(pd.DataFrame(colonnes), os.path.dirname(racine), repertoire))
+    if not parties:
+        return pd.DataFrame()
+    return pd.concat(parties, ignore_index=True)
+
+def _avec_partition(partie, chemin, repertoire):
+    """Ajout des colonnes de partition déduites du chemin (wilaya=.../date=...)"""
+    for composant in os.path.relpath(chemin, repertoire).split(os.sep):
+        champ, _, valeur = composant.partition('=')
+        if champ in CHAMPS_PARTITION:
+            partie[champ] = unquote(valeur)
+    return partie
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation du pipeline : nombre d'appels et latences par filtre, enregistrements
+# acceptés / rejetés et anomalies par type. Les latences sont rangées dans un
+# histogramme à classes de puissances de 2 (en nanosecondes), suffisant pour des
+# percentiles approchés à un facteur 2 près.
+
+class HistogrammeLatence:
+    """Histogramme de latences à classes logarithmiques (puissances de 2 en ns)"""
+    __slots__ = ('classes', 'nb', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.classes = [0] * 64
+        self.nb = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def ajouter(self, duree_ns, nb=1):
+        """Ajout de `nb` appels d'une durée totale de duree_ns (chacun compté à la durée moyenne)"""
+        duree_appel = duree_ns // nb
+        self.classes[duree_appel.bit_length()] += nb
+        self.nb += nb
+        self.total_ns += duree_ns
+        if duree_appel > self.max_ns:
+            self.max_ns = duree_appel
+
+    def percentile(self, p):
+        """Borne supérieure (en secondes) de la classe contenant le p-ième percentile"""
+        if not self.nb:
+            return 0.0
+        seuil = p / 100 * self.nb
+        cumul = 0
+        for classe, nb in enumerate(self.classes):
+            cumul += nb
+            if cumul >= seuil:
+                return min(1 << classe, self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    def instantane(self):
+        return {
+            'appels': self.nb,
+            'total_s': self.total_ns / 1e9,
+            'moyenne_s': self.total_ns / self.nb / 1e9 if self.nb else 0.0,
+            'p50_s': self.percentile(50),
+            'p90_s': self.percentile(90),
+            'p99_s': self.percentile(99),
+            'max_s': self.max_ns / 1e9,
+        }
+
+class StatistiquesPipeline:
+    """Statistiques collectées par un Pipeline construit avec statistiques=...
+
+    Sans objet de statistiques, le pipeline n'effectue aucune mesure. Un appel de
+    filtre est compté par enregistrement, y compris en traitement par lots (durée
+    du lot répartie sur ses enregistrements). Les enregistrements et les lectures
+    (export HTTP) sont protégés par un même verrou.
+    """
+    def __init__(self):
+        self.filtres = {}
+        self.nb_acceptes = 0
+        self.nb_rejets = 0
+        self.rejets_par_filtre = Counter()
+        self.anomalies = Counter()
+        self._verrou = threading.Lock()
+
+    def enregistrer_filtre(self, nom, duree_ns, nb=1):
+        """Durée de `nb` appels du filtre (un lot de `nb` enregistrements)"""
+        with self._verrou:
+            histogramme = self.filtres.get(nom)
+            if histogramme is None:
+                histogramme = self.filtres[nom] = HistogrammeLatence()
+            histogramme.ajouter(duree_ns, nb)
+
+    def enregistrer_anomalies(self, anomalies):
+        with self._verrou:
+            self.anomalies.update(anomalies)
+
+    def enregistrer_resultat(self, nom_filtre_rejet=None, nb=1):
+        """Comptage d'enregistrements acceptés, ou rejetés par le filtre indiqué"""
+        with self._verrou:
+            if nom_filtre_rejet is None:
+                self.nb_acceptes += nb
+            else:
+                self.nb_rejets += nb
+                self.rejets_par_filtre[nom_filtre_rejet] += nb
+
+    def instantane(self):
+        """Photographie des statistiques sous forme de dictionnaire"""
+        with self._verrou:
+            total = self.nb_acceptes + self.nb_rejets
+            return {
+                'acceptes': self.nb_acceptes,
+                'rejetes': self.nb_rejets,
+                'taux_rejet': self.nb_rejets / total if total else 0.0,
+                'rejets_par_filtre': dict(self.rejets_par_filtre),
+                'anomalies': dict(self.anomalies),
+                'filtres': {nom: histogramme.instantane() for nom, histogramme in self.filtres.items()},
+            }
+
+    def vers_json(self):
+        return json.dumps(self.instantane(), ensure_ascii=False, indent=2)
+
+    def vers_prometheus(self):
+        """Export au format texte de Prometheus"""
+        instantane = self.instantane()
+        lignes = [
+            '# TYPE pipeline_enregistrements_total counter',
+            f'pipeline_enregistrements_total{{resultat="accepte"}} {instantane["acceptes"]}',
+            f'pipeline_enregistrements_total{{resultat="rejete"}} {instantane["rejetes"]}',
+            '# TYPE pipeline_rejets_total counter',
+        ]
+        for nom, nb in instantane['rejets_par_filtre'].items():
+            lignes.append(f'pipeline_rejets_total{{filtre="{nom}"}} {nb}')
+        lignes.append('# TYPE pipeline_anomalies_total counter')
+        for anomalie, nb in instantane['anomalies'].items():
+            etiquette = anomalie.replace('\\', '\\\\').replace('"', '\\"')
+            lignes.append(f'pipeline_anomalies_total{{type="{etiquette}"}} {nb}')
+        lignes.append('# TYPE pipeline_filtre_duree_secondes summary')
+        for nom, filtre in instantane['filtres'].items():
+            for quantile in ('50', '90', '99'):
+                lignes.append(f'pipeline_filtre_duree_secondes{{filtre="{nom}",quantile="0.{quantile}"}} '
+                              f'{filtre[f"p{quantile}_s"]}')
+            lignes.append(f'pipeline_filtre_duree_secondes_sum{{filtre="{nom}"}} {filtre["total_s"]}')
+            lignes.append(f'pipeline_filtre_duree_secondes_count{{filtre="{nom}"}} {filtre["appels"]}')
+        return '\n'.join(lignes) + '\n'
+
+    def ecrire(self, chemin, format='json'):
+        """Écriture atomique d'un instantané (JSON ou texte Prometheus) dans un fichier"""
+        contenu = self.vers_prometheus() if format == 'prometheus' else self.vers_json()
+        temporaire = f"{chemin}.tmp"
+        with open(temporaire, 'w', encoding='utf-8') as fichier:
+            fichier.write(contenu)
+        os.replace(temporaire, chemin)
+
+    def servir(self, hote='127.0.0.1', port=9100):
+        """Exposition des statistiques sur HTTP (/metrics au format Prometheus, / en JSON)
+
+        Le serveur tourne dans un fil d'exécution démon ; il est retourné pour pouvoir l'arrêter.
+        """
+        statistiques = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    contenu, type_contenu = statistiques.vers_prometheus(), 'text/plain; version=0.0.4'
+                else:
+                    contenu, type_contenu = statistiques.vers_json(), 'application/json'
+                octets = contenu.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', type_contenu)
+                self.send_header('Content-Length', str(len(octets)))
+                self.end_headers()
+                self.wfile.write(octets)
+
+            def log_message(self, *args):
+                pass
+
+        serveur = ThreadingHTTPServer((hote, port), Gestionnaire)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        return serveur
@@ -0,0 +1,87 @@
+import heapq
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# Traitement en temps de l'événement : c'est l'horodatage du relevé, et non l'heure
+# de réception, qui fait foi.
+#   - reordonner remet dans l'ordre les relevés légèrement en retard d'un flux, avec
+#     un tampon (tas) de taille bornée :
+#         pipeline.traiter_flux(reordonner(flux, retard_max=30))
+#   - FiligranesSources suit, pour chaque source, l'horodatage le plus récent vu ;
+#     FiltreSecurite s'en sert pour repérer les relevés arrivés en retard.
+# Les horodatages sont comparés en UTC : ceux sans fuseau sont considérés comme
+# étant en UTC (comme dans agregation), les autres y sont convertis.
+
+def en_utc(instant):
+    """Horodatage sans fuseau, en UTC"""
+    if instant.tzinfo is not None:
+        instant = instant.astimezone(timezone.utc).replace(tzinfo=None)
+    return instant
+
+def horodatage(donnees):
+    """Horodatage d'un relevé (MesureCompteur ou dictionnaire brut), en UTC"""
+    instant = getattr(donnees, 'horodatage', None)
+    if instant is None:
+        instant = datetime.fromisoformat(str(donnees['timestamp']))
+    return en_utc(instant)
+
+def reordonner(flux, retard_max=10.0, taille_max=10_000, cle=horodatage):
+    """Flux remis dans l'ordre des horodatages, à `retard_max` secondes près
+
+    Un relevé est émis dès que l'horodatage le plus récent vu le dépasse de plus de
+    `retard_max` secondes. Le tampon ne dépasse jamais `taille_max` relevés : s'il est
+    plein, le plus ancien est émis sans attendre. Les relevés plus anciens que le
+    dernier émis sont émis tels quels (les filtres décident de leur sort), de même
+    que les relevés dont l'horodatage est absent ou illisible, sans passer par le
+    tampon : FiltreValidation les rejettera.
+    """
+    tas = []
+    numero = 0
+    plus_recent = None
+    for donnees in flux:
+        try:
+            instant = cle(donnees)
+            if plus_recent is None or instant > plus_recent:
+                plus_recent = instant
+        except (KeyError, ValueError, TypeError):
+            # Horodatage illisible, ou non comparable avec une clé qui ne le ramène pas en UTC
+            yield donnees
+            continue
+        # Le numéro d'arrivée départage les horodatages égaux (ordre stable)
+        heapq.heappush(tas, (instant, numero, donnees))
+        numero += 1
+        while tas and ((plus_recent - tas[0][0]).total_seconds() > retard_max or len(tas) > taille_max):
+            yield heapq.heappop(tas)[2]
+    while tas:
+        yield heapq.heappop(tas)[2]
+
+class FiligranesSources:
+    """Filigrane (horodatage le plus récent vu) de chaque source
+
+    Seules les `nb_sources_max` sources les plus récemment actives sont conservées
+    (éviction LRU), la mémoire reste bornée quel que soit le nombre de sources.
+    """
+    def __init__(self, nb_sources_max=100_000):
+        self.nb_sources_max = nb_sources_max
+        self.filigranes = OrderedDict()
+
+    def observer(self, source, instant):
+        """Mise à jour du filigrane de la source ; retourne le retard (en secondes) du relevé"""
+        instant = en_utc(instant)
+        filigrane = self.filigranes.get(source)
+        if filigrane is None:
+            if len(self.filigranes) >= self.nb_sources_max:
+                self.filigranes.popitem(last=False)
+            self.filigranes[source] = instant
+            return 0.0
+        self.filigranes.move_to_end(source)
+        if instant >= filigrane:
+            self.filigranes[source] = instant
+            return 0.0
+        return (filigrane - instant).total_seconds()
+
+    def etat(self):
+        return [[source, instant.isoformat()] for source, instant in self.filigranes.items()]
+
+    def restaurer(self, etat):
+        self.filigranes = OrderedDict((source, en_utc(datetime.fromisoformat(instant))) for source, instant in etat)
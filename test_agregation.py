@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+from Pipe_filter import CHAMPS_MESURE
+from agregation import FiltreAgregation
+
+RELEVE = {
+    'compteur_id': '123456', 'timestamp': '2024-05-26T14:00:00', 'consommation': '5000 Wh',
+    'type_client': 'Residentiel', 'wilaya': 'Alger', 'ville': 'Alger', 'localisation': '36.7538,3.0588',
+    'region': 'Centre', 'code_postal': '16000', 'fournisseur': 'Sonelgaz', 'tarif': '4.5',
+    'puissance_souscrite': '10 kW', 'type_compteur': 'Electronique',
+}
+
+# Horodatages avec et sans fuseau : 13:30+01:00 et 12:45Z tombent dans la fenêtre de 12 h UTC
+HORODATAGES = ['2024-05-26T12:10:00', '2024-05-26T13:30:00+01:00', '2024-05-26T12:45:00Z',
+               '2024-05-26T14:20:00+02:00', '2024-05-26T13:05:00', '2024-05-26T16:00:00+03:00']
+
+def _fenetres(traiter):
+    filtre = FiltreAgregation(taille=3600)
+    traiter(filtre)
+    filtre.vider()
+    return sorted(filtre.extraire(), key=lambda fenetre: (fenetre['debut'], fenetre['niveau'], fenetre['cle']))
+
+def test_fuseaux_memes_fenetres():
+    lignes = [{**RELEVE, 'timestamp': horodatage, 'consommation': f'{1000 * (numero + 1)} Wh'}
+              for numero, horodatage in enumerate(HORODATAGES)]
+    par_enregistrement = _fenetres(lambda filtre: [filtre.traiter(dict(ligne)) for ligne in lignes])
+    par_lot = _fenetres(lambda filtre: filtre.traiter_lot(pd.DataFrame(lignes, columns=CHAMPS_MESURE, dtype=object)))
+
+    assert par_lot == par_enregistrement
+    compteur = [(fenetre['debut'], fenetre['nb_releves'], fenetre['consommation_kwh'])
+                for fenetre in par_lot if fenetre['niveau'] == 'compteur_id']
+    assert compteur == [('2024-05-26T12:00:00', 4, pytest.approx(10.0)), ('2024-05-26T13:00:00', 2, pytest.approx(11.0))]
+
+def test_horodatage_illisible_ignore():
+    lignes = [RELEVE, {**RELEVE, 'timestamp': 'inconnu'}, {**RELEVE, 'timestamp': None}]
+    fenetres = _fenetres(lambda filtre: filtre.traiter_lot(pd.DataFrame(lignes, columns=CHAMPS_MESURE, dtype=object)))
+    assert [(fenetre['debut'], fenetre['nb_releves']) for fenetre in fenetres] == [('2024-05-26T14:00:00', 1)] * 3
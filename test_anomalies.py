@@ -0,0 +1,44 @@
+import json
+import logging
+import threading
+from anomalies import PuitsAnomalies
+
+def test_signalements_concurrents(caplog):
+    # Puits partagé par plusieurs fils (étages de PipelineEtages) : aucun signalement perdu
+    puits = PuitsAnomalies(capacite=100)
+
+    def signaler():
+        for numero in range(10_000):
+            puits.signaler(f"anomalie {numero % 3}", numero)
+
+    with caplog.at_level(logging.ERROR, logger='anomalies'):
+        fils = [threading.Thread(target=signaler) for _ in range(4)]
+        for fil in fils:
+            fil.start()
+        for fil in fils:
+            fil.join()
+    instantane = puits.instantane()
+    assert instantane['total'] == 40_000
+    assert sorted(instantane['anomalies'].values()) == [13_332, 13_332, 13_336]
+    assert len(puits.recentes) == 100
+
+def test_avertissements_regroupes(caplog):
+    instant = [0.0]
+    puits = PuitsAnomalies(intervalle_avertissement=10.0, horloge=lambda: instant[0])
+    with caplog.at_level(logging.WARNING, logger='anomalies'):
+        for _ in range(5):
+            puits.signaler("Tarif invalide", '123456')
+        instant[0] = 11.0
+        puits.signaler("Tarif invalide", '123456')
+    messages = [enregistrement.getMessage() for enregistrement in caplog.records]
+    assert len(messages) == 2
+    assert "4 occurrence(s) non affichée(s)" in messages[1]
+
+def test_ecriture_fichier(tmp_path, caplog):
+    chemin = tmp_path / 'anomalies.jsonl'
+    with caplog.at_level(logging.ERROR, logger='anomalies'), PuitsAnomalies(chemin, taille_lot=2) as puits:
+        for numero in range(5):
+            puits.signaler("Ville invalide", numero, {'ville': 'Alger²'})
+    lignes = [json.loads(ligne) for ligne in chemin.read_text(encoding='utf-8').splitlines()]
+    assert [ligne['source'] for ligne in lignes] == list(range(5))
+    assert lignes[0]['details'] == {'ville': 'Alger²'}
@@ -0,0 +1,34 @@
+import math
+import pandas as pd
+import pytest
+from detection_anomalies import FiltreDetectionAnomalies
+
+def _normales(nombre, niveau=5.0):
+    # Consommations régulières autour de `niveau` (écart-type d'environ 0.1 kWh)
+    return [niveau + 0.1 * math.sin(numero) for numero in range(nombre)]
+
+@pytest.mark.parametrize('alpha', [None, 0.1])
+def test_changement_de_niveau_absorbe(alpha):
+    filtre = FiltreDetectionAnomalies(nb_min=30, alpha=alpha)
+    for valeur in _normales(200):
+        assert filtre.examiner('123456', 'Residentiel', valeur) is None
+    signales = [filtre.examiner('123456', 'Residentiel', valeur) is not None for valeur in _normales(300, 8.0)]
+    assert signales[0]
+    # Le nouveau niveau finit par devenir la référence
+    assert not any(signales[-50:])
+
+def test_pic_isole_sur_compteur_constant():
+    filtre = FiltreDetectionAnomalies(nb_min=30)
+    for _ in range(100):
+        assert filtre.examiner('123456', 'Residentiel', 5.0) is None
+    assert filtre.examiner('123456', 'Residentiel', 50.0) is not None
+    assert filtre.examiner('123456', 'Residentiel', 5.0) is None
+
+def test_consommation_manquante_ignoree():
+    filtre = FiltreDetectionAnomalies(nb_min=3)
+    lot = pd.DataFrame({'compteur_id': ['123456'] * 6, 'type_client': ['Residentiel'] * 6,
+                        'consommation': ['5 kWh', 'nan kWh', '5.1 kWh', None, '4.9 kWh', '5 kWh']})
+    filtre.traiter_lot(lot)
+    nombre, moyenne, _ = filtre.compteurs['123456']
+    assert (nombre, moyenne) == (4, pytest.approx(5.0))
+    assert filtre.nb_anomalies == 0
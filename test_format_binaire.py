@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+from Pipe_filter import FiltreValidation, CHAMPS_MESURE
+from format_binaire import encoder_lot, encoder_enregistrements, decoder_enregistrements, vers_dataframe
+
+RELEVE = {
+    'compteur_id': '012345', 'timestamp': '2024-05-26T14:00:00', 'consommation': '5000 Wh',
+    'type_client': 'Residentiel', 'wilaya': 'Adrar', 'ville': 'Adrar', 'localisation': '27.8743,-0.2939',
+    'region': 'Sud', 'code_postal': '01000', 'fournisseur': 'Sonelgaz', 'tarif': '4.5',
+    'puissance_souscrite': '10 kW', 'type_compteur': 'Electronique',
+}
+
+def test_aller_retour_zeros_de_tete():
+    decode, = decoder_enregistrements(encoder_enregistrements([RELEVE]))
+    assert decode['compteur_id'] == '012345'
+    assert decode['code_postal'] == '01000'
+    assert decode['consommation'] == '5.0 kWh'
+    assert decode['tarif'] == 4.5
+    # Accepté comme le même relevé reçu en CSV
+    assert FiltreValidation().valider(decode) == FiltreValidation().valider(RELEVE) == ([], [])
+
+def test_aller_retour_lot():
+    lot = pd.DataFrame([RELEVE, {**RELEVE, 'compteur_id': 987654, 'code_postal': 16000,
+                                 'consommation': '12.5 kWh', 'ville': 'Alger'}])
+    decode = vers_dataframe(encoder_lot(lot))
+    assert list(decode.columns) == CHAMPS_MESURE
+    assert decode['compteur_id'].tolist() == ['012345', '987654']
+    assert decode['code_postal'].tolist() == ['01000', '16000']
+    assert decode['ville'].tolist() == ['Adrar', 'Alger']
+    assert decode['consommation'].tolist() == ['5.0 kWh', '12.5 kWh']
+
+def test_lot_vide():
+    assert decoder_enregistrements(encoder_lot(pd.DataFrame(columns=CHAMPS_MESURE))) == []
+
+@pytest.mark.parametrize('modification', [{'compteur_id': '1234567'}, {'code_postal': '160000'},
+                                          {'compteur_id': '١٢٣٤٥٦'}, {'consommation': '5 MWh'}])
+def test_valeurs_non_encodables(modification):
+    with pytest.raises(ValueError):
+        encoder_enregistrements([{**RELEVE, **modification}])
@@ -0,0 +1,90 @@
+import json
+import logging
+import pandas as pd
+import pytest
+from Pipe_filter import Pipeline, FiltreValidation, FiltreNormalisation, FiltreTransformation, CHAMPS_MESURE
+from lettres_mortes import EcrivainLettresMortes
+from ingestion_incrementale import traiter_csv_incremental
+from unite_reception_threads import traiter_avec_reprise
+
+RELEVE = {
+    'compteur_id': '123456', 'timestamp': '2024-05-26T14:00:00', 'consommation': '5000 Wh',
+    'type_client': 'Residentiel', 'wilaya': 'Alger', 'ville': 'Alger', 'localisation': '36.7538,3.0588',
+    'region': 'Centre', 'code_postal': '16000', 'fournisseur': 'Sonelgaz', 'tarif': '4.5',
+    'puissance_souscrite': '10 kW', 'type_compteur': 'Electronique',
+}
+
+@pytest.fixture(autouse=True)
+def _journal_silencieux(caplog):
+    # Rejets et retraitements sont journalisés en avertissement : attendus ici
+    caplog.set_level(logging.ERROR)
+
+def _ecrire_entree(chemin, debut, nombre):
+    # Un relevé sur sept a un tarif invalide et part en lettres mortes
+    lignes = [{**RELEVE, 'compteur_id': str(100_000 + numero), 'tarif': 'x' if numero % 7 == 0 else '4.5'}
+              for numero in range(debut, debut + nombre)]
+    pd.DataFrame(lignes, columns=CHAMPS_MESURE).to_csv(chemin, index=False)
+
+def _pipeline(lettres_mortes):
+    return Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()], lettres_mortes=lettres_mortes)
+
+def _rejets(chemin):
+    return [str(json.loads(ligne)['donnees']['compteur_id']) for ligne in chemin.read_text(encoding='utf-8').splitlines()]
+
+class PipelineInterrompu(Pipeline):
+    """Pipeline qui s'arrête brutalement après `restant` enregistrements acceptés"""
+    restant = 25
+
+    def traiter_flux(self, flux, vider=True):
+        for donnees in super().traiter_flux(flux, vider):
+            if self.restant == 0:
+                raise KeyboardInterrupt
+            self.restant -= 1
+            yield donnees
+
+def test_reprise_apres_arret_brutal(tmp_path):
+    entree = tmp_path / 'releves.csv'
+    _ecrire_entree(entree, 0, 60)
+
+    def traiter(dossier, pipeline):
+        with EcrivainLettresMortes(dossier / 'rejets.jsonl') as lettres_mortes:
+            traiter_avec_reprise(pipeline(lettres_mortes), entree, dossier / 'sortie.csv', taille_morceau=10)
+
+    (tmp_path / 'continu').mkdir()
+    traiter(tmp_path / 'continu', _pipeline)
+
+    (tmp_path / 'repris').mkdir()
+    with pytest.raises(KeyboardInterrupt):
+        traiter(tmp_path / 'repris', lambda lettres_mortes: PipelineInterrompu(
+            [FiltreValidation(), FiltreNormalisation(), FiltreTransformation()], lettres_mortes=lettres_mortes))
+    traiter(tmp_path / 'repris', _pipeline)
+
+    attendu = (tmp_path / 'continu' / 'sortie.csv').read_text(encoding='utf-8')
+    assert (tmp_path / 'repris' / 'sortie.csv').read_text(encoding='utf-8') == attendu
+    assert len(attendu.splitlines()) == 1 + 51
+    assert _rejets(tmp_path / 'repris' / 'rejets.jsonl') == _rejets(tmp_path / 'continu' / 'rejets.jsonl')
+
+def test_ajouts_puis_reecriture(tmp_path):
+    entree, sortie, rejets = tmp_path / 'releves.csv', tmp_path / 'sortie.csv', tmp_path / 'rejets.jsonl'
+
+    def traiter():
+        with EcrivainLettresMortes(rejets) as lettres_mortes:
+            return traiter_csv_incremental(_pipeline(lettres_mortes), entree, sortie, taille_morceau=10)
+
+    _ecrire_entree(entree, 0, 30)
+    assert traiter() == (30, 0, 5)
+    # Lignes ajoutées (dont une répétée) : seules les nouvelles sont traitées
+    with open(entree, 'a', encoding='utf-8') as fichier:
+        lignes = entree.read_text(encoding='utf-8').splitlines()
+        fichier.write(lignes[-1] + '\n')
+        pd.DataFrame([{**RELEVE, 'compteur_id': '200000', 'tarif': 'x'}],
+                     columns=CHAMPS_MESURE).to_csv(fichier, header=False, index=False)
+    assert traiter() == (2, 1, 1)
+    assert len(pd.read_csv(sortie)) == 25
+    assert len(_rejets(rejets)) == 6
+
+    # Entrée réécrite : sortie, index et lettres mortes repartent de zéro
+    _ecrire_entree(entree, 1, 14)
+    assert traiter() == (14, 0, 2)
+    assert len(pd.read_csv(sortie)) == 12
+    assert _rejets(rejets) == ['100007', '100014']
@@ -0,0 +1,71 @@
+from Pipe_filter import Pipeline, FiltreLimiteDebit, FiltreValidation
+
+RELEVE = {
+    'compteur_id': '123456', 'timestamp': '2024-05-26T14:00:00', 'consommation': '5000 Wh',
+    'type_client': 'Residentiel', 'wilaya': 'Alger', 'ville': 'Alger', 'localisation': '36.7538,3.0588',
+    'region': 'Centre', 'code_postal': '16000', 'fournisseur': 'Sonelgaz', 'tarif': '4.5',
+    'puissance_souscrite': '10 kW', 'type_compteur': 'Electronique',
+}
+
+class Horloge:
+    def __init__(self):
+        self.instant = 0.0
+
+    def __call__(self):
+        return self.instant
+
+def test_limite_debit_par_source():
+    horloge = Horloge()
+    limiteur = FiltreLimiteDebit(debit=2.0, capacite=3, horloge=horloge)
+    autre = {**RELEVE, 'compteur_id': '654321'}
+    resultats = [limiteur.traiter(RELEVE)[0] is not None for _ in range(5)]
+    assert resultats == [True, True, True, False, False]
+    # Une autre source a son propre seau
+    assert limiteur.traiter(autre)[0] is not None
+    # Rechargement de deux jetons par seconde
+    horloge.instant = 1.0
+    assert [limiteur.traiter(RELEVE)[0] is not None for _ in range(3)] == [True, True, False]
+    assert limiteur.nb_rejets == 3
+
+def test_limite_debit_eviction_et_reprise():
+    horloge = Horloge()
+    limiteur = FiltreLimiteDebit(debit=1.0, capacite=1, nb_sources_max=2, horloge=horloge)
+    for source in ('1', '2', '3'):
+        limiteur.traiter({'compteur_id': source})
+    assert list(limiteur.seaux) == ['2', '3']
+
+    copie = FiltreLimiteDebit(debit=1.0, capacite=1, horloge=horloge)
+    copie.restaurer(limiteur.etat())
+    assert copie.traiter({'compteur_id': '3'})[0] is None
+    horloge.instant = 1.0
+    assert copie.traiter({'compteur_id': '3'})[0] is not None
+
+def test_limite_debit_sans_source():
+    # Placé avant la validation, le limiteur rejette un message sans identifiant au lieu d'échouer
+    lettres = []
+
+    class LettresMortes:
+        def ecrire(self, donnees, erreurs, anomalies=()):
+            lettres.append((erreurs, list(anomalies)))
+
+    pipeline = Pipeline([FiltreLimiteDebit(), FiltreValidation()], lettres_mortes=LettresMortes())
+    sans_source = {champ: valeur for champ, valeur in RELEVE.items() if champ != 'compteur_id'}
+    assert pipeline.traiter(sans_source) is None
+    assert lettres == [(["Message sans source"], ["Message sans source"])]
+    assert pipeline.traiter(dict(RELEVE)) is not None
+
+def test_retard_horodatages_avec_et_sans_fuseau():
+    # Sans fuseau : UTC ; 15:00+01:00 est donc 14:00 UTC, en retard d'une heure sur 15:00
+    from Pipe_filter import FiltreSecurite
+    from temps_evenement import reordonner
+    filtre = FiltreSecurite(retard_autorise=60, politique_retard='rejeter')
+    horodatages = ['2024-05-26T14:00:00', '2024-05-26T15:30:00+01:00', '2024-05-26T15:00:00',
+                   '2024-05-26T15:00:00+01:00', '2024-05-26T17:00:00+02:00']
+    resultats = [filtre.traiter({**RELEVE, 'timestamp': horodatage}) for horodatage in horodatages]
+    assert [erreurs for _, erreurs in resultats] == [[], [], [], ["Relevé arrivé en retard"], []]
+    assert filtre.nb_retards == 1
+
+    releves = [{**RELEVE, 'timestamp': horodatage} for horodatage in horodatages]
+    remis_en_ordre = [releve['timestamp'] for releve in reordonner(releves, retard_max=3600)]
+    assert remis_en_ordre == ['2024-05-26T14:00:00', '2024-05-26T15:00:00+01:00', '2024-05-26T15:30:00+01:00',
+                              '2024-05-26T15:00:00', '2024-05-26T17:00:00+02:00']
@@ -0,0 +1,209 @@
+import logging
+import pandas as pd
+import pytest
+from Pipe_filter import (Pipeline, FiltreValidation, FiltreNormalisation, FiltreTransformation,
+                         CHAMPS_MESURE)
+
+# Le traitement par lots (traiter_lot) doit accepter, rejeter et produire exactement
+# ce que produit le traitement enregistrement par enregistrement (traiter).
+
+@pytest.fixture(autouse=True)
+def _journal_silencieux(caplog):
+    # Les rejets des relevés adverses sont journalisés en avertissement : attendus ici
+    caplog.set_level(logging.ERROR)
+
+VALIDE = {
+    'compteur_id': '123456', 'timestamp': '2024-05-26T14:00:00', 'consommation': '5000 Wh',
+    'type_client': 'Residentiel', 'wilaya': 'Alger', 'ville': 'Alger', 'localisation': '36.7538,3.0588',
+    'region': 'Centre', 'code_postal': '16000', 'fournisseur': 'Sonelgaz', 'tarif': '4.5',
+    'puissance_souscrite': '10 kW', 'type_compteur': 'Electronique',
+}
+
+# Valeurs à la limite des règles de validation
+ADVERSES = [
+    {'timestamp': '2024-05-26T14:00:00+01:00'},
+    {'timestamp': '.5'},
+    {'timestamp': '2024-W21'},
+    {'timestamp': ''},
+    {'timestamp': None},
+    {'ville': 'Alger²'},
+    {'ville': "L'Arbaa"},
+    {'ville': float('nan')},
+    {'wilaya': ''},
+    {'region': ''},
+    {'consommation': 'nan'},
+    {'consommation': 'nan kWh'},
+    {'consommation': '1_000 Wh'},
+    {'consommation': '5'},
+    {'consommation': ''},
+    {'consommation': '-1 kWh'},
+    {'consommation': '10001 kWh'},
+    {'consommation': 'inf kWh'},
+    {'consommation': 5.0},
+    {'compteur_id': '١٢٣٤٥٦'},
+    {'compteur_id': '123456\n'},
+    {'compteur_id': 123456},
+    {'compteur_id': '12345'},
+    {'code_postal': 16000},
+    {'code_postal': '16000 '},
+    {'type_client': 'INDUSTRIEL'},
+    {'type_client': None},
+    {'tarif': 'nan'},
+    {'tarif': '0'},
+    {'tarif': '1e-3'},
+    {'puissance_souscrite': '0 kW'},
+    {'puissance_souscrite': '10'},
+    {'fournisseur': 'Énergie Plus '},
+    {'type_compteur': 'Gen-3'},
+]
+
+def _lignes():
+    return [VALIDE] + [{**VALIDE, **modification} for modification in ADVERSES]
+
+def _lot(lignes):
+    return pd.DataFrame(lignes, columns=CHAMPS_MESURE, dtype=object)
+
+def test_validation_memes_rejets():
+    filtre = FiltreValidation()
+    lignes = _lignes()
+    _, rejet, raisons = filtre.traiter_lot(_lot(lignes))
+    for numero, ligne in enumerate(lignes):
+        erreurs, _ = filtre.valider(dict(ligne))
+        assert bool(rejet[numero]) == bool(erreurs), ligne
+        assert raisons[numero] == "; ".join(erreurs), ligne
+
+def test_validation_arret_premiere_erreur():
+    filtre = FiltreValidation(arret_premiere_erreur=True)
+    lignes = _lignes() + [{**VALIDE, 'compteur_id': 'x', 'tarif': 'y'}]
+    _, rejet, raisons = filtre.traiter_lot(_lot(lignes))
+    for numero, ligne in enumerate(lignes):
+        erreurs, _ = filtre.valider(dict(ligne))
+        assert raisons[numero] == "; ".join(erreurs), ligne
+
+@pytest.mark.parametrize('consommations', [['5', '7'], ['5000 Wh', '5'], ['1_000 Wh', '2.5 kWh']])
+def test_pipeline_memes_sorties(consommations):
+    lignes = [{**VALIDE, 'consommation': consommation} for consommation in consommations]
+    lignes += [{**VALIDE, **modification} for modification in ADVERSES]
+
+    def pipeline():
+        return Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()])
+
+    par_enregistrement = [resultat for resultat in map(pipeline().traiter, map(dict, lignes))
+                          if resultat is not None]
+    lot, _, _ = pipeline().traiter_lot(_lot(lignes))
+    par_lot = lot.to_dict(orient='records')
+
+    assert len(par_lot) == len(par_enregistrement)
+    for attendu, obtenu in zip(par_enregistrement, par_lot):
+        for champ, valeur in attendu.items():
+            assert obtenu[champ] == pytest.approx(valeur, nan_ok=True) if isinstance(valeur, float) else \
+                str(obtenu[champ]) == str(valeur), (champ, attendu, obtenu)
+
+def test_mesure_non_normalisee_brute():
+    # Sans normalisation, les valeurs reçues sont conservées et l'unité est prise en compte
+    resultat = Pipeline([FiltreValidation(), FiltreTransformation()]).traiter(dict(VALIDE))
+    assert resultat['consommation'] == '5000 Wh'
+    assert resultat['tarif'] == '4.5'
+    assert resultat['puissance_souscrite'] == '10 kW'
+    assert resultat['consommation_8h'] == '40.00000 kWh'
+
+    lot, _, _ = Pipeline([FiltreValidation(), FiltreTransformation()]).traiter_lot(_lot([VALIDE]))
+    assert lot.to_dict(orient='records')[0] == resultat
+
+def test_statistiques_memes_mesures():
+    from statistiques import StatistiquesPipeline
+    lignes = _lignes()
+
+    def pipeline(statistiques):
+        return Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()],
+                        statistiques=statistiques)
+
+    par_enregistrement, par_lot = StatistiquesPipeline(), StatistiquesPipeline()
+    for ligne in lignes:
+        pipeline(par_enregistrement).traiter(dict(ligne))
+    pipeline(par_lot).traiter_lot(_lot(lignes))
+
+    attendu, obtenu = par_enregistrement.instantane(), par_lot.instantane()
+    for cle in ('acceptes', 'rejetes', 'rejets_par_filtre', 'anomalies'):
+        assert obtenu[cle] == attendu[cle], cle
+    assert {nom: filtre['appels'] for nom, filtre in obtenu['filtres'].items()} == \
+        {nom: filtre['appels'] for nom, filtre in attendu['filtres'].items()}
+
+def test_lettres_mortes_memes_raisons(tmp_path):
+    import json
+    from lettres_mortes import EcrivainLettresMortes
+    lignes = _lignes()
+
+    def rejets(traiter):
+        chemin = tmp_path / 'rejets.jsonl'
+        with EcrivainLettresMortes(chemin) as lettres_mortes:
+            traiter(Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()],
+                             lettres_mortes=lettres_mortes))
+        rejets = [json.loads(ligne) for ligne in chemin.read_text(encoding='utf-8').splitlines()]
+        chemin.unlink()
+        return [(str(rejet['donnees']['compteur_id']), rejet['erreurs'], rejet['anomalies']) for rejet in rejets]
+
+    par_enregistrement = rejets(lambda pipeline: [pipeline.traiter(dict(ligne)) for ligne in lignes])
+    par_lot = rejets(lambda pipeline: pipeline.traiter_lot(_lot(lignes)))
+
+    assert par_lot == par_enregistrement
+    assert all(erreurs and not erreurs[0].startswith("Erreur dans le filtre")
+               for _, erreurs, _ in par_enregistrement)
+
+def test_rejet_entree_avant_filtres():
+    # Les lettres mortes d'un étage contiennent la mesure telle qu'il l'a reçue
+    from Pipe_filter import Filtre
+    from pipeline_etages import PipelineEtages, Etage
+
+    class FiltreRejet(Filtre):
+        def traiter(self, donnees):
+            return None, []
+
+    class LettresMortes:
+        def __init__(self):
+            self.entrees = []
+
+        def ecrire(self, donnees, erreurs, anomalies=()):
+            self.entrees.append(donnees)
+
+    lettres_mortes = LettresMortes()
+    pipeline = PipelineEtages([Etage([FiltreValidation()], 'thread'),
+                               Etage([FiltreTransformation(), FiltreRejet()], 'thread')],
+                              lettres_mortes=lettres_mortes)
+    assert list(pipeline.traiter_flux([dict(VALIDE)])) == []
+    assert lettres_mortes.entrees == [VALIDE]
+
+@pytest.mark.parametrize('modification', [{'consommation': 'nan kWh'}, {'tarif': 'nan'},
+                                          {'compteur_id': '123456\n'}, {'code_postal': '16000\n'},
+                                          {'localisation': '36.7538,3.0588\n'}])
+def test_validation_semantique_origine(modification):
+    # Valeurs acceptées par les contrôles écrits à la main (re.match, pas de contrôle de NaN)
+    assert FiltreValidation().valider({**VALIDE, **modification}) == ([], [])
+
+def test_puits_memes_signalements():
+    from anomalies import PuitsAnomalies
+    lignes = _lignes()
+
+    def pipeline(puits):
+        return Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()], puits=puits)
+
+    par_enregistrement, par_lot = PuitsAnomalies(), PuitsAnomalies()
+    traitement = pipeline(par_enregistrement)
+    for ligne in lignes:
+        traitement.traiter(dict(ligne))
+    pipeline(par_lot).traiter_lot(_lot(lignes))
+
+    assert par_lot.compteurs == par_enregistrement.compteurs
+    # Chaque erreur de validation n'est signalée qu'une fois
+    assert par_enregistrement.compteurs['Tarif invalide'] == 1
+
+def test_consommation_kwh_meme_unite():
+    # Même lecture de l'unité par enregistrement, par lot et dans la sortie colonnaire
+    from Pipe_filter import MesureCompteur, _consommation_kwh
+    from sortie_colonnaire import typer_lot
+    consommations = ['5000 Wh', '5000 Wh ', ' 5000  Wh', '5 kWh', '5', '2.5 Wh extra', 5.0]
+    par_enregistrement = [MesureCompteur.depuis({**VALIDE, 'consommation': consommation}).consommation_kwh()
+                          for consommation in consommations]
+    assert _consommation_kwh(pd.Series(consommations, dtype=object)).tolist() == par_enregistrement
+    assert typer_lot(pd.DataFrame({'consommation': consommations}, dtype=object))['consommation'].tolist() == \
+        par_enregistrement
@@ -0,0 +1,62 @@
+import asyncio
+import socket
+import threading
+import pytest
+from tramage import (encoder_trame, envoyer_trame, envoyer_fichier, recevoir_trame, recevoir_trame_vers_fichier,
+                     TrameTropGrande, ConnexionInterrompue, MESSAGE_PANNE, TAILLE_ENTETE)
+
+def _envoyer(envoi):
+    emetteur, recepteur = socket.socketpair()
+    fil = threading.Thread(target=lambda: (envoi(emetteur), emetteur.close()))
+    fil.start()
+    return recepteur, fil
+
+@pytest.mark.parametrize('contenu', [b'', b'enpanne', bytes(range(256)) * 5000])
+def test_aller_retour(contenu):
+    recepteur, fil = _envoyer(lambda sock: envoyer_trame(sock, contenu))
+    with recepteur:
+        assert recevoir_trame(recepteur) == contenu
+        fil.join()
+    assert encoder_trame(contenu)[TAILLE_ENTETE:] == contenu
+
+def test_fichier(tmp_path):
+    source, destination = tmp_path / 'source.csv', tmp_path / 'recu.csv'
+    source.write_bytes(b'a,b\n' * 100_000)
+    recepteur, fil = _envoyer(lambda sock: envoyer_fichier(sock, source))
+    with recepteur:
+        assert recevoir_trame_vers_fichier(recepteur, destination, taille_bloc=4096) == source.stat().st_size
+    fil.join()
+    assert destination.read_bytes() == source.read_bytes()
+
+def test_trame_trop_grande_et_interrompue():
+    recepteur, fil = _envoyer(lambda sock: sock.sendall(encoder_trame(b'x' * 100)))
+    with recepteur, pytest.raises(TrameTropGrande):
+        recevoir_trame(recepteur, taille_max=10)
+    fil.join()
+
+    recepteur, fil = _envoyer(lambda sock: sock.sendall(encoder_trame(b'x' * 100)[:50]))
+    with recepteur, pytest.raises(ConnexionInterrompue):
+        recevoir_trame(recepteur)
+    fil.join()
+
+def test_serveur_panne_puis_releves():
+    # Le message de panne est une trame : la connexion reste utilisable ensuite
+    from Pipe_filter import Pipeline, FiltreValidation
+    from serveur_reception import ServeurReception
+
+    ligne = b"123456,2024-05-26T14:00:00,5000 Wh,Residentiel,Alger,Alger,\"36.7538,3.0588\",Centre,16000,Sonelgaz,4.5,10 kW,Electronique\n"
+
+    async def scenario():
+        serveur = ServeurReception(Pipeline([FiltreValidation()]), hote='127.0.0.1', port=0)
+        await serveur.demarrer()
+        _, ecrivain = await asyncio.open_connection('127.0.0.1', serveur.port)
+        ecrivain.write(encoder_trame(MESSAGE_PANNE) + encoder_trame(ligne * 3))
+        await ecrivain.drain()
+        ecrivain.close()
+        await ecrivain.wait_closed()
+        await asyncio.sleep(0.1)
+        await serveur.arreter()
+        return serveur
+
+    serveur = asyncio.run(scenario())
+    assert (serveur.nb_trames, serveur.nb_enregistrements, serveur.nb_rejets) == (2, 3, 0)
@@ -0,0 +1,76 @@
+import os
+
+# Tramage des échanges par socket : chaque trame est précédée de sa taille sur
+# 4 octets (big-endian). La réception lit des longueurs exactes dans un tampon
+# préalloué (recv_into), sans concaténation de bytes.
+
+TAILLE_ENTETE = 4
+TAILLE_TRAME_MAX = 1 << 30
+TAILLE_BLOC = 1 << 20
+# Contenu de la trame envoyée par un compteur pour signaler une panne
+MESSAGE_PANNE = b"enpanne"
+
+class TrameTropGrande(ValueError):
+    """Trame annoncée plus grande que la taille maximale autorisée"""
+
+class ConnexionInterrompue(ConnectionError):
+    """Connexion fermée avant la fin de la trame"""
+
+def recevoir_dans(sock, vue):
+    """Remplissage complet d'une vue mémoire depuis la socket"""
+    taille = len(vue)
+    recus = 0
+    while recus < taille:
+        nb = sock.recv_into(vue[recus:], taille - recus)
+        if nb == 0:
+            raise ConnexionInterrompue(f"Connexion fermée après {recus} octets sur {taille}")
+        recus += nb
+
+def recevoir_taille(sock, taille_max=TAILLE_TRAME_MAX):
+    """Lecture de l'en-tête d'une trame et contrôle de la taille annoncée"""
+    entete = bytearray(TAILLE_ENTETE)
+    recevoir_dans(sock, memoryview(entete))
+    taille = int.from_bytes(entete, byteorder='big')
+    if taille > taille_max:
+        raise TrameTropGrande(f"Trame de {taille} octets (maximum {taille_max})")
+    return taille
+
+def recevoir_trame(sock, taille_max=TAILLE_TRAME_MAX):
+    """Réception d'une trame complète en mémoire"""
+    tampon = bytearray(recevoir_taille(sock, taille_max))
+    recevoir_dans(sock, memoryview(tampon))
+    return tampon
+
+def recevoir_trame_vers_fichier(sock, chemin, taille_max=TAILLE_TRAME_MAX, taille_bloc=TAILLE_BLOC):
+    """Réception d'une trame écrite au fil de l'eau dans un fichier
+
+    Seul un bloc de taille_bloc octets est gardé en mémoire ; retourne la taille reçue.
+    """
+    taille = recevoir_taille(sock, taille_max)
+    vue = memoryview(bytearray(min(taille_bloc, taille) or 1))
+    restant = taille
+    with open(chemin, 'wb') as fichier:
+        while restant:
+            nb = sock.recv_into(vue, min(restant, len(vue)))
+            if nb == 0:
+                raise ConnexionInterrompue(f"Connexion fermée après {taille - restant} octets sur {taille}")
+            fichier.write(vue[:nb])
+            restant -= nb
+    return taille
+
+def encoder_trame(contenu):
+    """Trame complète (en-tête de taille puis contenu) en un seul bloc d'octets"""
+    return len(contenu).to_bytes(TAILLE_ENTETE, byteorder='big') + contenu
+
+def envoyer_trame(sock, contenu):
+    """Envoi d'une trame (en-tête de taille puis contenu)"""
+    sock.sendall(len(contenu).to_bytes(TAILLE_ENTETE, byteorder='big'))
+    sock.sendall(contenu)
+
+def envoyer_fichier(sock, chemin):
+    """Envoi d'un fichier comme une seule trame, sans le charger en mémoire"""
+    taille = os.path.getsize(chemin)
+    sock.sendall(taille.to_bytes(TAILLE_ENTETE, byteorder='big'))
+    with open(chemin, 'rb') as fichier:
+        sock.sendfile(fichier)
+    return taille
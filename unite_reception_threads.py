@@ -1,56 +1,76 @@
+import csv
+import io
 import pandas as pd
-import numpy as np
-from threading import Thread
-from queue import Queue
-from Pipe_filter import Pipeline, FiltreValidation, FiltreNormalisation, FiltreTransformation
+from Pipe_filter import (FiltreValidation, FiltreNormalisation, FiltreTransformation,
+                         CHAMPS_MESURE, CHAMPS_DERIVES)
+from pipeline_etages import PipelineEtages, Etage
+from lettres_mortes import EcrivainLettresMortes
+from ingestion_incrementale import (lire_etat, ecrire_etat, position_reprise, point_reprise,
+                                    tronquer, synchroniser, lignes_completes,
+                                    taille_lettres_mortes, tronquer_lettres_mortes, effacer_lettres_mortes)
+import logging
 
-# Fonction pour traiter une partie des données avec un pipeline
-def traiter_partie(pipeline, donnees_part, output_queue):
-    output_queue.put([pipeline.traiter(donnees) for donnees in donnees_part])
+# Traitement avec points de reprise : l'entrée est lue par morceaux de lignes
+# complètes, chaque morceau traverse le pipeline par étages, puis la sortie est
+# écrite sur disque et le point de reprise (position dans l'entrée, taille de la
+# sortie et des lettres mortes, états des filtres) réécrit atomiquement. Après un
+# arrêt brutal, la sortie et les lettres mortes sont tronquées à leur taille au
+# dernier point de reprise et le traitement reprend au morceau interrompu : chaque
+# enregistrement est écrit une seule fois.
+# Chaque morceau est un appel à traiter_flux : les étages (threads et processus)
+# sont démarrés puis arrêtés à chaque morceau, et les états des filtres exécutés en
+# processus ne sont rapatriés qu'à leur arrêt. Ce coût fixe (quelques dizaines de
+# ms par morceau avec deux processus) est amorti par des morceaux de 100 000 lignes.
+def traiter_avec_reprise(pipeline, entree, sortie, chemin_etat=None, taille_morceau=100_000):
+    """Traitement de `entree` vers `sortie`, repris au dernier point de reprise s'il existe"""
+    chemin_etat = chemin_etat or f"{sortie}.etat.json"
+    etat = lire_etat(chemin_etat)
+    with open(entree, 'rb') as fichier:
+        entete = fichier.readline()
+        position = position_reprise(fichier, etat)
+        if position is not None:
+            tronquer(sortie, etat['position_sortie'])
+            tronquer_lettres_mortes(pipeline, etat)
+            pipeline.restaurer(etat['filtres'])
+        else:
+            position = fichier.tell()
+            open(sortie, 'w').close()
+            effacer_lettres_mortes(pipeline)
 
-# Lire les données CSV
-df = pd.read_csv('dataset_consommation_energie_algerie.csv')
+        with open(sortie, 'a', newline='', encoding='utf-8') as fichier_sortie:
+            ecrivain = csv.DictWriter(fichier_sortie, fieldnames=CHAMPS_MESURE + CHAMPS_DERIVES, lineterminator='\n')
+            if fichier_sortie.tell() == 0:
+                ecrivain.writeheader()
+            fichier.seek(position)
+            for lignes in lignes_completes(fichier, taille_morceau):
+                morceau = pd.read_csv(io.BytesIO(entete + b''.join(lignes)))
+                position += sum(map(len, lignes))
+                # Les filtres qui accumulent ne sont vidés qu'en fin d'entrée
+                for donnees in pipeline.traiter_flux(morceau.to_dict(orient='records'), vider=False):
+                    ecrivain.writerow(donnees)
+                ecrire_etat(chemin_etat, point_reprise(fichier, position, entete,
+                                                       position_sortie=synchroniser(fichier_sortie),
+                                                       position_lettres_mortes=taille_lettres_mortes(pipeline),
+                                                       filtres=pipeline.etat()))
+                fichier.seek(position)
+            for donnees in pipeline.traiter_flux(()):
+                ecrivain.writerow(donnees)
 
-# Convertir le DataFrame en une liste de dictionnaires
-donnees_brutes = df.to_dict(orient='records')
+if __name__ == '__main__':
+    # Configuration du logging pour afficher les avertissements dans la console
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Diviser les données en deux parties de taille égale
-donnees_parts = np.array_split(donnees_brutes, 2)
-donnees_part1, donnees_part2 = donnees_parts
+    # Pipeline par étages reliés par des files bornées : la lecture du CSV, la
+    # validation (deux processus), la transformation et l'écriture se recouvrent
+    lettres_mortes = EcrivainLettresMortes('dataset_consommation_energie_algerie_rejets.jsonl')
+    pipeline = PipelineEtages([
+        Etage([FiltreValidation(), FiltreNormalisation()], 'processus', nb_travailleurs=2),
+        Etage([FiltreTransformation()], 'thread'),
+    ], lettres_mortes=lettres_mortes)
 
-# Créer deux instances du pipeline
-pipeline1 = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()])
-pipeline2 = Pipeline([FiltreValidation(), FiltreNormalisation(), FiltreTransformation()])
+    # Sauvegarder les données traitées en CSV au fil de l'eau ; une exécution
+    # interrompue reprend au dernier point de reprise
+    traiter_avec_reprise(pipeline, 'dataset_consommation_energie_algerie.csv',
+                         'dataset_consommation_energie_algerie_traite.csv')
 
-# Créer les queues pour stocker les résultats
-queue1 = Queue()
-queue2 = Queue()
-
-# Créer les threads pour traiter chaque partie des données
-
-thread1 = Thread(target=traiter_partie, args=(pipeline1, donnees_part1, queue1))
-thread2 = Thread(target=traiter_partie, args=(pipeline2, donnees_part2, queue2))
-
-# Démarrer les threads
-thread1.start()
-thread2.start()
-
-# Attendre la fin de l'exécution des threads
-thread1.join()
-thread2.join()
-
-# Récupérer les résultats des queues
-donnees_traitees_part1 = queue1.get()
-donnees_traitees_part2 = queue2.get()
-
-# Combiner les deux parties traitées
-donnees_traitees = donnees_traitees_part1 + donnees_traitees_part2
-
-# Filtrer les résultats pour enlever les entrées traitées sans erreurs (None)
-donnees_traitees = [donnees for donnees in donnees_traitees if donnees is not None]
-
-# Convertir les données traitées en DataFrame
-df_traite = pd.DataFrame(donnees_traitees)
-
-# Sauvegarder le DataFrame traité en CSV
-df_traite.to_csv('dataset_consommation_energie_algerie_traite.csv', index=False)
+    lettres_mortes.fermer()
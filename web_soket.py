@@ -1,5 +1,6 @@
 import socket
 import os
+from tramage import recevoir_trame_vers_fichier
 from openpyxl import Workbook
 # Définir l'adresse et le port du serveur
 HOST = '192.168.43.215'  # Remplacer par l'adresse IP du serveur si nécessaire
@@ -23,17 +24,11 @@ with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
     # Se connecter au serveur
     client_socket.connect((HOST, PORT))
 
-    # Recevoir la taille du fichier du serveur en premier
-    taille_fichier_bytes = client_socket.recv(4)
-    taille_fichier = int.from_bytes(taille_fichier_bytes, byteorder='big')
-    # Recevoir le contenu du fichier depuis le serveur
-    contenu = client_socket.recv(taille_fichier)
     replace_excel_file('Classeur.csv')
     # Nom du fichier de destination
     nom_fichier_destination = 'Classeur.csv'
 
-    # Écrire le contenu reçu dans un fichier
-    with open(nom_fichier_destination, 'wb') as fichier:
-        fichier.write(contenu)
+    # Recevoir la taille du fichier puis son contenu, écrit directement dans le fichier
+    recevoir_trame_vers_fichier(client_socket, nom_fichier_destination)
 
     print(f"Fichier {nom_fichier_destination} reçu avec succès.")
\ No newline at end of file